@@ -0,0 +1,164 @@
+from collections import Counter
+from math import log, pi, radians, tan, cos
+
+MIN_ZOOM = 3
+MAX_ZOOM = 19
+# Розмір комірки кластеризації на екрані, пікселі
+CELL_SIZE_PX = 64
+TILE_SIZE_PX = 256
+MAX_LATITUDE = 85.0511287798
+
+
+def _mercator(lat, lon):
+    """
+    Переводить координати в нормалізовану проєкцію Меркатора
+    :return: (x, y) в діапазоні [0, 1), y зростає на південь
+    """
+    lat = max(-MAX_LATITUDE, min(MAX_LATITUDE, lat))
+    x = (lon + 180.0) / 360.0
+    lat_rad = radians(lat)
+    y = (1.0 - log(tan(lat_rad) + 1.0 / cos(lat_rad)) / pi) / 2.0
+    return x, y
+
+
+class Cluster:
+    """Група дефектів в одній комірці сітки"""
+
+    __slots__ = ("count", "lat_sum", "lon_sum", "kinds")
+
+    def __init__(self):
+        self.count = 0
+        self.lat_sum = 0.0
+        self.lon_sum = 0.0
+        self.kinds = Counter()
+
+    @property
+    def lat(self):
+        return self.lat_sum / self.count
+
+    @property
+    def lon(self):
+        return self.lon_sum / self.count
+
+    @property
+    def kind(self):
+        """Найчастіший тип дефекту в кластері"""
+        return self.kinds.most_common(1)[0][0]
+
+
+class ClusterIndex:
+    """
+    Ієрархічна сітка над lat/lon для кластеризації дефектів за зумом.
+    Для кожного рівня зуму комірка займає CELL_SIZE_PX пікселів на екрані, тому при наближенні
+    кластери розпадаються на менші. Вставка коштує O(кількість рівнів), а вибірка - O(видимі комірки).
+    """
+
+    def __init__(self, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM, cell_size_px=CELL_SIZE_PX):
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.cell_size_px = cell_size_px
+        self._levels = {zoom: {} for zoom in range(min_zoom, max_zoom + 1)}
+
+    def _cells_per_axis(self, zoom):
+        return (TILE_SIZE_PX << zoom) // self.cell_size_px
+
+    def _clamp_zoom(self, zoom):
+        return max(self.min_zoom, min(self.max_zoom, int(zoom)))
+
+    def insert(self, kind, lat, lon, count=1):
+        """
+        Додає дефект до всіх рівнів сітки
+        :param kind: тип дефекту
+        :param lat: широта
+        :param lon: довгота
+        :param count: кількість однакових дефектів у цій точці
+        :return: True, якщо дефект потрапив у нову комірку найдрібнішого рівня
+        (False означає повтор уже відомого дефекту)
+        """
+        x, y = _mercator(lat, lon)
+        is_new = False
+        for zoom, cells in self._levels.items():
+            n = self._cells_per_axis(zoom)
+            key = (int(x * n), int(y * n))
+            cluster = cells.get(key)
+            if cluster is None:
+                cluster = cells[key] = Cluster()
+                is_new = True
+            cluster.count += count
+            cluster.lat_sum += lat * count
+            cluster.lon_sum += lon * count
+            cluster.kinds[kind] += count
+        return is_new
+
+    def remove(self, kind, lat, lon, count=1):
+        """
+        Видаляє раніше доданий дефект з усіх рівнів сітки
+        :param kind: тип дефекту
+        :param lat: широта
+        :param lon: довгота
+        :param count: кількість, з якою дефект було додано
+        """
+        x, y = _mercator(lat, lon)
+        for zoom, cells in self._levels.items():
+            n = self._cells_per_axis(zoom)
+            key = (int(x * n), int(y * n))
+            cluster = cells.get(key)
+            if cluster is None:
+                continue
+            cluster.count -= count
+            if cluster.count <= 0:
+                del cells[key]
+                continue
+            cluster.lat_sum -= lat * count
+            cluster.lon_sum -= lon * count
+            cluster.kinds[kind] -= count
+            if cluster.kinds[kind] <= 0:
+                del cluster.kinds[kind]
+
+    def cell_range(self, zoom, lat1, lon1, lat2, lon2):
+        """
+        Обчислює діапазон комірок сітки, які покривають область
+        :param zoom: рівень зуму мапи
+        :param lat1, lon1, lat2, lon2: межі області
+        :return: (zoom, cx1, cy1, cx2, cy2)
+        """
+        zoom = self._clamp_zoom(zoom)
+        n = self._cells_per_axis(zoom)
+        x1, y1 = _mercator(max(lat1, lat2), min(lon1, lon2))
+        x2, y2 = _mercator(min(lat1, lat2), max(lon1, lon2))
+        return zoom, int(x1 * n), int(y1 * n), int(x2 * n), int(y2 * n)
+
+    def query_range(self, cell_range):
+        """
+        Повертає кластери з діапазону комірок
+        :param cell_range: результат cell_range
+        :return: список пар (ключ комірки, Cluster)
+        """
+        zoom, cx1, cy1, cx2, cy2 = cell_range
+        cells = self._levels[zoom]
+        if (cx2 - cx1 + 1) * (cy2 - cy1 + 1) > len(cells):
+            # Заповнених комірок менше, ніж видимих - дешевше перебрати заповнені
+            return [
+                ((zoom, cx, cy), cluster)
+                for (cx, cy), cluster in cells.items()
+                if cx1 <= cx <= cx2 and cy1 <= cy <= cy2
+            ]
+        result = []
+        for cx in range(cx1, cx2 + 1):
+            for cy in range(cy1, cy2 + 1):
+                cluster = cells.get((cx, cy))
+                if cluster is not None:
+                    result.append(((zoom, cx, cy), cluster))
+        return result
+
+    def query(self, zoom, lat1, lon1, lat2, lon2):
+        """
+        Повертає кластери, які потрапляють у видиму область
+        :param zoom: рівень зуму мапи
+        :param lat1, lon1, lat2, lon2: межі видимої області
+        :return: список пар (ключ комірки, Cluster)
+        """
+        return self.query_range(self.cell_range(zoom, lat1, lon1, lat2, lon2))
+
+    def __len__(self):
+        return len(self._levels[self.max_zoom])
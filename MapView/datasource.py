@@ -1,95 +1,115 @@
 import asyncio
 import json
-from datetime import datetime
+import threading
+from collections import deque
 
 import websockets
 from kivy import Logger
-from pydantic import BaseModel, field_validator
+from road_vision import geohash
+from road_vision.entities import ProcessedAgentData
 
 from config import STORE_HOST, STORE_PORT
 
-
-class AccelerometerData(BaseModel):
-    x: float
-    y: float
-    z: float
-
-
-class GpsData(BaseModel):
-    latitude: float
-    longitude: float
-
-
-class AgentData(BaseModel):
-    user_id: int
-    accelerometer: AccelerometerData
-    gps: GpsData
-    timestamp: datetime
-
-
-class TrafficData(BaseModel):
-    vehicle_count: int
-
-
-# Pydantic models
-class ProcessedAgentData(BaseModel):
-    road_state: str
-    agent_data: AgentData
-    traffic_data: TrafficData
-
-    @classmethod
-    @field_validator("timestamp", mode="before")
-    def check_timestamp(cls, value):
-        if isinstance(value, datetime):
-            return value
-        try:
-            return datetime.fromisoformat(value)
-        except (TypeError, ValueError):
-            raise ValueError(
-                "Invalid timestamp format. Expected ISO 8601 format (YYYY-MM-DDTHH:MM:SSZ)."
-            )
+# Скільки отриманих точок може чекати на відображення; при переповненні відкидаються найстаріші
+MAX_BUFFERED_POINTS = 10000
+RECONNECT_DELAY_SECONDS = 2
 
 
 class Datasource:
+    """
+    Отримує дані зі Store через WebSocket в окремому потоці зі своїм event loop.
+    Розбір і валідація повідомлень виконуються в цьому потоці, а готові точки складаються
+    в обмежений кільцевий буфер, з якого UI забирає їх порціями кожен кадр.
+    Паралельно отримує знімки заторів по геохеш-комірках (/congestion/ws).
+    """
+
     def __init__(self, user_id: int):
         self.index = 0
         self.user_id = user_id
         self.connection_status = None
-        self._new_points = []
-        asyncio.ensure_future(self.connect_to_server())
-
-    def get_new_points(self):
-        Logger.debug(self._new_points)
-        points = self._new_points
-        self._new_points = []
-        return list(reversed(points))
+        self.dropped_points = 0
+        self._new_points = deque(maxlen=MAX_BUFFERED_POINTS)
+        # Точність геохешу і комірки з заторами з останнього знімку; None, поки знімків не було
+        self._congestion_precision = None
+        self._congested_cells = None
+        self._thread = threading.Thread(target=self._run, name="datasource", daemon=True)
+        self._thread.start()
+
+    def get_new_points(self, limit=None):
+        """
+        Забирає з буфера нові точки в порядку надходження
+        :param limit: максимальна кількість точок (None - всі)
+        :return: список точок
+        """
+        points = []
+        while self._new_points and (limit is None or len(points) < limit):
+            points.append(self._new_points.popleft())
+        return points
+
+    def is_congested(self, latitude, longitude):
+        """
+        Чи є затор у комірці точки за останнім знімком Store
+        :param latitude: широта
+        :param longitude: довгота
+        :return: True/False, або None, якщо знімків ще не було
+        """
+        congested_cells = self._congested_cells
+        if congested_cells is None:
+            return None
+        return geohash.encode(latitude, longitude, self._congestion_precision) in congested_cells
+
+    def _run(self):
+        asyncio.run(self._connect())
+
+    async def _connect(self):
+        await asyncio.gather(self.connect_to_server(), self.connect_to_congestion_feed())
+
+    async def connect_to_congestion_feed(self):
+        uri = f"ws://{STORE_HOST}:{STORE_PORT}/congestion/ws"
+        while True:
+            try:
+                async with websockets.connect(uri) as websocket:
+                    while True:
+                        snapshot = json.loads(await websocket.recv())
+                        self._congestion_precision = snapshot["precision"]
+                        # Множина замінюється цілком, тому UI завжди бачить узгоджений знімок
+                        self._congested_cells = {cell["geohash"] for cell in snapshot["cells"] if cell["congested"]}
+            except (websockets.ConnectionClosed, OSError, ValueError, KeyError) as e:
+                Logger.debug(f"CONGESTION FEED DISCONNECT: {e}")
+            await asyncio.sleep(RECONNECT_DELAY_SECONDS)
 
     async def connect_to_server(self):
         uri = f"ws://{STORE_HOST}:{STORE_PORT}/ws/{self.user_id}"
         while True:
             Logger.debug("CONNECT TO SERVER")
-            async with websockets.connect(uri) as websocket:
-                self.connection_status = "Connected"
-                try:
+            try:
+                async with websockets.connect(uri) as websocket:
+                    self.connection_status = "Connected"
                     while True:
                         data = await websocket.recv()
-                        parsed_data = json.loads(data)
-                        self.handle_received_data(json.loads(parsed_data))
-                except websockets.ConnectionClosedOK:
-                    self.connection_status = "Disconnected"
-                    Logger.debug("SERVER DISCONNECT")
+                        try:
+                            parsed_data = json.loads(data)
+                            self.handle_received_data(json.loads(parsed_data))
+                        except ValueError as e:
+                            Logger.warning(f"Datasource: invalid message: {e}")
+            except (websockets.ConnectionClosed, OSError) as e:
+                self.connection_status = "Disconnected"
+                Logger.debug(f"SERVER DISCONNECT: {e}")
+            await asyncio.sleep(RECONNECT_DELAY_SECONDS)
 
     def handle_received_data(self, data):
-        # Update your UI or perform actions with received data here
         Logger.debug(f"Received data: {data}")
         processed_agent_data = ProcessedAgentData.model_validate_json(data, strict=True)
 
-        new_points = [
+        if len(self._new_points) == self._new_points.maxlen:
+            self.dropped_points += 1
+        self._new_points.append(
             (
-                processed_agent_data.agent_data.gps.longitude,
                 processed_agent_data.agent_data.gps.latitude,
+                processed_agent_data.agent_data.gps.longitude,
                 processed_agent_data.agent_data.accelerometer.y,
-                processed_agent_data.traffic_data.vehicle_count
+                processed_agent_data.traffic_data.vehicle_count,
+                processed_agent_data.agent_data.timestamp,
+                processed_agent_data.road_state,
             )
-        ]
-        self._new_points.extend(new_points)
+        )
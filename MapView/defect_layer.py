@@ -0,0 +1,127 @@
+from kivy.clock import Clock
+from kivy.graphics import Color, Ellipse
+from kivy.uix.label import Label
+from kivy_garden.mapview import MapMarker, MarkerMapLayer
+
+from clustering import ClusterIndex, CELL_SIZE_PX
+
+DEFECT_IMAGES = {
+    "pothole": "images/pothole.png",
+    "bump": "images/bump.png",
+    "traffic_light": "images/traffic_light.png",
+}
+# Стани дороги (класифікація edge), які відображаються як дефекти на мапі
+DEFECT_KINDS = {
+    "humps": "bump",
+    "big bumps": "pothole",
+}
+BADGE_SIZE = 22
+BADGE_COLOR = (0.1, 0.1, 0.1, 0.85)
+
+
+class ClusterMarker(MapMarker):
+    """Маркер кластера дефектів зі значком кількості"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.badge = Label(size_hint=(None, None), size=(BADGE_SIZE, BADGE_SIZE), font_size=11, bold=True)
+        with self.badge.canvas.before:
+            Color(*BADGE_COLOR)
+            self._badge_background = Ellipse(size=self.badge.size)
+        self.bind(pos=self._place_badge, size=self._place_badge)
+
+    def show(self, cluster):
+        """
+        Оновлює маркер відповідно до кластера
+        :param cluster: кластер дефектів
+        """
+        self.lat, self.lon = cluster.lat, cluster.lon
+        self.source = DEFECT_IMAGES[cluster.kind]
+        if cluster.count > 1:
+            self.badge.text = str(cluster.count) if cluster.count < 1000 else "999+"
+            if self.badge.parent is None:
+                self.add_widget(self.badge)
+        elif self.badge.parent is not None:
+            self.remove_widget(self.badge)
+
+    def _place_badge(self, *args):
+        self.badge.pos = (self.right - BADGE_SIZE / 2, self.top - BADGE_SIZE / 2)
+        self._badge_background.pos = self.badge.pos
+
+
+class DefectLayer(MarkerMapLayer):
+    """
+    Шар дефектів дороги, кластеризованих за зумом. На мапі існують лише маркери видимих комірок
+    ClusterIndex, тому кількість віджетів обмежена розміром екрану, а не історією поїздок.
+    Маркери, що виходять за межі екрану, повертаються в пул і перевикористовуються.
+    """
+
+    def __init__(self, index=None, **kwargs):
+        super().__init__(**kwargs)
+        self.index = index or ClusterIndex()
+        self._visible = {}
+        self._pool = []
+        self._cell_range = None
+        self._dirty = False
+        self._trigger_sync = Clock.create_trigger(self._sync)
+
+    def add_defect(self, kind, lat, lon, count=1):
+        """
+        Додає дефект до індексу; маркери оновлюються один раз на кадр
+        :param kind: тип дефекту (pothole, bump, traffic_light)
+        :param lat: широта
+        :param lon: довгота
+        :param count: кількість однакових дефектів у цій точці
+        """
+        self.index.insert(kind, lat, lon, count)
+        self._dirty = True
+        self._trigger_sync()
+
+    def remove_defect(self, kind, lat, lon, count=1):
+        """
+        Видаляє дефект, доданий через add_defect
+        :param kind: тип дефекту
+        :param lat: широта
+        :param lon: довгота
+        :param count: кількість, з якою дефект було додано
+        """
+        self.index.remove(kind, lat, lon, count)
+        self._dirty = True
+        self._trigger_sync()
+
+    def reposition(self):
+        mapview = self.parent
+        if mapview is None:
+            return
+        cell_range = self.index.cell_range(mapview.zoom, *mapview.get_bbox(CELL_SIZE_PX))
+        if self._dirty or cell_range != self._cell_range:
+            self._update_markers(cell_range)
+        super().reposition()
+
+    def _sync(self, *args):
+        if self._dirty:
+            self.reposition()
+
+    def _update_markers(self, cell_range):
+        self._cell_range = cell_range
+        self._dirty = False
+        clusters = dict(self.index.query_range(cell_range))
+        for key in [key for key in self._visible if key not in clusters]:
+            marker = self._visible.pop(key)
+            self.remove_widget(marker)
+            self._pool.append(marker)
+        for key, cluster in clusters.items():
+            marker = self._visible.get(key)
+            if marker is None:
+                marker = self._pool.pop() if self._pool else ClusterMarker()
+                marker.show(cluster)
+                self._visible[key] = marker
+                self.add_widget(marker)
+            else:
+                marker.show(cluster)
+
+    def unload(self):
+        for marker in self._visible.values():
+            self.remove_widget(marker)
+        self._visible.clear()
+        self._cell_range = None
@@ -9,9 +9,18 @@ from kivy.uix.popup import Popup
 from kivy.uix.label import Label
 from kivy_garden.mapview import MapMarker, MapView, MapSource
 from screeninfo import get_monitors
-from math import sqrt
+from road_vision.trip_statistics import TripStatistics
 
 from datasource import Datasource
+from defect_layer import DEFECT_KINDS, DefectLayer
+from tile_loader import DefectTileLoader
+from track_layer import TrackLayer
+
+# Скільки нових точок відображається за один кадр; решта чекає в буфері Datasource
+MAX_POINTS_PER_FRAME = 200
+# Якщо даних немає довше, поїздка вважається завершеною і показується її статистика
+TRIP_IDLE_SECONDS = 5
+CONGESTION_VEHICLE_COUNT = 6
 
 
 class MapViewApp(App):
@@ -21,76 +30,74 @@ class MapViewApp(App):
         self.datasource = Datasource(user_id=1)
         self.car_marker = None
         self.mapview = None
+        self.track_layer = None
+        self.defect_layer = None
+        self.tile_loader = None
         self.start = True
         self.button = None
-        self.latitude = 0
-        self.longitude = 0
-        self.constant = 91.4
-        self.time = 0
-        self.distances = []
+        self.trip_statistics = TripStatistics()
         self.info_popup = None
+        self.last_point = None
+        self.last_point_time = 0
+        self.stopped = False
+        self.trip_summary_shown = False
 
     def on_start(self):
         """
         Встановлює необхідні маркери, викликає функцію для оновлення мапи
         """
-        Clock.schedule_interval(self.update, 5)
+        Clock.schedule_interval(self.update, 0)
 
     def update(self, *args):
         """
-        Викликається регулярно для оновлення мапи
+        Викликається кожен кадр, відображає нові точки (не більше MAX_POINTS_PER_FRAME за кадр)
         """
-        points = self.datasource.get_new_points()
-        check_list = []
-        if len(points) != 5 and self.longitude != 0:
-            total_distance = round(sum(self.distances) * self.constant, 3)
-            average_speed = round(((sum(self.distances) * self.constant) / (self.time / 3600)), 3)
-            self.show_info_popup(total_distance, average_speed)
-        else:
-            for i in range(len(points) - 1):
-                distance = sqrt((points[i + 1][0] - points[i][0]) ** 2 + (points[i + 1][1] - points[i][1]) ** 2)
-                self.distances.append(distance)
-            self.time += 5
-            self.latitude, self.longitude = points[-1][0], points[-1][1]
+        points = self.datasource.get_new_points(MAX_POINTS_PER_FRAME)
+        now = Clock.get_time()
+        if not points:
+            idle = now - self.last_point_time >= TRIP_IDLE_SECONDS
+            if idle and self.trip_statistics.reading_count and not self.trip_summary_shown:
+                # Нових даних немає - поїздка завершилась або призупинилась
+                self.show_info_popup(self.trip_statistics)
+                self.trip_summary_shown = True
+            return
+        self.last_point_time = now
+        self.trip_summary_shown = False
 
         if self.start:
-            try:
-                self.set_start_marker(points[0])
-                self.start = False
-            except IndexError:
-                pass
-        try:
-            for i in range(len(points)):
-                check_list.append(points[i][0])
-            check_set = set(check_list)
-            if len(check_set) != len(check_list):
-                self.set_traffic_light_marker(points[0])
-            else:
-                bump = max(points, key=lambda x: x[2])
-                pothole = min(points, key=lambda x: x[2])
-                for point in points:
-                    if points[0][3] >= 6 and points[-1][3] >= 6:
-                        self.set_track_way_marker(point, "red_dot.png")
-                    else:
-                        self.set_track_way_marker(point, "track_way.png")
-                    if point == bump:
-                        self.set_bump_marker(point)
-                    elif point == pothole:
-                        self.set_pothole_marker(point)
-                self.update_car_marker(points[-1])
-        except ValueError:
-            pass
+            self.set_start_marker(points[0])
+            self.start = False
+        track_points = []
+        for point in points:
+            self.trip_statistics.add(point[0], point[1], point[4], point[5])
+            congested = self.datasource.is_congested(point[0], point[1])
+            if congested is None:
+                # Поки немає знімку заторів зі Store - за кількістю машин у самій точці
+                congested = point[3] >= CONGESTION_VEHICLE_COUNT
+            track_points.append((point[0], point[1], congested))
+            kind = DEFECT_KINDS.get(point[5])
+            if kind == "bump":
+                self.set_bump_marker(point)
+            elif kind == "pothole":
+                self.set_pothole_marker(point)
+            stopped = self.last_point is not None and point[:2] == self.last_point[:2]
+            if stopped and not self.stopped:
+                self.set_traffic_light_marker(point)
+            self.stopped = stopped
+            self.last_point = point
+        self.track_layer.add_points(track_points)
+        self.update_car_marker(points[-1])
 
     def update_car_marker(self, point):
         """
         Оновлює відображення маркера машини на мапі
         :param point: GPS координати
         """
-        try:
+        if self.car_marker is None:
+            self.car_marker = MapMarker(lat=point[0], lon=point[1], source="images/car.png")
+        else:
             self.mapview.remove_marker(self.car_marker)
-        except AttributeError:
-            pass
-        self.car_marker = MapMarker(lat=point[0], lon=point[1], source="images/car.png")
+            self.car_marker.lat, self.car_marker.lon = point[0], point[1]
         self.mapview.add_marker(self.car_marker)
 
     def set_pothole_marker(self, point):
@@ -98,16 +105,14 @@ class MapViewApp(App):
         Встановлює маркер для ями
         :param point: GPS координати
         """
-        pothole_marker = MapMarker(lat=point[0], lon=point[1], source="images/pothole.png")
-        self.mapview.add_marker(pothole_marker)
+        self.defect_layer.add_defect("pothole", point[0], point[1])
 
     def set_bump_marker(self, point):
         """
         Встановлює маркер для лежачого поліціянта
         :param point: GPS координати
         """
-        pothole_marker = MapMarker(lat=point[0], lon=point[1], source="images/bump.png")
-        self.mapview.add_marker(pothole_marker)
+        self.defect_layer.add_defect("bump", point[0], point[1])
 
     def set_start_marker(self, point):
         """
@@ -117,22 +122,12 @@ class MapViewApp(App):
         start_marker = MapMarker(lat=point[0], lon=point[1], source="images/start.png")
         self.mapview.add_marker(start_marker)
 
-    def set_track_way_marker(self, point, image):
-        """
-        Встановлює маркер для пройденного шляху
-        :param image: image
-        :param point: GPS координати
-        """
-        track_way_marker = MapMarker(lat=point[0], lon=point[1], source="images/" + image)
-        self.mapview.add_marker(track_way_marker)
-
     def set_traffic_light_marker(self, point):
         """
-        Встановлює маркер для пройденного шляху
+        Встановлює маркер для світлофора
         :param point: GPS координати
         """
-        traffic_light_marker = MapMarker(lat=point[0], lon=point[1], source="images/traffic_light.png")
-        self.mapview.add_marker(traffic_light_marker)
+        self.defect_layer.add_defect("traffic_light", point[0], point[1])
 
     def change_map_source(self, instance):
         if self.mapview.map_source.url != 'http://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png':
@@ -141,17 +136,23 @@ class MapViewApp(App):
             new_source_url = 'https://{s}.tile.thunderforest.com/transport-dark/{z}/{x}/{y}.png'
         self.mapview.map_source = MapSource(url=new_source_url)
 
-    def show_info_popup(self, distance, speed):
+    def show_info_popup(self, trip_statistics):
         """
-        Показує Popup з інформацією про відстань та швидкість
-        :param distance: відстань
-        :param speed: швидкість
+        Показує Popup з інформацією про поїздку
+        :param trip_statistics: статистика поїздки
         """
+        text = (
+            f"Total distance (km): {trip_statistics.distance_km:.3f}\n"
+            f"Average speed (km/h): {trip_statistics.average_speed_kmh:.1f}\n"
+            f"Max speed (km/h): {trip_statistics.max_speed_kmh:.1f}\n"
+            f"Defects per km: {trip_statistics.defects_per_km:.2f}"
+        )
         if not self.info_popup:
-            self.info_popup = Popup(title='Info', size_hint=(None, None), size=(400, 200))
-            content = Label(text=f'Total distance (km): {distance}\nAverage speed (km/h): {speed}')
-            self.info_popup.content = content
-        self.info_popup.open()
+            self.info_popup = Popup(title='Info', size_hint=(None, None), size=(400, 240))
+            self.info_popup.content = Label()
+        self.info_popup.content.text = text
+        if not self.info_popup.parent:
+            self.info_popup.open()
 
     def build(self):
         """
@@ -159,6 +160,13 @@ class MapViewApp(App):
         :return: мапу
         """
         self.mapview = MapView(lat=50.450173, lon=30.520089, zoom=16)
+        # Шлях малюється під маркерами, тому його шар додається першим
+        self.track_layer = TrackLayer()
+        self.mapview.add_layer(self.track_layer, mode="window")
+        self.defect_layer = DefectLayer()
+        self.mapview.add_layer(self.defect_layer)
+        # Історичні дефекти зі Store для видимої області
+        self.tile_loader = DefectTileLoader(self.mapview, self.defect_layer)
         monitor = get_monitors()[0]
         Window.size = (monitor.width, monitor.height)
 
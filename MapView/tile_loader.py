@@ -0,0 +1,109 @@
+import asyncio
+from collections import OrderedDict
+from functools import partial
+from math import cos, floor, log, pi, radians, tan
+
+import requests
+from kivy import Logger
+from kivy.clock import Clock
+
+from config import STORE_HOST, STORE_PORT
+from defect_layer import DEFECT_KINDS
+
+# Історичні дефекти завантажуються тайлами одного фіксованого зуму, щоб тайли не перекривались
+DATA_ZOOM = 13
+# При меншому зумі на екран потрапляє забагато тайлів, тому історія не завантажується
+MIN_LOAD_ZOOM = 14
+CACHE_SIZE = 64
+DEBOUNCE_SECONDS = 0.3
+MAX_CONCURRENT_REQUESTS = 4
+REQUEST_TIMEOUT_SECONDS = 10
+
+
+def tile_at(zoom, lat, lon):
+    """
+    Повертає номер тайлу (x, y), що містить точку
+    :param zoom: рівень зуму
+    :param lat: широта
+    :param lon: довгота
+    """
+    n = 1 << zoom
+    lat_rad = radians(max(-85.0511, min(85.0511, lat)))
+    x = floor((lon + 180.0) / 360.0 * n)
+    y = floor((1.0 - log(tan(lat_rad) + 1.0 / cos(lat_rad)) / pi) / 2.0 * n)
+    return max(0, min(n - 1, x)), max(0, min(n - 1, y))
+
+
+class DefectTileLoader:
+    """
+    Завантажує зі Store історичні дефекти для видимої області мапи.
+    Запити відкладаються до завершення переміщення мапи, завантажені тайли зберігаються в LRU кеші
+    за ключем (zoom, x, y), а запити тайлів, які вже зникли з екрану, скасовуються.
+    Коли тайл витісняється з кешу, його дефекти прибираються з мапи.
+    """
+
+    def __init__(self, mapview, defect_layer, cache_size=CACHE_SIZE):
+        self.mapview = mapview
+        self.defect_layer = defect_layer
+        self.cache_size = cache_size
+        self._tiles = OrderedDict()
+        self._pending = {}
+        self._semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        self._debounce = Clock.create_trigger(self._load_viewport, DEBOUNCE_SECONDS)
+        mapview.bind(on_map_relocated=self._on_map_relocated)
+
+    def _on_map_relocated(self, *args):
+        # Перезапускаємо таймер, щоб завантаження почалось лише після зупинки мапи
+        self._debounce.cancel()
+        self._debounce()
+
+    def _visible_tiles(self):
+        if self.mapview.zoom < MIN_LOAD_ZOOM:
+            return []
+        lat1, lon1, lat2, lon2 = self.mapview.get_bbox()
+        x1, y1 = tile_at(DATA_ZOOM, max(lat1, lat2), min(lon1, lon2))
+        x2, y2 = tile_at(DATA_ZOOM, min(lat1, lat2), max(lon1, lon2))
+        return [(DATA_ZOOM, x, y) for x in range(x1, x2 + 1) for y in range(y1, y2 + 1)]
+
+    def _load_viewport(self, *args):
+        visible = self._visible_tiles()
+        visible_keys = set(visible)
+        for key in [key for key in self._pending if key not in visible_keys]:
+            self._pending.pop(key).cancel()
+        for key in visible:
+            if key in self._tiles:
+                self._tiles.move_to_end(key)
+            elif key not in self._pending:
+                self._pending[key] = asyncio.ensure_future(self._fetch_tile(key))
+
+    async def _fetch_tile(self, key):
+        zoom, x, y = key
+        url = f"http://{STORE_HOST}:{STORE_PORT}/tiles/{zoom}/{x}/{y}/defects"
+        task = asyncio.current_task()
+        try:
+            async with self._semaphore:
+                loop = asyncio.get_running_loop()
+                response = await loop.run_in_executor(
+                    None, partial(requests.get, url, timeout=REQUEST_TIMEOUT_SECONDS)
+                )
+            response.raise_for_status()
+            self._store_tile(key, response.json())
+        except (requests.RequestException, ValueError) as e:
+            Logger.warning(f"TileLoader: failed to load tile {key}: {e}")
+        finally:
+            if self._pending.get(key) is task:
+                del self._pending[key]
+
+    def _store_tile(self, key, rows):
+        defects = [
+            (DEFECT_KINDS[row["road_state"]], row["latitude"], row["longitude"], row["count"])
+            for row in rows
+            if row["road_state"] in DEFECT_KINDS
+        ]
+        for defect in defects:
+            self.defect_layer.add_defect(*defect)
+        self._tiles[key] = defects
+        while len(self._tiles) > self.cache_size:
+            _, evicted = self._tiles.popitem(last=False)
+            for defect in evicted:
+                self.defect_layer.remove_defect(*defect)
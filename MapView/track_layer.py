@@ -0,0 +1,179 @@
+from kivy.graphics import Color, InstructionGroup, Line, PopMatrix, PushMatrix, Scale, Translate
+from kivy_garden.mapview import MapLayer
+
+TRACK_COLOR = (0.16, 0.44, 0.92, 1)
+CONGESTION_COLOR = (0.91, 0.12, 0.12, 1)
+TRACK_WIDTH = 2
+# Максимальне відхилення спрощеної лінії від реального шляху, пікселі
+SIMPLIFY_TOLERANCE_PX = 1.5
+# Кількість точок в одному шматку шляху. Спрощення перераховується лише для
+# останнього (відкритого) шматка, тому вартість оновлення не залежить від довжини шляху
+CHUNK_SIZE = 256
+
+
+def simplify(points, tolerance):
+    """
+    Спрощує ламану алгоритмом Дугласа-Пекера (ітеративно, без рекурсії)
+    :param points: список точок (x, y)
+    :param tolerance: максимальне відхилення від початкової ламаної
+    :return: спрощений список точок, перша і остання точки зберігаються
+    """
+    if len(points) < 3:
+        return list(points)
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    tolerance_sq = tolerance * tolerance
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        x1, y1 = points[start]
+        x2, y2 = points[end]
+        dx, dy = x2 - x1, y2 - y1
+        length_sq = dx * dx + dy * dy
+        max_dist_sq, index = 0, None
+        for i in range(start + 1, end):
+            px, py = points[i]
+            if length_sq:
+                t = max(0.0, min(1.0, ((px - x1) * dx + (py - y1) * dy) / length_sq))
+                ex, ey = px - x1 - t * dx, py - y1 - t * dy
+            else:
+                ex, ey = px - x1, py - y1
+            dist_sq = ex * ex + ey * ey
+            if dist_sq > max_dist_sq:
+                max_dist_sq, index = dist_sq, i
+        if index is not None and max_dist_sq > tolerance_sq:
+            keep[index] = True
+            stack.append((start, index))
+            stack.append((index, end))
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+class _TrackChunk:
+    """Шматок шляху одного кольору з кешем спрощених ліній для кожного зуму"""
+
+    def __init__(self, congested, points=None):
+        self.congested = congested
+        self.points = list(points or [])
+        self.lines = {}
+        self.instruction = None
+
+    def line_points(self, map_source, zoom, origin):
+        """
+        Повертає спрощені точки шматка для заданого зуму
+        :param map_source: джерело мапи (проєкція)
+        :param zoom: рівень зуму
+        :param origin: світові координати початку шляху на цьому зумі
+        :return: плаский список [x1, y1, x2, y2, ...] відносно origin
+        """
+        cached = self.lines.get(zoom)
+        if cached is None:
+            ox, oy = origin
+            projected = [
+                (map_source.get_x(zoom, lon) - ox, map_source.get_y(zoom, lat) - oy)
+                for lat, lon in self.points
+            ]
+            cached = [c for point in simplify(projected, SIMPLIFY_TOLERANCE_PX) for c in point]
+            self.lines[zoom] = cached
+        return cached
+
+
+class TrackLayer(MapLayer):
+    """
+    Шар, який малює пройдений шлях лініями на canvas замість окремого маркера на кожну точку.
+    Лінії зберігаються в локальних піксельних координатах поточного зуму, тому при
+    переміщенні мапи змінюються лише Translate/Scale, а не точки ліній.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._chunks = []
+        self._origin = None
+        self._zoom = None
+        self._map_source = None
+        with self.canvas:
+            PushMatrix()
+            self._translate = Translate()
+            self._scale = Scale()
+            self._lines = InstructionGroup()
+            PopMatrix()
+
+    def add_point(self, lat, lon, congested=False):
+        """
+        Додає точку до шляху
+        :param lat: широта
+        :param lon: довгота
+        :param congested: чи є затор на цій ділянці
+        """
+        self.add_points([(lat, lon, congested)])
+
+    def add_points(self, points):
+        """
+        Додає кілька точок до шляху; лінії перебудовуються один раз для всієї пачки
+        :param points: список (широта, довгота, чи є затор)
+        """
+        first_changed = max(len(self._chunks) - 1, 0)
+        for lat, lon, congested in points:
+            if self._origin is None:
+                self._origin = (lat, lon)
+            last = self._chunks[-1] if self._chunks else None
+            if last is None:
+                self._chunks.append(_TrackChunk(congested, [(lat, lon)]))
+            elif last.congested != congested or len(last.points) >= CHUNK_SIZE:
+                # Новий шматок починається з останньої точки попереднього, щоб лінія не розривалась
+                self._chunks.append(_TrackChunk(congested, [last.points[-1], (lat, lon)]))
+            else:
+                last.points.append((lat, lon))
+                last.lines.clear()
+        self._redraw_from(first_changed)
+
+    def reposition(self):
+        mapview = self.parent
+        if mapview is None or self._origin is None:
+            return
+        zoom = mapview.zoom
+        if mapview.map_source is not self._map_source:
+            # Інше джерело може мати інший розмір тайлу, кеш проєкцій більше не валідний
+            self._map_source = mapview.map_source
+            self._zoom = None
+            for chunk in self._chunks:
+                chunk.lines.clear()
+        if zoom != self._zoom:
+            self._zoom = zoom
+            self._rebuild()
+        self._translate.xy = mapview.get_window_xy_from(*self._origin, zoom)
+        self._scale.xyz = (mapview.scale, mapview.scale, 1)
+
+    def unload(self):
+        self._lines.clear()
+        for chunk in self._chunks:
+            chunk.instruction = None
+
+    def _origin_px(self):
+        lat, lon = self._origin
+        return self._map_source.get_x(self._zoom, lon), self._map_source.get_y(self._zoom, lat)
+
+    def _draw_chunk(self, chunk, origin):
+        points = chunk.line_points(self._map_source, self._zoom, origin)
+        if chunk.instruction is None:
+            chunk.instruction = Line(points=points, width=TRACK_WIDTH)
+            self._lines.add(Color(*(CONGESTION_COLOR if chunk.congested else TRACK_COLOR)))
+            self._lines.add(chunk.instruction)
+        else:
+            chunk.instruction.points = points
+
+    def _rebuild(self):
+        self._lines.clear()
+        origin = self._origin_px()
+        for chunk in self._chunks:
+            chunk.instruction = None
+            self._draw_chunk(chunk, origin)
+
+    def _redraw_from(self, first_changed):
+        if self._zoom is None:
+            # Шар ще не малювався (або змінилось джерело мапи) - будуємо всі лінії одразу
+            self.reposition()
+            return
+        origin = self._origin_px()
+        for chunk in self._chunks[first_changed:]:
+            if chunk.instruction is None or self._zoom not in chunk.lines:
+                self._draw_chunk(chunk, origin)
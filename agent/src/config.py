@@ -1,5 +1,7 @@
 import os
 
+from road_vision.mqtt import MqttSettings
+
 
 def try_parse(type, value: str):
     try:
@@ -15,7 +17,22 @@ MQTT_BROKER_PORT = try_parse(int, os.environ.get("MQTT_BROKER_PORT")) or 1883
 MQTT_AGENT_TOPIC = os.environ.get("MQTT_AGENT_TOPIC") or "agent"
 MQTT_PARKING_TOPIC = os.environ.get("MQTT_PARKING_TOPIC") or "parking"
 MQTT_TRAFFIC_TOPIC = os.environ.get("MQTT_TRAFFIC_TOPIC") or "traffic"
+# QoS, session and in-flight window, see road_vision.mqtt for the MQTT_* variables
+MQTT_SETTINGS = MqttSettings.from_env("MQTT_", "agent")
+# Publish to partitioned topics <topic>/<partition>/<key> (road_vision.partitioning), 0 to use the topics as they are
+MQTT_PARTITIONS = try_parse(int, os.environ.get("MQTT_PARTITIONS")) or 0
 
 
-# Delay for sending data to mqtt in seconds
+# Delay for sending data to mqtt in seconds, one GPS interval of the recording is sent per DELAY
 DELAY = try_parse(float, os.environ.get("DELAY")) or 1
+# Accelerometer rows recorded per GPS row; by default both recordings are assumed to cover the same time
+ACCELEROMETER_SAMPLES_PER_GPS_ROW = try_parse(float, os.environ.get("ACCELEROMETER_SAMPLES_PER_GPS_ROW"))
+
+# Logging, see road_vision.logs
+LOG_LEVEL = os.environ.get("LOG_LEVEL") or "INFO"
+# "json" or "text"
+LOG_FORMAT = os.environ.get("LOG_FORMAT") or "json"
+# Set LOG_FILE to an empty string to log only to the console
+LOG_FILE = os.environ.get("LOG_FILE", "app.log")
+# Maximum records per second logged through the root logger (module level logging.info etc.)
+LOG_RATE_LIMIT = try_parse(int, os.environ.get("LOG_RATE_LIMIT")) or 100
@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 from datetime import datetime
 from domain.accelerometer import Accelerometer
@@ -11,3 +11,7 @@ class AggregatedData:
     gps: Gps
     timestamp: datetime
     user_id: int
+    # Pipeline trace stamps, see road_vision.tracing
+    trace: dict = field(default_factory=dict)
+    # Sequence number, unique per user across agent restarts; lets the hub and the Store drop repeated readings
+    seq: int = None
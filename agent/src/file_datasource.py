@@ -1,11 +1,14 @@
+import time
 from csv import reader
-from datetime import datetime
+from datetime import datetime, timedelta
+from typing import List
 from domain.accelerometer import Accelerometer
 from domain.gps import Gps
 from domain.aggregated_data import AggregatedData
 from domain.parking import Parking
 import config
 from domain.traffic import Traffic
+from sensor_fusion import SensorFusion
 
 
 class FileDatasource:
@@ -20,18 +23,22 @@ class FileDatasource:
         self.gps_filename = gps_filename
         self.parking_filename = parking_filename
         self.traffic_filename = traffic_filename
+        # Нумерація показань починається з часу запуску в мікросекундах, тому номери не повторюються після
+        # перезапуску агента
+        self.seq = time.time_ns() // 1000
 
     def read(self, accelerometer_data, gps_data, parking_data, traffic_data) -> (AggregatedData, Parking, Traffic):
         """Метод повертає дані отримані з датчиків"""
         x, y, z = map(int, next(accelerometer_data))
-        longitude, latitude = map(float, next(gps_data))
+        latitude, longitude = map(float, next(gps_data))
         empty_count = int(next(parking_data)[0])
         vehicle_count = int(next(traffic_data)[0])
         return AggregatedData(
             Accelerometer(x, y, z),
             Gps(longitude, latitude),
             datetime.now(),
-            config.USER_ID
+            config.USER_ID,
+            seq=self._next_seq()
         ), Parking(
             empty_count,
             Gps(longitude, latitude)
@@ -39,6 +46,50 @@ class FileDatasource:
             vehicle_count
         )
 
+    def read_batch(self, fusion: SensorFusion, parking_data, traffic_data,
+                   interval: float) -> (List[AggregatedData], Parking, Traffic):
+        """
+        Метод повертає всі показання акселерометра одного GPS інтервалу з інтерпольованими координатами,
+        а також паркування і трафік в кінці інтервалу. Інтервал триває interval секунд і закінчується зараз.
+        """
+        samples, gps = fusion.next_batch()
+        empty_count = int(next(parking_data)[0])
+        vehicle_count = int(next(traffic_data)[0])
+        now = datetime.now()
+        return [
+            AggregatedData(
+                accelerometer,
+                sample_gps,
+                now - timedelta(seconds=interval * (1 - fraction)),
+                config.USER_ID,
+                seq=self._next_seq()
+            )
+            for accelerometer, sample_gps, fraction in samples
+        ], Parking(
+            empty_count,
+            gps
+        ), Traffic(
+            vehicle_count
+        )
+
+    def fusion(self, accelerometer_data, gps_data) -> SensorFusion:
+        """Метод створює SensorFusion для даних, отриманих з startReading"""
+        samples_per_gps_row = config.ACCELEROMETER_SAMPLES_PER_GPS_ROW or self._samples_per_gps_row()
+        return SensorFusion(accelerometer_data, gps_data, samples_per_gps_row)
+
+    def _next_seq(self) -> int:
+        self.seq += 1
+        return self.seq
+
+    def _samples_per_gps_row(self) -> float:
+        """Записи обох датчиків охоплюють один і той самий проміжок часу, тому співвідношення рядків дорівнює
+        співвідношенню частот"""
+        with open(self.accelerometer_filename, "r") as file:
+            accelerometer_rows = sum(1 for _ in file) - 1
+        with open(self.gps_filename, "r") as file:
+            gps_rows = sum(1 for _ in file) - 1
+        return (accelerometer_rows - 1) / max(1, gps_rows - 1)
+
     def startReading(self):
         """Метод повинен викликатись перед початком читання даних"""
         accelerometer_file = open(self.accelerometer_filename, "r")
@@ -1,6 +1,11 @@
-from paho.mqtt import client as mqtt_client
 import json
+import logging
 import time
+from road_vision import geohash, mqtt
+from road_vision.logs import setup_logging
+from road_vision.mqtt import MqttSettings, PublishTracker, create_client
+from road_vision.partitioning import PARKING_KEY_PRECISION, partition_topic
+from road_vision.tracing import AGENT_SEND, stamp
 from schema.aggregated_data_schema import AggregatedDataSchema
 from schema.parking_schema import ParkingSchema
 from file_datasource import FileDatasource
@@ -8,63 +13,69 @@ import config
 from schema.traffic_schema import TrafficSchema
 
 
-def connect_mqtt(broker, port):
+def connect_mqtt(broker, port, settings: MqttSettings, tracker: PublishTracker):
     """Create MQTT client"""
-    print(f"CONNECT TO {broker}:{port}")
+    logging.info("Connecting to MQTT broker %s:%s", broker, port)
 
     def on_connect(client, userdata, flags, rc):
         if rc == 0:
-            print(f"Connected to MQTT Broker ({broker}:{port})!")
+            logging.info("Connected to MQTT broker (%s:%s)", broker, port)
         else:
-            print("Failed to connect {broker}:{port}, return code %d\n", rc)
+            logging.error("Failed to connect to %s:%s, return code %d", broker, port, rc)
             exit(rc)  # Stop execution
 
-    client = mqtt_client.Client()
+    client = create_client(settings, tracker)
     client.on_connect = on_connect
-    client.connect(broker, port)
+    client.connect(broker, port, settings.keepalive)
     client.loop_start()
     return client
 
 
-def publish(client, agent_topic, parking_topic, traffic_topic, datasource, delay):
+def publish(client, settings, tracker, agent_topic, parking_topic, traffic_topic, datasource, delay, partitions=0):
     accelerometer_data, gps_data, parking_data, traffic_data, accelerometer_file, gps_file, parking_file, traffic_file = datasource.startReading()
 
-    while gps_data:
-        time.sleep(delay)
-        agent_data, parking_agent_data, read_traffic_data = datasource.read(accelerometer_data, gps_data, parking_data, traffic_data)
-        agent_msg, parking_msg, traffic_msg = AggregatedDataSchema().dumps(agent_data), ParkingSchema().dumps(parking_agent_data), TrafficSchema().dumps(read_traffic_data)
-
-        # result: [0, 1]
-        agent_result = client.publish(agent_topic, agent_msg)
-        agent_status = agent_result[0]
-        if agent_status == 0:
-            pass
-            # print(f"Send `{agent_msg}` to topic `{agent_topic}`")
-        else:
-            print(f"Failed to send message to topic {agent_topic}")
+    fusion = datasource.fusion(accelerometer_data, gps_data)
+    agent_schema = AggregatedDataSchema(many=True)
+    user_id = config.USER_ID
 
-        parking_result = client.publish(parking_topic, parking_msg)
-        parking_status = agent_result[0]
-        if parking_status == 0:
-            pass
-            # print(f"Send `{parking_msg}` to topic `{parking_topic}`")
-        else:
-            print(f"Failed to send message to topic {parking_topic}")
+    while True:
+        time.sleep(delay)
+        try:
+            # All accelerometer samples of one GPS interval are sent in one message
+            agent_batch, parking_agent_data, read_traffic_data = datasource.read_batch(fusion, parking_data, traffic_data, delay)
+        except StopIteration:
+            break
+        for agent_data in agent_batch:
+            stamp(agent_data.trace, AGENT_SEND)
+        agent_msg, parking_msg, traffic_msg = agent_schema.dumps(agent_batch), ParkingSchema().dumps(parking_agent_data), TrafficSchema().dumps(read_traffic_data)
 
-        traffic_result = client.publish(traffic_topic, traffic_msg)
-        traffic_status = traffic_result[0]
-        if traffic_status == 0:
-            pass
-            # print(f"Send `{traffic_msg}` to topic `{traffic_topic}`")
-        else:
-            print(f"Failed to send message to topic {traffic_topic}")
+        # Agent and traffic readings of a vehicle go to the same partition, parking readings by the zone
+        zone = geohash.encode(parking_agent_data.gps.latitude, parking_agent_data.gps.longitude,
+                              PARKING_KEY_PRECISION) if partitions else None
+        # Failures are logged by mqtt.publish and counted by the tracker
+        if agent_batch:
+            mqtt.publish(client, settings, partition_topic(agent_topic, user_id, partitions), agent_msg, tracker)
+        mqtt.publish(client, settings, partition_topic(parking_topic, zone, partitions), parking_msg, tracker)
+        mqtt.publish(client, settings, partition_topic(traffic_topic, user_id, partitions), traffic_msg, tracker)
 
     datasource.stopReading(accelerometer_file, gps_file, parking_file, traffic_file)
+    logging.info(
+        "Published %d messages, %d acknowledged by the broker, %d failed",
+        tracker.published, tracker.acknowledged, tracker.failed,
+    )
 
 
 def run():
+    setup_logging(
+        "agent",
+        level=config.LOG_LEVEL,
+        json_output=config.LOG_FORMAT == "json",
+        log_file=config.LOG_FILE,
+        rate_limits={"": config.LOG_RATE_LIMIT},
+    )
     # Prepare mqtt client
-    client = connect_mqtt(config.MQTT_BROKER_HOST, config.MQTT_BROKER_PORT)
+    tracker = PublishTracker()
+    client = connect_mqtt(config.MQTT_BROKER_HOST, config.MQTT_BROKER_PORT, config.MQTT_SETTINGS, tracker)
     # Prepare datasource
     datasource = FileDatasource(
         "data/accelerometer.csv",
@@ -73,7 +84,8 @@ def run():
         "data/traffic.csv"
     )
     # Infinity publish data
-    publish(client, config.MQTT_AGENT_TOPIC, config.MQTT_PARKING_TOPIC, config.MQTT_TRAFFIC_TOPIC, datasource, config.DELAY)
+    publish(client, config.MQTT_SETTINGS, tracker, config.MQTT_AGENT_TOPIC, config.MQTT_PARKING_TOPIC, config.MQTT_TRAFFIC_TOPIC, datasource,
+            config.DELAY, config.MQTT_PARTITIONS)
 
 
 if __name__ == "__main__":
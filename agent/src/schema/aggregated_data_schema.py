@@ -8,3 +8,5 @@ class AggregatedDataSchema(Schema):
     gps = fields.Nested(GpsSchema)
     timestamp = fields.DateTime("iso")
     user_id = fields.Int()
+    trace = fields.Dict(keys=fields.Str(), values=fields.Float())
+    seq = fields.Int(allow_none=True)
@@ -3,5 +3,5 @@ from marshmallow import Schema, fields
 
 
 class ParkingSchema(Schema):
-    empty_count = fields.Number()
+    empty_count = fields.Int()
     gps = fields.Nested(GpsSchema)
\ No newline at end of file
@@ -0,0 +1,68 @@
+from typing import Iterator, List, Tuple
+
+from domain.accelerometer import Accelerometer
+from domain.gps import Gps
+
+
+def interpolate(start: Gps, end: Gps, fraction: float) -> Gps:
+    """Лінійна інтерполяція між двома GPS точками, fraction від 0 (start) до 1 (end)"""
+    return Gps(
+        start.longitude + (end.longitude - start.longitude) * fraction,
+        start.latitude + (end.latitude - start.latitude) * fraction,
+    )
+
+
+class SensorFusion:
+    """
+    Поєднує акселерометр і GPS з різною частотою запису.
+
+    Кожен рядок акселерометра зберігається, а його позиція інтерполюється між сусідніми GPS точками.
+    next_batch повертає всі показання акселерометра одного інтервалу між двома GPS точками разом з часткою
+    інтервалу (0..1), на якій кожне з них записане.
+    """
+
+    def __init__(self, accelerometer_data: Iterator[List[str]], gps_data: Iterator[List[str]],
+                 samples_per_gps_row: float):
+        self.accelerometer_data = accelerometer_data
+        self.gps_data = gps_data
+        self.samples_per_gps_row = samples_per_gps_row
+        self._sample_index = 0
+        self._gps_index = 0
+        self._done = False
+        self._start = self._read_gps()
+        self._end = self._read_gps()
+
+    def next_batch(self) -> Tuple[List[Tuple[Accelerometer, Gps, float]], Gps]:
+        """
+        Повертає показання акселерометра поточного GPS інтервалу з інтерпольованими координатами та
+        кінцеву GPS точку інтервалу. StopIteration, коли закінчились дані GPS або акселерометра.
+        """
+        if self._done or self._end is None:
+            raise StopIteration
+        batch = []
+        while True:
+            # Позиція показання в одиницях GPS рядків
+            position = self._sample_index / self.samples_per_gps_row
+            if position >= self._gps_index + 1:
+                break
+            row = next(self.accelerometer_data, None)
+            if row is None:
+                self._done = True
+                break
+            fraction = position - self._gps_index
+            x, y, z = map(int, row)
+            batch.append((Accelerometer(x, y, z), interpolate(self._start, self._end, fraction), fraction))
+            self._sample_index += 1
+        if self._done and not batch:
+            raise StopIteration
+        end = self._end
+        self._start, self._end = end, self._read_gps()
+        self._gps_index += 1
+        return batch, end
+
+    def _read_gps(self):
+        row = next(self.gps_data, None)
+        if row is None:
+            return None
+        latitude, longitude = map(float, row)
+        return Gps(longitude, latitude)
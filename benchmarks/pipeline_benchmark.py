@@ -0,0 +1,309 @@
+"""
+End-to-end benchmark of the agent -> edge -> hub -> store pipeline.
+
+All services run in this process: MQTT hops call the subscriber's on_message directly with the payload
+the publisher would have sent, Redis is replaced by fakeredis and the Store writes to SQLite. The hub's
+HTTP call to the Store goes through StoreApiAdapter and is answered in-process by the Store endpoint.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager, redirect_stderr, redirect_stdout
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+import fakeredis
+from road_vision.entities import parking_zone_data_batch
+from road_vision.logs import stop_logging
+from road_vision.tracing import STORE_COMMIT, end_to_end
+from starlette.requests import Request
+
+from services import ROOT, service_modules
+
+STAGES = ("agent", "edge", "hub", "store")
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+
+class StageClock:
+    """Splits the thread CPU time between nested pipeline stages, each stage gets its exclusive time."""
+
+    def __init__(self):
+        self.cpu_seconds = {stage: 0.0 for stage in STAGES}
+        self._stack = []
+        self._last = time.thread_time()
+
+    def _switch(self):
+        now = time.thread_time()
+        if self._stack:
+            self.cpu_seconds[self._stack[-1]] += now - self._last
+        self._last = now
+
+    @contextmanager
+    def stage(self, name):
+        self._switch()
+        self._stack.append(name)
+        try:
+            yield
+        finally:
+            self._switch()
+            self._stack.pop()
+
+
+class Message:
+    """Stand-in for paho's MQTTMessage, the adapters only read topic and payload."""
+
+    def __init__(self, topic: str, payload: str):
+        self.topic = topic
+        self.payload = payload.encode("utf-8")
+
+
+class Response:
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+
+
+class Pipeline:
+    def __init__(self, workdir: str, batch_size: int, queue_backend: str, delta_filter: bool, group_commit_ms: float,
+                 store_stream: bool):
+        self.clock = StageClock()
+        self.latencies = []
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'store.db')}"
+        os.environ["BATCH_SIZE"] = str(batch_size)
+        os.environ["QUEUE_BACKEND"] = queue_backend
+        os.environ["GROUP_COMMIT_MAX_DELAY_MS"] = str(group_commit_ms)
+        os.environ["STORE_API_STREAM"] = str(store_stream).lower()
+        self.loop = asyncio.new_event_loop()
+
+        with service_modules("store", workdir) as import_module:
+            self.store = import_module("main")
+        self.store.metadata.create_all(self.store.engine)
+        # Latency is taken from the trace of every committed reading: agent send -> store commit
+        observe_trace = self.store.observe_trace
+
+        def record_latency(trace):
+            self.latencies.append(end_to_end(trace, STORE_COMMIT))
+            observe_trace(trace)
+
+        self.store.observe_trace = record_latency
+
+        with service_modules("hub", workdir) as import_module, \
+                mock.patch("redis.Redis", fakeredis.FakeRedis), \
+                mock.patch("paho.mqtt.client.Client.connect"), \
+                mock.patch("paho.mqtt.client.Client.loop_start"):
+            self.hub = import_module("main")
+
+        with service_modules("edge", workdir) as import_module:
+            agent_adapter_module = import_module("app.adapters.agent_mqtt_adapter")
+            hub_gateway_module = import_module("app.interfaces.hub_gateway")
+            delta_filter_module = import_module("app.usecases.delta_filter")
+        pipeline = self
+
+        class InProcessHubGateway(hub_gateway_module.HubGateway):
+            """Publishes like HubMqttAdapter and delivers the payload straight to the hub subscriber."""
+
+            def save_data(self, processed_data):
+                payload = processed_data.model_dump_json()
+                with pipeline.clock.stage("hub"):
+                    pipeline.hub.on_message(None, None, Message("processed_agent_data_topic", payload))
+                return True
+
+            def save_parking_data(self, parking_zones):
+                payload = parking_zone_data_batch.dump_json(parking_zones).decode("utf-8")
+                with pipeline.clock.stage("hub"):
+                    pipeline.hub.on_message(None, None, Message("parking_zone_data_topic", payload))
+                return True
+
+        self.edge = agent_adapter_module.AgentMQTTAdapter(
+            "localhost", 1883, "agent_data_topic", "traffic_data_topic", InProcessHubGateway(),
+            parking_topic="parking_data_topic",
+            delta_filter=delta_filter_module.DeltaFilter() if delta_filter else None,
+        )
+
+        with service_modules("agent/src", workdir) as import_module:
+            file_datasource = import_module("file_datasource")
+            self.agent_schema = import_module("schema.aggregated_data_schema").AggregatedDataSchema(many=True)
+            self.parking_schema = import_module("schema.parking_schema").ParkingSchema()
+            self.traffic_schema = import_module("schema.traffic_schema").TrafficSchema()
+        data_dir = os.path.join(ROOT, "agent", "src", "data")
+        self.datasource = file_datasource.FileDatasource(
+            *(os.path.join(data_dir, name) for name in ("accelerometer.csv", "gps.csv", "parking.csv", "traffic.csv"))
+        )
+
+    def post_to_store(self, url, data, headers):
+        """Answers StoreApiAdapter's POST with the Store endpoint, without a network round trip."""
+        if url.endswith("/parking_data/"):
+            with self.clock.stage("store"):
+                self.store.create_parking_data(parking_zone_data_batch.validate_json(data))
+            return Response(200)
+        stream = url.endswith("/stream")
+        scope = {
+            "type": "http",
+            "method": "POST",
+            "path": "/processed_agent_data/stream" if stream else "/processed_agent_data/",
+            "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+        }
+        # The streaming adapter passes a generator, which requests would send with chunked encoding
+        chunks = iter([data] if isinstance(data, bytes) else data)
+
+        async def receive():
+            chunk = next(chunks, None)
+            return {"type": "http.request", "body": chunk or b"", "more_body": chunk is not None}
+
+        endpoint = self.store.stream_processed_agent_data if stream else self.store.create_processed_agent_data
+        with self.clock.stage("store"):
+            self.loop.run_until_complete(endpoint(Request(scope, receive)))
+        return Response(200)
+
+    def readings(self, count):
+        """
+        Yields (agent batch, parking, traffic) per GPS interval like the agent, re-reading the CSV files when they
+        run out, until ``count`` accelerometer samples were produced.
+        """
+        base = datetime(2024, 1, 1)
+        files = self.datasource.startReading()
+        fusion = self.datasource.fusion(*files[:2])
+        produced = 0
+        while produced < count:
+            try:
+                agent_batch, parking_data, traffic_data = self.datasource.read_batch(fusion, *files[2:4], 1.0)
+            except StopIteration:
+                self.datasource.stopReading(*files[4:])
+                files = self.datasource.startReading()
+                fusion = self.datasource.fusion(*files[:2])
+                continue
+            agent_batch = agent_batch[:count - produced]
+            for agent_data in agent_batch:
+                # Unique event time, like readings of a real trip
+                agent_data.timestamp = base + timedelta(microseconds=produced)
+                produced += 1
+            yield agent_batch, parking_data, traffic_data
+        self.datasource.stopReading(*files[4:])
+
+    def run(self, count):
+        with mock.patch("requests.post", self.post_to_store):
+            started = time.perf_counter()
+            readings = self.readings(count)
+            while True:
+                with self.clock.stage("agent"):
+                    try:
+                        agent_batch, parking_data, traffic_data = next(readings)
+                    except StopIteration:
+                        break
+                    agent_msg = self.agent_schema.dumps(agent_batch)
+                    parking_msg = self.parking_schema.dumps(parking_data)
+                    traffic_msg = self.traffic_schema.dumps(traffic_data)
+                with self.clock.stage("edge"):
+                    self.edge.on_message(None, None, Message("agent_data_topic", agent_msg))
+                    self.edge.on_message(None, None, Message("traffic_data_topic", traffic_msg))
+                    self.edge.on_message(None, None, Message("parking_data_topic", parking_msg))
+            return time.perf_counter() - started
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(name, readings, batch_size, queue_backend, delta_filter, group_commit_ms, store_stream):
+    with tempfile.TemporaryDirectory() as workdir:
+        # Keep the services' logging and print cost in the measurement, but not on the terminal; the services
+        # set up logging on import, so the console handlers are created while stderr is redirected
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull), redirect_stderr(devnull):
+            pipeline = Pipeline(workdir, batch_size, queue_backend, delta_filter, group_commit_ms, store_stream)
+            wall_seconds = pipeline.run(readings)
+            stop_logging()
+        pipeline.store.engine.dispose()
+    latencies_ms = [latency * 1000 for latency in pipeline.latencies]
+    stored = len(latencies_ms)
+    return {
+        "name": name,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "config": {"readings": readings, "batch_size": batch_size, "queue_backend": queue_backend,
+                   "delta_filter": delta_filter, "group_commit_ms": group_commit_ms, "store_stream": store_stream},
+        "readings_stored": stored,
+        "wall_seconds": wall_seconds,
+        "throughput_per_second": stored / wall_seconds if wall_seconds else 0.0,
+        "latency_ms": {
+            "p50": percentile(latencies_ms, 0.50),
+            "p99": percentile(latencies_ms, 0.99),
+            "max": max(latencies_ms, default=None),
+        },
+        "cpu_seconds": pipeline.clock.cpu_seconds,
+        "cpu_us_per_reading": {
+            stage: seconds / readings * 1e6 for stage, seconds in pipeline.clock.cpu_seconds.items()
+        },
+    }
+
+
+def flatten(result, prefix=""):
+    for key, value in result.items():
+        if isinstance(value, dict):
+            yield from flatten(value, f"{prefix}{key}.")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield f"{prefix}{key}", value
+
+
+def print_report(result, baseline=None):
+    baseline_values = dict(flatten(baseline)) if baseline else {}
+    for key, value in flatten(result):
+        if key.startswith("config."):
+            continue
+        line = f"{key:32} {value:14.3f}"
+        previous = baseline_values.get(key)
+        if previous:
+            line += f"   {(value - previous) / previous * 100:+7.1f}% vs {baseline['name']}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readings", type=int, default=5000,
+                        help="number of accelerometer readings to send, in batches of one GPS interval")
+    parser.add_argument("--batch-size", type=int, default=20, help="hub batch size (BATCH_SIZE)")
+    parser.add_argument("--queue-backend", default="redis", choices=("redis", "memory"),
+                        help="hub queue backend (QUEUE_BACKEND), redis is replaced by fakeredis")
+    parser.add_argument("--delta-filter", action="store_true", help="enable the edge delta filter")
+    parser.add_argument("--group-commit-ms", type=float, default=0,
+                        help="Store GROUP_COMMIT_MAX_DELAY_MS, 0 commits every hub request on its own")
+    parser.add_argument("--store-stream", action="store_true",
+                        help="hub sends gzip NDJSON to the Store's streaming endpoint (STORE_API_STREAM)")
+    parser.add_argument("--name", default=None, help="result name, defaults to the current time")
+    parser.add_argument("--compare", default=None, help="result file to compare against")
+    parser.add_argument("--no-save", action="store_true", help="do not write the result file")
+    args = parser.parse_args()
+
+    name = args.name or datetime.now().strftime("%Y%m%d-%H%M%S")
+    result = run_benchmark(name, args.readings, args.batch_size, args.queue_backend, args.delta_filter,
+                           args.group_commit_ms, args.store_stream)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{name}.json")
+        with open(path, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Saved {path}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
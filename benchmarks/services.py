@@ -0,0 +1,37 @@
+import importlib
+import os
+import sys
+from contextlib import contextmanager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Top-level modules that exist in more than one service and would shadow each other in one process
+SHADOWED_MODULES = ("app", "config", "main", "metrics", "domain", "schema", "file_datasource")
+
+
+def _shadowed(name):
+    return name.split(".")[0] in SHADOWED_MODULES
+
+
+@contextmanager
+def service_modules(service_dir, cwd):
+    """
+    Import modules of one service (agent/src, edge, hub, store) in isolation.
+    Inside the block the service directory is first on sys.path and the shadowed module names are free;
+    on exit they are removed again, while the imported module objects stay usable through the references
+    the caller keeps.
+    """
+    saved = {name: module for name, module in sys.modules.items() if _shadowed(name)}
+    for name in saved:
+        del sys.modules[name]
+    sys.path.insert(0, os.path.join(ROOT, service_dir))
+    previous_cwd = os.getcwd()
+    # Services write app.log into the working directory
+    os.chdir(cwd)
+    try:
+        yield importlib.import_module
+    finally:
+        os.chdir(previous_cwd)
+        sys.path.remove(os.path.join(ROOT, service_dir))
+        for name in [name for name in sys.modules if _shadowed(name)]:
+            del sys.modules[name]
+        sys.modules.update(saved)
@@ -1,8 +1,19 @@
 import logging
-import paho.mqtt.client as mqtt
+import time
+from dataclasses import replace
+from datetime import datetime
+from typing import Dict, List, Optional
+from road_vision.entities import agent_data_batch
+from road_vision.mqtt import MqttSettings, create_client, subscribe
+from road_vision.partitioning import split_topic, subscriptions
+from road_vision.tracing import EDGE_PROCESS, EDGE_RECEIVE, stamp
+import metrics
 from app.interfaces.agent_gateway import AgentGateway
 from app.entities.agent_data import AgentData, GpsData, TrafficData
+from app.entities.parking_data import ParkingData
 from app.usecases.data_processing import process_agent_data
+from app.usecases.delta_filter import DeltaFilter
+from app.usecases.parking_aggregation import ParkingAggregator
 from app.interfaces.hub_gateway import HubGateway
 
 
@@ -14,7 +25,12 @@ class AgentMQTTAdapter(AgentGateway):
         agent_topic,
         traffic_topic,
         hub_gateway: HubGateway,
+        parking_topic=None,
+        parking_aggregator: ParkingAggregator = None,
+        delta_filter: DeltaFilter = None,
         batch_size=10,
+        mqtt_settings: MqttSettings = None,
+        partitions: Optional[List[int]] = None,
     ):
         self.batch_size = batch_size
         # MQTT
@@ -22,44 +38,91 @@ class AgentMQTTAdapter(AgentGateway):
         self.broker_port = broker_port
         self.agent_topic = agent_topic
         self.traffic_topic = traffic_topic
-        self.client = mqtt.Client()
+        self.parking_topic = parking_topic
+        # Partitions of the agent topics this instance consumes, see road_vision.partitioning;
+        # None subscribes to the unpartitioned topics
+        self.partitions = partitions
+        # QoS per topic, session and in-flight window
+        self.mqtt_settings = mqtt_settings or MqttSettings()
+        if partitions is not None and not self.mqtt_settings.clean_session:
+            # A persistent session would keep the subscriptions of an earlier partition assignment, and this
+            # instance would go on receiving partitions that another instance owns now
+            logging.info("Using a clean MQTT session for the partitioned agent topics")
+            self.mqtt_settings = replace(self.mqtt_settings, clean_session=True)
+        self.client = create_client(self.mqtt_settings)
         # Hub
         self.hub_gateway = hub_gateway
-        self.pair = []
+        # Agent readings and traffic reading waiting for their counterpart, per user (topic key); the key is None for
+        # unpartitioned topics, which carry no user id for traffic readings
+        self.pairs: Dict[Optional[str], dict] = {}
+        # Parking readings are aggregated per zone, only changed aggregates are sent to the hub
+        self.parking_aggregator = parking_aggregator or ParkingAggregator()
+        # Readings that carry nothing new are not sent to the hub; None forwards every reading
+        self.delta_filter = delta_filter
 
     def on_connect(self, client, userdata, flags, rc):
         if rc == 0:
             logging.info("Connected to MQTT broker")
-            self.client.subscribe(self.agent_topic)
-            self.client.subscribe(self.traffic_topic)
+            topics = [self.agent_topic, self.traffic_topic]
+            if self.parking_topic:
+                topics.append(self.parking_topic)
+            subscribe(self.client, self.mqtt_settings,
+                      [topic_filter for topic in topics for topic_filter in subscriptions(topic, self.partitions)])
         else:
             logging.info(f"Failed to connect to MQTT broker with code: {rc}")
 
     def on_message(self, client, userdata, msg):
         """Processing agent data and sent it to hub gateway"""
         try:
+            received_at = time.time()
             payload: str = msg.payload.decode("utf-8")
+            topic, key = split_topic(msg.topic, self.partitions is not None)
+            if topic == self.parking_topic:
+                self.on_parking_data(ParkingData.model_validate_json(payload, strict=True))
+                return
+            pair = self.pairs.setdefault(key, {})
             # Create AgentData instance with the received data
-            if "vehicle_count" in payload:
-                traffic_data = TrafficData.model_validate_json(payload, strict=True)
-                self.pair.append(traffic_data)
+            if topic == self.traffic_topic:
+                pair[TrafficData] = TrafficData.model_validate_json(payload, strict=True)
             else:
-                agent_data = AgentData.model_validate_json(payload, strict=True)
-                self.pair.append(agent_data)
+                # A JSON array holds the accelerometer samples of one GPS interval
+                if payload.startswith("["):
+                    batch = agent_data_batch.validate_json(payload, strict=True)
+                else:
+                    batch = [AgentData.model_validate_json(payload, strict=True)]
+                for agent_data in batch:
+                    stamp(agent_data.trace, EDGE_RECEIVE, received_at)
+                pair[AgentData] = batch
             # Process the received data (you can call a use case here if needed)
-            if len(self.pair) == 2:
-                processed_data = process_agent_data(self.pair[0], self.pair[1])
-                self.pair = []
-                # Store the agent_data in the database (you can send it to the data processing module)
-                if not self.hub_gateway.save_data(processed_data):
-                    logging.error("Hub is not available")
+            if len(pair) == 2:
+                del self.pairs[key]
+                # Every sample of the interval is processed with the traffic reading of the interval
+                for agent_data in pair[AgentData]:
+                    self.process(agent_data, pair[TrafficData])
         except Exception as e:
-            logging.info(f"Error processing MQTT message: {e}")
+            logging.info("Error processing MQTT message: %s", e)
+
+    def process(self, agent_data: AgentData, traffic_data: TrafficData):
+        processed_data = process_agent_data(agent_data, traffic_data)
+        stamp(processed_data.agent_data.trace, EDGE_PROCESS)
+        reason = self.delta_filter.check(processed_data) if self.delta_filter else "unfiltered"
+        if reason is None:
+            metrics.readings_suppressed.inc()
+            return
+        metrics.readings_forwarded.labels(reason).inc()
+        # Store the agent_data in the database (you can send it to the data processing module)
+        if not self.hub_gateway.save_data(processed_data):
+            logging.error("Hub is not available")
+
+    def on_parking_data(self, parking_data: ParkingData):
+        parking_zones = self.parking_aggregator.add(parking_data, datetime.now())
+        if parking_zones and not self.hub_gateway.save_parking_data(parking_zones):
+            logging.error("Hub is not available")
 
     def connect(self):
         self.client.on_connect = self.on_connect
         self.client.on_message = self.on_message
-        self.client.connect(self.broker_host, self.broker_port, 60)
+        self.client.connect(self.broker_host, self.broker_port, self.mqtt_settings.keepalive)
 
     def start(self):
         self.client.loop_start()
@@ -0,0 +1,138 @@
+import logging
+import os
+import threading
+from typing import List
+
+
+class DiskRingBuffer:
+    """
+    Bounded FIFO of records (single-line byte strings) kept in segment files in a directory.
+
+    Records are appended to the newest segment; a new segment is started once it reaches segment_bytes. Readers
+    take records from the oldest segment with read_batch and confirm them with commit; a fully committed segment
+    is deleted. When the segments together exceed max_bytes the oldest one is dropped, so the buffer never takes
+    much more than max_bytes of disk, and only the open segment's file handle is kept in memory.
+    The read position is only kept in memory: after a restart the records of a partly sent segment are sent
+    again.
+    """
+
+    SUFFIX = ".seg"
+
+    def __init__(self, directory: str, max_bytes: int = 256 << 20, segment_bytes: int = 1 << 20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        self.dropped = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._segments = sorted(
+            int(name[:-len(self.SUFFIX)]) for name in os.listdir(directory) if name.endswith(self.SUFFIX)
+        )
+        self._sizes = {segment: self._repair(segment) for segment in self._segments}
+        # Segments without a complete record (e.g. only a torn one) would stop the reader
+        for segment in [segment for segment in self._segments if self._sizes[segment] == 0]:
+            self._segments.remove(segment)
+            del self._sizes[segment]
+            os.remove(self._path(segment))
+        self._total_bytes = sum(self._sizes.values())
+        self._count = sum(self._count_records(segment) for segment in self._segments)
+        self._writer = None
+        # Segment and offset of the next record to read
+        self._read_segment = None
+        self._read_offset = 0
+        if self._count:
+            logging.info("Offline buffer holds %d records from a previous run", self._count)
+
+    def __len__(self):
+        return self._count
+
+    def append(self, record: bytes):
+        with self._lock:
+            if self._writer is None or self._sizes[self._segments[-1]] >= self.segment_bytes:
+                self._open_segment()
+            self._writer.write(record + b"\n")
+            self._writer.flush()
+            self._sizes[self._segments[-1]] += len(record) + 1
+            self._total_bytes += len(record) + 1
+            self._count += 1
+            while self._total_bytes > self.max_bytes and len(self._segments) > 1:
+                self._drop_oldest()
+
+    def read_batch(self, max_records: int) -> List[bytes]:
+        """Up to max_records of the oldest records, without removing them."""
+        with self._lock:
+            while self._segments:
+                segment = self._segments[0]
+                if segment != self._read_segment:
+                    self._read_segment = segment
+                    self._read_offset = 0
+                if self._writer is not None and segment == self._segments[-1]:
+                    # Start a new segment for appends so this one can be read to the end and deleted
+                    self._writer.close()
+                    self._writer = None
+                records = []
+                with open(self._path(segment), "rb") as file:
+                    file.seek(self._read_offset)
+                    for line in file:
+                        if len(records) == max_records:
+                            break
+                        records.append(line[:-1])
+                if records:
+                    return records
+                # Nothing left to read in this segment, continue with the next one
+                self._remove(segment)
+            return []
+
+    def commit(self, records: List[bytes]):
+        """Remove the records returned by the last read_batch once they were delivered."""
+        with self._lock:
+            if not self._segments or self._segments[0] != self._read_segment:
+                # The segment was dropped while its records were being sent, they are already gone
+                return
+            self._read_offset += sum(len(record) + 1 for record in records)
+            self._count -= len(records)
+            if self._read_offset >= self._sizes[self._read_segment]:
+                self._remove(self._read_segment)
+
+    def _open_segment(self):
+        if self._writer is not None:
+            self._writer.close()
+        segment = self._segments[-1] + 1 if self._segments else 0
+        self._segments.append(segment)
+        self._sizes[segment] = 0
+        self._writer = open(self._path(segment), "ab")
+
+    def _drop_oldest(self):
+        segment = self._segments[0]
+        dropped = self._count_records(segment, self._read_offset if segment == self._read_segment else 0)
+        self.dropped += dropped
+        self._count -= dropped
+        logging.warning("Offline buffer is full, dropped %d oldest records", dropped)
+        self._remove(segment)
+
+    def _remove(self, segment: int):
+        self._segments.remove(segment)
+        self._total_bytes -= self._sizes.pop(segment)
+        if segment == self._read_segment:
+            self._read_segment = None
+            self._read_offset = 0
+        os.remove(self._path(segment))
+
+    def _repair(self, segment: int) -> int:
+        """Cut off a record that was only partly written before a crash; returns the segment size."""
+        path = self._path(segment)
+        with open(path, "rb+") as file:
+            data = file.read()
+            size = data.rfind(b"\n") + 1
+            if size < len(data):
+                logging.warning("Removing an incomplete record at the end of %s", path)
+                file.truncate(size)
+        return size
+
+    def _count_records(self, segment: int, offset: int = 0) -> int:
+        with open(self._path(segment), "rb") as file:
+            file.seek(offset)
+            return file.read().count(b"\n")
+
+    def _path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"{segment:012d}{self.SUFFIX}")
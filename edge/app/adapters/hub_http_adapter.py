@@ -1,7 +1,10 @@
 import logging
+from typing import List
 
 import requests as requests
+from road_vision.entities import parking_zone_data_batch
 
+from app.entities.parking_data import ParkingZoneData
 from app.entities.processed_agent_data import ProcessedAgentData
 from app.interfaces.hub_gateway import HubGateway
 
@@ -22,8 +25,22 @@ class HubHttpAdapter(HubGateway):
 
         response = requests.post(url, data=processed_data.model_dump_json())
         if response.status_code != 200:
-            logging.info(
-                f"Invalid Hub response\nData: {processed_data.model_dump_json()}\nResponse: {response}"
-            )
+            logging.info("Invalid Hub response\nData: %s\nResponse: %s", processed_data.model_dump_json(), response)
+            return False
+        return True
+
+    def save_parking_data(self, parking_zones: List[ParkingZoneData]):
+        """
+        Save aggregated parking occupancy to the Hub.
+        Parameters:
+            parking_zones (List[ParkingZoneData]): Parking zones to be saved.
+        Returns:
+            bool: True if the data is successfully saved, False otherwise.
+        """
+        url = f"{self.api_base_url}/parking_data/"
+
+        response = requests.post(url, data=parking_zone_data_batch.dump_json(parking_zones))
+        if response.status_code != 200:
+            logging.info("Invalid Hub response to parking data: %s", response)
             return False
         return True
@@ -1,18 +1,66 @@
 import logging
+import threading
+import time
+from typing import List
 
 import requests as requests
 from paho.mqtt import client as mqtt_client
+from road_vision import mqtt
+from road_vision.entities import join_json, parking_zone_data_batch
+from road_vision.mqtt import MqttSettings, PublishTracker, create_client
 
+import metrics
+from app.adapters.disk_ring_buffer import DiskRingBuffer
+from app.entities.parking_data import ParkingZoneData
 from app.entities.processed_agent_data import ProcessedAgentData
 from app.interfaces.hub_gateway import HubGateway
 
 
 class HubMqttAdapter(HubGateway):
-    def __init__(self, broker, port, topic):
+    def __init__(
+        self,
+        broker,
+        port,
+        topic,
+        parking_topic,
+        offline_buffer: DiskRingBuffer = None,
+        drain_batch_size: int = 500,
+        drain_rate: float = 5,
+        publish_timeout: float = 10,
+        mqtt_settings: MqttSettings = None,
+    ):
+        """
+        Parameters:
+            offline_buffer (DiskRingBuffer): Keeps processed readings while the hub broker is unreachable; without
+                it readings that could not be published are lost.
+            drain_batch_size (int): Buffered readings sent as one JSON array message after a reconnect.
+            drain_rate (float): Maximum buffered batches sent per second, so the backlog does not swamp the hub.
+            publish_timeout (float): Seconds to wait for the broker to acknowledge a buffered batch.
+            mqtt_settings (MqttSettings): QoS per topic, session and in-flight window of the hub broker client.
+        """
         self.broker = broker
         self.port = port
         self.topic = topic
+        self.parking_topic = parking_topic
+        self.offline_buffer = offline_buffer
+        self.drain_batch_size = drain_batch_size
+        self.drain_interval = 1 / drain_rate
+        self.publish_timeout = publish_timeout
+        self._connected = threading.Event()
+        # Set when readings were added to the buffer
+        self._buffered = threading.Event()
+        self.mqtt_settings = mqtt_settings or MqttSettings()
+        self.publish_tracker = PublishTracker(
+            on_ack=lambda topic, seconds: metrics.mqtt_publish_ack_latency.labels(topic).observe(seconds)
+        )
+        metrics.mqtt_publish_pending.set_function(lambda: self.publish_tracker.pending)
         self.mqtt_client = self._connect_mqtt(broker, port)
+        if offline_buffer is not None:
+            metrics.offline_buffer_readings.set_function(lambda: len(offline_buffer))
+            metrics.offline_buffer_dropped.set_function(lambda: offline_buffer.dropped)
+            if len(offline_buffer):
+                self._buffered.set()
+            threading.Thread(target=self._drain, name="offline-buffer-drain", daemon=True).start()
 
     def save_data(self, processed_data: ProcessedAgentData):
         """
@@ -20,31 +68,90 @@ class HubMqttAdapter(HubGateway):
         Parameters:
             processed_data (ProcessedAgentData): Processed road data to be saved.
         Returns:
-            bool: True if the data is successfully saved, False otherwise.
+            bool: True if the data is successfully saved or buffered, False otherwise.
         """
         msg = processed_data.model_dump_json()
-        result = self.mqtt_client.publish(self.topic, msg)
-        status = result[0]
-        if status == 0:
+        buffer = self.offline_buffer
+        # Once readings are buffered new ones queue up behind them, so the hub gets them in order
+        if buffer is not None and (not self._connected.is_set() or len(buffer)):
+            self._buffer(msg)
+            return True
+        if self._publish(self.topic, msg).rc == mqtt_client.MQTT_ERR_SUCCESS:
             return True
-        else:
-            print(f"Failed to send message to topic {self.topic}")
+        if buffer is not None:
+            self._buffer(msg)
+            return True
+        return False
+
+    def save_parking_data(self, parking_zones: List[ParkingZoneData]):
+        """
+        Send aggregated parking occupancy to the Hub.
+        Parking zones are not buffered: the next window replaces them anyway.
+        Parameters:
+            parking_zones (List[ParkingZoneData]): Parking zones to be saved.
+        Returns:
+            bool: True if the data is successfully sent, False otherwise.
+        """
+        msg = parking_zone_data_batch.dump_json(parking_zones)
+        return self._publish(self.parking_topic, msg).rc == mqtt_client.MQTT_ERR_SUCCESS
+
+    def _publish(self, topic: str, payload, qos: int = None):
+        info = mqtt.publish(self.mqtt_client, self.mqtt_settings, topic, payload, self.publish_tracker, qos)
+        if info.rc != mqtt_client.MQTT_ERR_SUCCESS:
+            metrics.mqtt_publish_failed.labels(topic).inc()
+        return info
+
+    def _buffer(self, msg: str):
+        self.offline_buffer.append(msg.encode("utf-8"))
+        metrics.readings_buffered.inc()
+        self._buffered.set()
+
+    def _drain(self):
+        """Send the buffered readings in batches while connected to the broker, at most drain_rate per second."""
+        while True:
+            self._buffered.wait()
+            self._buffered.clear()
+            while True:
+                self._connected.wait()
+                records = self.offline_buffer.read_batch(self.drain_batch_size)
+                if not records:
+                    break
+                if self._publish_batch(records):
+                    self.offline_buffer.commit(records)
+                    metrics.readings_drained.inc(len(records))
+                    logging.info("Sent %d buffered readings, %d left", len(records), len(self.offline_buffer))
+                time.sleep(self.drain_interval)
+
+    def _publish_batch(self, records: List[bytes]) -> bool:
+        """Publish buffered readings as one JSON array and wait until the broker has them (at least QoS 1)."""
+        info = self._publish(self.topic, join_json(records), qos=max(1, self.mqtt_settings.qos_for(self.topic)))
+        if info.rc != mqtt_client.MQTT_ERR_SUCCESS:
             return False
+        info.wait_for_publish(self.publish_timeout)
+        if not info.is_published():
+            logging.warning("Hub broker did not acknowledge %d buffered readings, retrying", len(records))
+            return False
+        return True
 
-    @staticmethod
-    def _connect_mqtt(broker, port):
-        """Create MQTT client"""
-        print(f"CONNECT TO {broker}:{port}")
+    def _connect_mqtt(self, broker, port):
+        """Create MQTT client, it reconnects with exponential backoff when the broker goes away"""
+        logging.info("Connecting to MQTT broker %s:%s", broker, port)
 
         def on_connect(client, userdata, flags, rc):
             if rc == 0:
-                print(f"Connected to MQTT Broker ({broker}:{port})!")
+                logging.info("Connected to MQTT broker (%s:%s)", broker, port)
+                self._connected.set()
             else:
-                print("Failed to connect {broker}:{port}, return code %d\n", rc)
-                exit(rc)  # Stop execution
+                logging.error("Failed to connect to %s:%s, return code %d", broker, port, rc)
+
+        def on_disconnect(client, userdata, rc):
+            self._connected.clear()
+            logging.warning("Disconnected from MQTT broker %s:%s, return code %d", broker, port, rc)
 
-        client = mqtt_client.Client()
+        client = create_client(self.mqtt_settings, self.publish_tracker)
         client.on_connect = on_connect
-        client.connect(broker, port)
+        client.on_disconnect = on_disconnect
+        # The network loop keeps retrying until the broker is reachable, also for the first connection
+        client.connect_async(broker, port, self.mqtt_settings.keepalive)
         client.loop_start()
         return client
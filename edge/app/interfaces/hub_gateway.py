@@ -1,4 +1,7 @@
 from abc import ABC, abstractmethod
+from typing import List
+
+from app.entities.parking_data import ParkingZoneData
 from app.entities.processed_agent_data import ProcessedAgentData
 
 
@@ -18,3 +21,14 @@ class HubGateway(ABC):
             bool: True if the data is successfully saved, False otherwise.
         """
         pass
+
+    @abstractmethod
+    def save_parking_data(self, parking_zones: List[ParkingZoneData]) -> bool:
+        """
+        Method to save aggregated parking occupancy.
+        Parameters:
+            parking_zones (List[ParkingZoneData]): Closed windows of the parking zones that changed.
+        Returns:
+            bool: True if the data is successfully saved, False otherwise.
+        """
+        pass
@@ -25,5 +25,6 @@ def process_agent_data(
     else:
         road_state = "humps"
 
-    return ProcessedAgentData(road_state=road_state,
-                              agent_data=agent_data, traffic_data=traffic_data)
+    # Both parts were validated when they were received
+    return ProcessedAgentData.model_construct(road_state=road_state,
+                                              agent_data=agent_data, traffic_data=traffic_data)
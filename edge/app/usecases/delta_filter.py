@@ -0,0 +1,82 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional
+
+from road_vision.road_states import DEFECT_ROAD_STATES
+from road_vision.trip_statistics import haversine_km
+
+from app.entities.processed_agent_data import ProcessedAgentData
+
+# Reasons a reading is forwarded, used as metric labels
+FIRST = "first"
+DEFECT = "defect"
+ROAD_STATE = "road_state"
+TRAFFIC = "traffic"
+DISTANCE = "distance"
+HEARTBEAT = "heartbeat"
+
+
+@dataclass
+class _Forwarded:
+    road_state: str
+    latitude: float
+    longitude: float
+    vehicle_count: int
+    timestamp: datetime
+
+
+class DeltaFilter:
+    """
+    Decides per user whether a processed reading carries anything new for the hub.
+    A reading is forwarded when it is a defect, when the road state changed, when the vehicle count changed by
+    at least vehicle_count_delta, when the vehicle moved at least distance_meters since the last forwarded
+    reading, or as a heartbeat once heartbeat_seconds passed since it. Anything else - a stopped vehicle with
+    the same GPS, a long stretch of smooth road - is suppressed. Time is the readings' own timestamp.
+    Defect readings are never suppressed because the Store counts them.
+    """
+
+    def __init__(self, distance_meters: float = 50.0, heartbeat_seconds: float = 30.0, vehicle_count_delta: int = 3):
+        self.distance_meters = distance_meters
+        self.heartbeat_seconds = heartbeat_seconds
+        self.vehicle_count_delta = vehicle_count_delta
+        self.suppressed_count = 0
+        self._last: Dict[int, _Forwarded] = {}
+
+    def check(self, processed_data: ProcessedAgentData) -> Optional[str]:
+        """
+        Parameters:
+            processed_data (ProcessedAgentData): Reading about to be sent to the hub.
+        Returns:
+            str: The reason to forward the reading, or None if it should be suppressed.
+        """
+        agent_data = processed_data.agent_data
+        reason = self._reason(processed_data)
+        if reason is None:
+            self.suppressed_count += 1
+            return None
+        self._last[agent_data.user_id] = _Forwarded(
+            processed_data.road_state,
+            agent_data.gps.latitude,
+            agent_data.gps.longitude,
+            processed_data.traffic_data.vehicle_count,
+            agent_data.timestamp,
+        )
+        return reason
+
+    def _reason(self, processed_data: ProcessedAgentData) -> Optional[str]:
+        agent_data = processed_data.agent_data
+        last = self._last.get(agent_data.user_id)
+        if last is None:
+            return FIRST
+        if processed_data.road_state in DEFECT_ROAD_STATES:
+            return DEFECT
+        if processed_data.road_state != last.road_state:
+            return ROAD_STATE
+        if abs(processed_data.traffic_data.vehicle_count - last.vehicle_count) >= self.vehicle_count_delta:
+            return TRAFFIC
+        distance_km = haversine_km(last.latitude, last.longitude, agent_data.gps.latitude, agent_data.gps.longitude)
+        if distance_km * 1000 >= self.distance_meters:
+            return DISTANCE
+        if (agent_data.timestamp - last.timestamp).total_seconds() >= self.heartbeat_seconds:
+            return HEARTBEAT
+        return None
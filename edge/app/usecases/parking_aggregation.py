@@ -0,0 +1,82 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from road_vision import geohash
+
+from app.entities.parking_data import ParkingData, ParkingZoneData
+
+
+@dataclass
+class _ZoneWindow:
+    started_at: datetime
+    latest: int
+    minimum: int
+    total: int = 0
+    count: int = 0
+
+
+class ParkingAggregator:
+    """
+    Aggregates the agents' parking readings per geohash cell over fixed time windows.
+    A window of a cell opens with its first reading and closes window_seconds later; a closed window is only
+    sent upstream when its aggregate differs from the last one sent for the cell.
+    """
+
+    def __init__(self, precision: int = 7, window_seconds: float = 10.0):
+        self.precision = precision
+        self.window_seconds = window_seconds
+        self._windows: Dict[str, _ZoneWindow] = {}
+        self._last_sent: Dict[str, Tuple[int, int, float]] = {}
+
+    def add(self, parking_data: ParkingData, received_at: datetime) -> List[ParkingZoneData]:
+        """
+        Add a reading and close the windows that are over.
+        Parameters:
+            parking_data (ParkingData): Reading from an agent.
+            received_at (datetime): Time the reading was received.
+        Returns:
+            List[ParkingZoneData]: Aggregates of the closed windows that changed since they were last sent.
+        """
+        cell = geohash.encode(parking_data.gps.latitude, parking_data.gps.longitude, self.precision)
+        empty_count = parking_data.empty_count
+        window = self._windows.get(cell)
+        if window is None:
+            window = self._windows[cell] = _ZoneWindow(received_at, empty_count, empty_count)
+        window.latest = empty_count
+        window.minimum = min(window.minimum, empty_count)
+        window.total += empty_count
+        window.count += 1
+        return self.flush(received_at)
+
+    def flush(self, now: datetime, force: bool = False) -> List[ParkingZoneData]:
+        """
+        Close the windows that are over, or all of them with force.
+        Returns:
+            List[ParkingZoneData]: Aggregates of the closed windows that changed since they were last sent.
+        """
+        closed = [
+            cell for cell, window in self._windows.items()
+            if force or (now - window.started_at).total_seconds() >= self.window_seconds
+        ]
+        zones = []
+        for cell in closed:
+            window = self._windows.pop(cell)
+            average = round(window.total / window.count, 1)
+            state = (window.latest, window.minimum, average)
+            if self._last_sent.get(cell) == state:
+                continue
+            self._last_sent[cell] = state
+            latitude, longitude = geohash.center(cell)
+            zones.append(ParkingZoneData(
+                geohash=cell,
+                latitude=latitude,
+                longitude=longitude,
+                latest_empty_count=window.latest,
+                min_empty_count=window.minimum,
+                average_empty_count=average,
+                sample_count=window.count,
+                window_start=window.started_at,
+                window_end=now,
+            ))
+        return zones
@@ -1,5 +1,7 @@
 import os
 
+from road_vision.mqtt import MqttSettings
+
 
 def try_parse_int(value: str):
     try:
@@ -13,13 +15,54 @@ MQTT_BROKER_HOST = os.environ.get("MQTT_BROKER_HOST") or "localhost"
 MQTT_BROKER_PORT = try_parse_int(os.environ.get("MQTT_BROKER_PORT")) or 1883
 MQTT_AGENT_TOPIC = os.environ.get("MQTT_AGENT_TOPIC") or "agent_data_topic"
 MQTT_TRAFFIC_TOPIC = os.environ.get("MQTT_TRAFFIC_TOPIC") or "traffic_data_topic"
+MQTT_PARKING_TOPIC = os.environ.get("MQTT_PARKING_TOPIC") or "parking_data_topic"
+# QoS, session and in-flight window, see road_vision.mqtt for the MQTT_* variables
+MQTT_SETTINGS = MqttSettings.from_env("MQTT_", "edge")
+# Partitioned agent topics (road_vision.partitioning): number of partitions the agents publish to, 0 to use the
+# topics above as they are. Edge instance EDGE_INSTANCE_INDEX of EDGE_INSTANCES consumes its share of them
+MQTT_PARTITIONS = try_parse_int(os.environ.get("MQTT_PARTITIONS")) or 0
+EDGE_INSTANCES = try_parse_int(os.environ.get("EDGE_INSTANCES")) or 1
+EDGE_INSTANCE_INDEX = try_parse_int(os.environ.get("EDGE_INSTANCE_INDEX")) or 0
+
+# Parking aggregation: geohash precision of a zone (7 is about 150 x 150 m) and window length
+PARKING_GEOHASH_PRECISION = try_parse_int(os.environ.get("PARKING_GEOHASH_PRECISION")) or 7
+PARKING_WINDOW_SECONDS = try_parse_int(os.environ.get("PARKING_WINDOW_SECONDS")) or 10
+
+# Delta filter: readings of a vehicle are only forwarded when they differ from the last forwarded one
+DELTA_FILTER_ENABLED = (os.environ.get("DELTA_FILTER_ENABLED") or "true").lower() == "true"
+DELTA_DISTANCE_METERS = try_parse_int(os.environ.get("DELTA_DISTANCE_METERS")) or 50
+DELTA_HEARTBEAT_SECONDS = try_parse_int(os.environ.get("DELTA_HEARTBEAT_SECONDS")) or 30
+DELTA_VEHICLE_COUNT = try_parse_int(os.environ.get("DELTA_VEHICLE_COUNT")) or 3
+
+# Port of the Prometheus metrics endpoint
+METRICS_PORT = try_parse_int(os.environ.get("METRICS_PORT")) or 9100
 
 # Configuration for hub MQTT
 HUB_MQTT_BROKER_HOST = os.environ.get("HUB_MQTT_BROKER_HOST") or "localhost"
 HUB_MQTT_BROKER_PORT = try_parse_int(os.environ.get("HUB_MQTT_BROKER_PORT")) or 1883
 HUB_MQTT_TOPIC = os.environ.get("HUB_MQTT_TOPIC") or "processed_agent_data_topic"
+HUB_MQTT_PARKING_TOPIC = os.environ.get("HUB_MQTT_PARKING_TOPIC") or "parking_zone_data_topic"
+# Same as MQTT_SETTINGS with HUB_MQTT_* variables
+HUB_MQTT_SETTINGS = MqttSettings.from_env("HUB_MQTT_", "edge-hub")
+
+# Offline buffer: processed readings are kept on disk while the hub broker is unreachable.
+# Set OFFLINE_BUFFER_DIR to an empty string to drop them instead
+OFFLINE_BUFFER_DIR = os.environ.get("OFFLINE_BUFFER_DIR", "offline_buffer")
+OFFLINE_BUFFER_MAX_BYTES = try_parse_int(os.environ.get("OFFLINE_BUFFER_MAX_BYTES")) or 256 * 1024 * 1024
+# Buffered readings per MQTT message and messages per second when the buffer is sent after a reconnect
+OFFLINE_DRAIN_BATCH_SIZE = try_parse_int(os.environ.get("OFFLINE_DRAIN_BATCH_SIZE")) or 500
+OFFLINE_DRAIN_RATE = try_parse_int(os.environ.get("OFFLINE_DRAIN_RATE")) or 5
 
 # Configuration for the Hub
 HUB_HOST = os.environ.get("HUB_HOST") or "localhost"
 HUB_PORT = try_parse_int(os.environ.get("HUB_PORT")) or 12000
 HUB_URL = f"http://{HUB_HOST}:{HUB_PORT}"
+
+# Logging, see road_vision.logs
+LOG_LEVEL = os.environ.get("LOG_LEVEL") or "INFO"
+# "json" or "text"
+LOG_FORMAT = os.environ.get("LOG_FORMAT") or "json"
+# Set LOG_FILE to an empty string to log only to the console
+LOG_FILE = os.environ.get("LOG_FILE", "app.log")
+# Maximum records per second logged through the root logger (module level logging.info etc.)
+LOG_RATE_LIMIT = try_parse_int(os.environ.get("LOG_RATE_LIMIT")) or 100
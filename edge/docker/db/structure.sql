@@ -8,5 +8,77 @@ CREATE TABLE processed_agent_data (
     latitude FLOAT,
     longitude FLOAT,
     timestamp TIMESTAMP,
-    vehicle_count INTEGER
-);
\ No newline at end of file
+    vehicle_count INTEGER,
+    event_timestamp TIMESTAMP,
+    -- Sequence number of the reading per agent
+    seq BIGINT,
+    -- Road segment the reading was map-matched to, see store/road_graph.py
+    segment_id VARCHAR(255)
+);
+
+-- Readings delivered more than once are inserted with ON CONFLICT DO NOTHING against this index
+CREATE UNIQUE INDEX processed_agent_data_user_seq_idx
+    ON processed_agent_data (user_id, seq);
+
+-- Time range scans of one user's readings, see GET /users/{user_id}/track
+CREATE INDEX processed_agent_data_user_time_idx
+    ON processed_agent_data (user_id, event_timestamp);
+
+-- Viewport (tile) lookups of defects, see GET /tiles/{zoom}/{x}/{y}/defects
+CREATE INDEX processed_agent_data_defects_location_idx
+    ON processed_agent_data (latitude, longitude)
+    WHERE road_state <> 'smooth road';
+
+-- Quality of every road segment readings were map-matched to, across all vehicles
+CREATE TABLE road_segments (
+    segment_id VARCHAR(255) PRIMARY KEY,
+    name VARCHAR(255),
+    latitude FLOAT,
+    longitude FLOAT,
+    sample_count INTEGER,
+    defect_count INTEGER,
+    severe_defect_count INTEGER,
+    defect_score FLOAT,
+    confidence FLOAT,
+    updated_at TIMESTAMP
+);
+
+-- Worst segments in an area, see GET /road_segments/worst
+CREATE INDEX road_segments_score_idx
+    ON road_segments (defect_score DESC);
+CREATE INDEX road_segments_location_idx
+    ON road_segments (latitude, longitude);
+
+-- Readings moved out of processed_agent_data by the Store retention job, per geohash cell and hour.
+-- Sums instead of averages, so later runs can add to a row
+CREATE TABLE processed_agent_data_hourly (
+    geohash VARCHAR(12),
+    hour TIMESTAMP,
+    latitude FLOAT,
+    longitude FLOAT,
+    reading_count INTEGER,
+    defect_count INTEGER,
+    y_min FLOAT,
+    y_max FLOAT,
+    y_sum FLOAT,
+    vehicle_count_sum INTEGER,
+    PRIMARY KEY (geohash, hour)
+);
+
+-- Latest parking occupancy per geohash cell, aggregated by the edge
+CREATE TABLE parking_zones (
+    geohash VARCHAR(12) PRIMARY KEY,
+    latitude FLOAT,
+    longitude FLOAT,
+    latest_empty_count INTEGER,
+    min_empty_count INTEGER,
+    average_empty_count FLOAT,
+    sample_count INTEGER,
+    window_start TIMESTAMP,
+    window_end TIMESTAMP
+);
+
+-- Nearest free parking lookups, see GET /parking/nearest
+CREATE INDEX parking_zones_free_location_idx
+    ON parking_zones (latitude, longitude)
+    WHERE latest_empty_count > 0;
@@ -1,28 +1,57 @@
 import logging
+from prometheus_client import start_http_server
+from road_vision.logs import setup_logging
+from road_vision.partitioning import PARKING_KEY_PRECISION, owned_partitions
 from app.adapters.agent_mqtt_adapter import AgentMQTTAdapter
+from app.adapters.disk_ring_buffer import DiskRingBuffer
 from app.adapters.hub_http_adapter import HubHttpAdapter
 from app.adapters.hub_mqtt_adapter import HubMqttAdapter
+from app.usecases.delta_filter import DeltaFilter
+from app.usecases.parking_aggregation import ParkingAggregator
 from config import (
     MQTT_BROKER_HOST,
     MQTT_BROKER_PORT,
     MQTT_AGENT_TOPIC,
     MQTT_TRAFFIC_TOPIC,
+    MQTT_PARKING_TOPIC,
+    MQTT_SETTINGS,
+    MQTT_PARTITIONS,
+    EDGE_INSTANCES,
+    EDGE_INSTANCE_INDEX,
+    PARKING_GEOHASH_PRECISION,
+    PARKING_WINDOW_SECONDS,
+    DELTA_FILTER_ENABLED,
+    DELTA_DISTANCE_METERS,
+    DELTA_HEARTBEAT_SECONDS,
+    DELTA_VEHICLE_COUNT,
+    METRICS_PORT,
     HUB_URL,
     HUB_MQTT_BROKER_HOST,
     HUB_MQTT_BROKER_PORT,
     HUB_MQTT_TOPIC,
+    HUB_MQTT_PARKING_TOPIC,
+    HUB_MQTT_SETTINGS,
+    OFFLINE_BUFFER_DIR,
+    OFFLINE_BUFFER_MAX_BYTES,
+    OFFLINE_DRAIN_BATCH_SIZE,
+    OFFLINE_DRAIN_RATE,
+    LOG_LEVEL,
+    LOG_FORMAT,
+    LOG_FILE,
+    LOG_RATE_LIMIT,
 )
 
 if __name__ == "__main__":
     # Configure logging settings
-    logging.basicConfig(
-        level=logging.INFO,  # Set the log level to INFO (you can use logging.DEBUG for more detailed logs)
-        format="[%(asctime)s] [%(levelname)s] [%(module)s] %(message)s",
-        handlers=[
-            logging.StreamHandler(),  # Output log messages to the console
-            logging.FileHandler("app.log"),  # Save log messages to a file
-        ],
+    setup_logging(
+        "edge",
+        level=LOG_LEVEL,
+        json_output=LOG_FORMAT == "json",
+        log_file=LOG_FILE,
+        rate_limits={"": LOG_RATE_LIMIT},
     )
+    # Serve the suppression counters of the delta filter
+    start_http_server(METRICS_PORT)
     # Create an instance of the StoreApiAdapter using the configuration
     # hub_adapter = HubHttpAdapter(
     #     api_base_url=HUB_URL,
@@ -31,7 +60,19 @@ if __name__ == "__main__":
         broker=HUB_MQTT_BROKER_HOST,
         port=HUB_MQTT_BROKER_PORT,
         topic=HUB_MQTT_TOPIC,
+        parking_topic=HUB_MQTT_PARKING_TOPIC,
+        offline_buffer=DiskRingBuffer(OFFLINE_BUFFER_DIR, OFFLINE_BUFFER_MAX_BYTES) if OFFLINE_BUFFER_DIR else None,
+        drain_batch_size=OFFLINE_DRAIN_BATCH_SIZE,
+        drain_rate=OFFLINE_DRAIN_RATE,
+        mqtt_settings=HUB_MQTT_SETTINGS,
     )
+    partitions = None
+    if MQTT_PARTITIONS:
+        partitions = owned_partitions(EDGE_INSTANCE_INDEX, EDGE_INSTANCES, MQTT_PARTITIONS)
+        logging.info("Edge instance %d of %d consumes partitions %s", EDGE_INSTANCE_INDEX, EDGE_INSTANCES, partitions)
+        if PARKING_GEOHASH_PRECISION < PARKING_KEY_PRECISION:
+            logging.warning("Parking zones span several partitions, set PARKING_GEOHASH_PRECISION to at least %d",
+                            PARKING_KEY_PRECISION)
     # Create an instance of the AgentMQTTAdapter using the configuration
     agent_adapter = AgentMQTTAdapter(
         broker_host=MQTT_BROKER_HOST,
@@ -39,6 +80,12 @@ if __name__ == "__main__":
         agent_topic=MQTT_AGENT_TOPIC,
         traffic_topic=MQTT_TRAFFIC_TOPIC,
         hub_gateway=hub_adapter,
+        parking_topic=MQTT_PARKING_TOPIC,
+        parking_aggregator=ParkingAggregator(PARKING_GEOHASH_PRECISION, PARKING_WINDOW_SECONDS),
+        delta_filter=DeltaFilter(DELTA_DISTANCE_METERS, DELTA_HEARTBEAT_SECONDS, DELTA_VEHICLE_COUNT)
+        if DELTA_FILTER_ENABLED else None,
+        mqtt_settings=MQTT_SETTINGS,
+        partitions=partitions,
     )
     try:
         # Connect to the MQTT broker and start listening for messages
@@ -0,0 +1,42 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+readings_forwarded = Counter(
+    "edge_readings_forwarded_total",
+    "Processed readings sent to the hub, by the reason the delta filter let them through",
+    ["reason"],
+)
+readings_suppressed = Counter(
+    "edge_readings_suppressed_total",
+    "Processed readings the delta filter did not send to the hub",
+)
+readings_buffered = Counter(
+    "edge_readings_buffered_total",
+    "Processed readings written to the offline buffer because the hub broker was unreachable",
+)
+readings_drained = Counter(
+    "edge_readings_drained_total",
+    "Buffered readings sent to the hub after it became reachable again",
+)
+offline_buffer_readings = Gauge(
+    "edge_offline_buffer_readings",
+    "Readings waiting in the offline buffer",
+)
+offline_buffer_dropped = Gauge(
+    "edge_offline_buffer_dropped",
+    "Oldest buffered readings dropped because the offline buffer was full, since the edge started",
+)
+mqtt_publish_failed = Counter(
+    "edge_mqtt_publish_failed_total",
+    "Messages to the hub broker that the MQTT client did not accept",
+    ["topic"],
+)
+mqtt_publish_ack_latency = Histogram(
+    "edge_mqtt_publish_ack_seconds",
+    "Time from publishing a message to the hub broker until it was acknowledged (written out for QoS 0)",
+    ["topic"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+mqtt_publish_pending = Gauge(
+    "edge_mqtt_publish_pending",
+    "Messages published to the hub broker that were not acknowledged yet",
+)
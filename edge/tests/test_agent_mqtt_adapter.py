@@ -0,0 +1,22 @@
+import unittest
+from unittest.mock import Mock
+from road_vision.mqtt import MqttSettings
+from app.adapters.agent_mqtt_adapter import AgentMQTTAdapter
+
+class TestAgentMQTTAdapter(unittest.TestCase):
+    def create_adapter(self, partitions):
+        return AgentMQTTAdapter(
+            "localhost", 1883, "agent_data_topic", "traffic_data_topic", Mock(),
+            mqtt_settings=MqttSettings(client_id="edge-test", clean_session=False), partitions=partitions,
+        )
+    def test_partitioned_topics_use_a_clean_session(self):
+        # Subscriptions of an earlier partition assignment must not survive in the broker session
+        adapter = self.create_adapter([0, 3])
+        self.assertTrue(adapter.mqtt_settings.clean_session)
+        self.assertTrue(adapter.client._clean_session)
+    def test_unpartitioned_topics_keep_the_configured_session(self):
+        adapter = self.create_adapter(None)
+        self.assertFalse(adapter.mqtt_settings.clean_session)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+from app.adapters.disk_ring_buffer import DiskRingBuffer
+
+class TestDiskRingBuffer(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "buffer")
+    def tearDown(self):
+        self.directory.cleanup()
+    def segment_path(self, segment):
+        return os.path.join(self.path, f"{segment:012d}{DiskRingBuffer.SUFFIX}")
+    def test_read_and_commit_in_append_order(self):
+        buffer = DiskRingBuffer(self.path, segment_bytes=8)
+        for i in range(5):
+            buffer.append(f"r{i}".encode())
+        self.assertEqual(len(buffer), 5)
+        records = buffer.read_batch(2)
+        self.assertEqual(records, [b"r0", b"r1"])
+        # Reading again without a commit returns the same records
+        self.assertEqual(buffer.read_batch(2), records)
+        buffer.commit(records)
+        self.assertEqual(len(buffer), 3)
+        read = []
+        while len(buffer):
+            records = buffer.read_batch(10)
+            read.extend(records)
+            buffer.commit(records)
+        self.assertEqual(read, [b"r2", b"r3", b"r4"])
+        self.assertEqual(buffer.read_batch(10), [])
+        # Fully committed segments are deleted
+        self.assertEqual(os.listdir(self.path), [])
+    def test_appends_during_reading_go_to_a_new_segment(self):
+        buffer = DiskRingBuffer(self.path)
+        buffer.append(b"a")
+        records = buffer.read_batch(10)
+        buffer.append(b"b")
+        buffer.commit(records)
+        self.assertEqual(buffer.read_batch(10), [b"b"])
+    def test_torn_tail_is_removed_on_restart(self):
+        os.makedirs(self.path)
+        with open(self.segment_path(0), "wb") as file:
+            file.write(b"a\nb\n{\"torn")
+        buffer = DiskRingBuffer(self.path)
+        self.assertEqual(len(buffer), 2)
+        self.assertEqual(buffer.read_batch(10), [b"a", b"b"])
+    def test_segment_with_only_a_torn_record_does_not_block_reading(self):
+        os.makedirs(self.path)
+        with open(self.segment_path(0), "wb") as file:
+            file.write(b"{\"torn")
+        with open(self.segment_path(1), "wb") as file:
+            file.write(b"a\nb\n")
+        buffer = DiskRingBuffer(self.path)
+        self.assertEqual(len(buffer), 2)
+        self.assertEqual(buffer.read_batch(10), [b"a", b"b"])
+        self.assertFalse(os.path.exists(self.segment_path(0)))
+    def test_oldest_segment_is_dropped_when_full(self):
+        buffer = DiskRingBuffer(self.path, max_bytes=12, segment_bytes=6)
+        for i in range(6):
+            buffer.append(f"r{i}".encode())
+        self.assertGreater(buffer.dropped, 0)
+        self.assertEqual(len(buffer) + buffer.dropped, 6)
+        read = []
+        while len(buffer):
+            records = buffer.read_batch(10)
+            read.extend(records)
+            buffer.commit(records)
+        # The newest records are kept, in order
+        self.assertEqual(read, [f"r{i}".encode() for i in range(6 - len(read), 6)])
+    def test_records_survive_restart(self):
+        buffer = DiskRingBuffer(self.path, segment_bytes=4)
+        for i in range(4):
+            buffer.append(f"r{i}".encode())
+        # The first segment holds r0 and r1 and is deleted once both are committed
+        buffer.commit(buffer.read_batch(10))
+        restarted = DiskRingBuffer(self.path, segment_bytes=4)
+        self.assertEqual(len(restarted), 2)
+        self.assertEqual(restarted.read_batch(10), [b"r2", b"r3"])
+
+if __name__ == "__main__":
+    unittest.main()
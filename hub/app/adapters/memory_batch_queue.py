@@ -0,0 +1,110 @@
+import logging
+import os
+import threading
+from collections import deque
+from typing import List, Optional
+
+from app.interfaces.batch_queue import BatchQueue
+
+# WAL records: b"+" + message for a push, b"-" + count for a pop, one per line
+PUSH_RECORD = b"+"
+POP_RECORD = b"-"
+
+
+class MemoryBatchQueue(BatchQueue):
+    """
+    Queue in the memory of the hub process, for deployments with a single hub.
+
+    Without a WAL push and pop only use deque.append and deque.popleft, which are atomic, so the MQTT thread
+    and the HTTP handlers need no lock. With wal_path every push and pop is also appended to a local file
+    (under a lock, so the file order matches the queue order) and the queue is restored from it on start.
+    The file is truncated whenever the queue becomes empty and rewritten with just the queued messages when it
+    grows past wal_compact_bytes.
+    """
+
+    def __init__(self, wal_path: Optional[str] = None, wal_fsync: bool = False, wal_compact_bytes: int = 64 << 20):
+        self._messages = deque()
+        self._wal_path = wal_path
+        self._wal_fsync = wal_fsync
+        self._wal_compact_bytes = wal_compact_bytes
+        self._wal = None
+        self._lock = threading.Lock()
+        if wal_path:
+            self._replay()
+            self._compact()
+
+    def __len__(self):
+        return len(self._messages)
+
+    def push(self, message: bytes) -> int:
+        if self._wal is None:
+            self._messages.append(message)
+            return len(self._messages)
+        with self._lock:
+            self._messages.append(message)
+            self._write(PUSH_RECORD + message + b"\n")
+            return len(self._messages)
+
+    def pop_batch(self, count: int) -> List[bytes]:
+        if self._wal is None:
+            return self._pop(count)
+        with self._lock:
+            batch = self._pop(count)
+            if not self._messages:
+                # Nothing left to restore
+                self._wal.truncate(0)
+            elif self._wal.tell() > self._wal_compact_bytes:
+                self._compact()
+            elif batch:
+                self._write(POP_RECORD + str(len(batch)).encode() + b"\n")
+            return batch
+
+    def close(self):
+        if self._wal is not None:
+            with self._lock:
+                self._wal.close()
+                self._wal = None
+
+    def _pop(self, count: int) -> List[bytes]:
+        batch = []
+        try:
+            for _ in range(count):
+                batch.append(self._messages.popleft())
+        except IndexError:
+            # Another thread took the rest
+            pass
+        return batch
+
+    def _write(self, record: bytes):
+        self._wal.write(record)
+        self._wal.flush()
+        if self._wal_fsync:
+            os.fsync(self._wal.fileno())
+
+    def _replay(self):
+        if not os.path.exists(self._wal_path):
+            return
+        with open(self._wal_path, "rb") as wal:
+            for line in wal:
+                if not line.endswith(b"\n"):
+                    # Torn write of the last record before a crash
+                    logging.warning("Ignoring incomplete record at the end of %s", self._wal_path)
+                    break
+                if line.startswith(PUSH_RECORD):
+                    self._messages.append(line[1:-1])
+                elif line.startswith(POP_RECORD):
+                    self._pop(int(line[1:]))
+        logging.info("Restored %d queued messages from %s", len(self._messages), self._wal_path)
+
+    def _compact(self):
+        # Write the queued messages to a new file and swap it in, so a crash leaves either the old or the new WAL
+        if self._wal is not None:
+            self._wal.close()
+        temporary_path = self._wal_path + ".tmp"
+        with open(temporary_path, "wb") as wal:
+            wal.writelines(PUSH_RECORD + message + b"\n" for message in self._messages)
+            if self._wal_fsync:
+                wal.flush()
+                os.fsync(wal.fileno())
+        os.replace(temporary_path, self._wal_path)
+        self._wal = open(self._wal_path, "ab")
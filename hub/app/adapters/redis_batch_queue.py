@@ -0,0 +1,20 @@
+from typing import List
+
+from redis import Redis
+
+from app.interfaces.batch_queue import BatchQueue
+
+
+class RedisBatchQueue(BatchQueue):
+    """Queue in a Redis list, shared by all hub processes that use the same Redis and key."""
+
+    def __init__(self, redis_client: Redis, key: str = "processed_agent_data"):
+        self.redis_client = redis_client
+        self.key = key
+
+    def push(self, message: bytes) -> int:
+        return self.redis_client.lpush(self.key, message)
+
+    def pop_batch(self, count: int) -> List[bytes]:
+        # None when another hub process emptied the list first
+        return self.redis_client.rpop(self.key, count) or []
@@ -1,17 +1,36 @@
-import json
 import logging
-from typing import List
+import zlib
+from typing import Iterable, Iterator, List
 
-import pydantic_core
 import requests
+from road_vision.entities import dump_batch, join_json, parking_zone_data_batch
+from road_vision.tracing import HUB_FLUSH_HEADER
 
+from app.entities.parking_data import ParkingZoneData
 from app.entities.processed_agent_data import ProcessedAgentData
 from app.interfaces.store_gateway import StoreGateway
 
 
+def gzip_ndjson(messages: Iterable[bytes], level: int = 1) -> Iterator[bytes]:
+    """Gzip compressed NDJSON of JSON objects, produced chunk by chunk while requests sends it."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for message in messages:
+        chunk = compressor.compress(message + b"\n")
+        if chunk:
+            yield chunk
+    yield compressor.flush()
+
+
 class StoreApiAdapter(StoreGateway):
-    def __init__(self, api_base_url):
+    def __init__(self, api_base_url, stream: bool = False):
+        """
+        Parameters:
+            api_base_url (str): Store API URL.
+            stream (bool): Send readings as gzip NDJSON to POST /processed_agent_data/stream instead of a JSON
+                array, so neither side holds the whole batch as one body.
+        """
         self.api_base_url = api_base_url
+        self.stream = stream
 
     def save_data(self, processed_agent_data_batch: List[ProcessedAgentData]):
         """
@@ -21,25 +40,57 @@ class StoreApiAdapter(StoreGateway):
         Returns:
             bool: True if the data is successfully saved, False otherwise.
         """
-        print("Hub: sending processed data")
+        if self.stream:
+            messages = (item.model_dump_json().encode("utf-8") for item in processed_agent_data_batch)
+            return self._post_stream(messages, {})
+        return self._post(dump_batch(processed_agent_data_batch), {})
+
+    def save_serialized_data(self, messages: List[bytes], flushed_at: float):
+        """
+        Save processed road data the hub serialized itself, without parsing it again.
+        Parameters:
+            messages (List[bytes]): ProcessedAgentData JSON objects.
+            flushed_at (float): Time the batch was taken from the queue.
+        Returns:
+            bool: True if the data is successfully saved, False otherwise.
+        """
+        headers = {HUB_FLUSH_HEADER: repr(flushed_at)}
+        if self.stream:
+            return self._post_stream(messages, headers)
+        return self._post(join_json(messages), headers)
+
+    def save_parking_data(self, parking_zones: List[ParkingZoneData]):
+        """
+        Save aggregated parking occupancy to the Store API.
+        Parameters:
+            parking_zones (List[ParkingZoneData]): Parking zones to be saved.
+        Returns:
+            bool: True if the data is successfully saved, False otherwise.
+        """
+        return self._post(parking_zone_data_batch.dump_json(parking_zones), {}, path="/parking_data/")
+
+    def _post_stream(self, messages: Iterable[bytes], headers: dict):
+        headers = {"Content-Type": "application/x-ndjson", "Content-Encoding": "gzip", **headers}
+        return self._post(gzip_ndjson(messages), headers, path="/processed_agent_data/stream")
+
+    def _post(self, data, headers: dict, path: str = "/processed_agent_data/"):
+        logging.debug("Hub: sending processed data")
 
         try:
             # Prepare the data to be sent
-            url = f"{self.api_base_url}/processed_agent_data/"
-            headers = {'Content-Type': 'application/json'}
+            url = f"{self.api_base_url}{path}"
+            headers = {'Content-Type': 'application/json', **headers}
             # Make a POST request to the Store API endpoint with the processed data
-            data = f"[{','.join([i.model_dump_json() for i in processed_agent_data_batch])}]"
             response = requests.post(url, data=data, headers=headers)
 
             # Check if the request was successful
             if 200 <= response.status_code < 300:
-                logging.info("Data successfully saved.")
+                logging.debug("Data successfully saved.")
                 return True
             else:
                 logging.error("Failed to save data.")
                 return False
 
         except requests.exceptions.RequestException as e:
-            logging.exception(f"An error occurred: {e}")
+            logging.exception("An error occurred: %s", e)
             return False
-
@@ -0,0 +1,4 @@
+# The entities are shared by all services, see road_vision.entities
+from road_vision.entities import ParkingData, ParkingZoneData
+
+__all__ = ["ParkingData", "ParkingZoneData"]
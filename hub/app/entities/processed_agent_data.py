@@ -1,8 +1,4 @@
-from pydantic import BaseModel
-from app.entities.agent_data import AgentData, TrafficData
+# The entities are shared by all services, see road_vision.entities
+from road_vision.entities import ProcessedAgentData
 
-
-class ProcessedAgentData(BaseModel):
-    road_state: str
-    agent_data: AgentData
-    traffic_data: TrafficData
\ No newline at end of file
+__all__ = ["ProcessedAgentData"]
@@ -0,0 +1,31 @@
+from abc import ABC, abstractmethod
+from typing import List
+
+
+class BatchQueue(ABC):
+    """
+    Abstract class representing the queue in which the hub accumulates messages until a batch is full.
+    Messages are serialized ProcessedAgentData and are popped in the order they were pushed.
+    """
+
+    @abstractmethod
+    def push(self, message: bytes) -> int:
+        """
+        Method to add a message to the queue.
+        Parameters:
+            message (bytes): Serialized message.
+        Returns:
+            int: Number of messages in the queue after the push.
+        """
+        pass
+
+    @abstractmethod
+    def pop_batch(self, count: int) -> List[bytes]:
+        """
+        Method to take up to count of the oldest messages from the queue.
+        Parameters:
+            count (int): Maximum number of messages to take.
+        Returns:
+            List[bytes]: The messages, oldest first; fewer than count if the queue ran out.
+        """
+        pass
@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
 from typing import List
+from app.entities.parking_data import ParkingZoneData
 from app.entities.processed_agent_data import ProcessedAgentData
 
 
@@ -19,3 +20,26 @@ class StoreGateway(ABC):
             bool: True if the data is successfully saved, False otherwise.
         """
         pass
+
+    @abstractmethod
+    def save_serialized_data(self, messages: List[bytes], flushed_at: float) -> bool:
+        """
+        Method to save processed agent data that is already serialized to JSON by the hub itself.
+        Parameters:
+            messages (List[bytes]): ProcessedAgentData JSON objects, sent without parsing them again.
+            flushed_at (float): Time the batch was taken from the queue, recorded as the hub_flush trace stamp.
+        Returns:
+            bool: True if the data is successfully saved, False otherwise.
+        """
+        pass
+
+    @abstractmethod
+    def save_parking_data(self, parking_zones: List[ParkingZoneData]) -> bool:
+        """
+        Method to save aggregated parking occupancy in the database.
+        Parameters:
+            parking_zones (List[ParkingZoneData]): Parking zones aggregated by the edge.
+        Returns:
+            bool: True if the data is successfully saved, False otherwise.
+        """
+        pass
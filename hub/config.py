@@ -1,5 +1,7 @@
 import os
 
+from road_vision.mqtt import MqttSettings
+
 
 def try_parse_int(value: str):
     try:
@@ -12,6 +14,14 @@ def try_parse_int(value: str):
 STORE_API_HOST = os.environ.get("STORE_API_HOST") or "localhost"
 STORE_API_PORT = try_parse_int(os.environ.get("STORE_API_PORT")) or 8000
 STORE_API_BASE_URL = f"http://{STORE_API_HOST}:{STORE_API_PORT}"
+# Send batches as gzip NDJSON to the Store's streaming endpoint instead of a JSON array
+STORE_API_STREAM = (os.environ.get("STORE_API_STREAM") or "false").lower() == "true"
+
+# Queue in which the hub accumulates batches: "redis", or "memory" for a single hub process
+QUEUE_BACKEND = os.environ.get("QUEUE_BACKEND") or "redis"
+# Memory queue only: append-only file the queue is restored from after a restart, empty to keep it in memory only
+QUEUE_WAL_PATH = os.environ.get("QUEUE_WAL_PATH") or ""
+QUEUE_WAL_FSYNC = (os.environ.get("QUEUE_WAL_FSYNC") or "false").lower() == "true"
 
 # Configure for Redis
 REDIS_HOST = os.environ.get("REDIS_HOST") or "localhost"
@@ -19,8 +29,24 @@ REDIS_PORT = try_parse_int(os.environ.get("REDIS_PORT")) or 6379
 
 # Configure for hub logic
 BATCH_SIZE = try_parse_int(os.environ.get("BATCH_SIZE")) or 20
+# Number of recent (user_id, seq) reading keys remembered to drop duplicates
+DEDUP_CACHE_SIZE = try_parse_int(os.environ.get("DEDUP_CACHE_SIZE")) or 100000
 
 # MQTT
 MQTT_BROKER_HOST = os.environ.get("MQTT_BROKER_HOST") or "localhost"
 MQTT_BROKER_PORT = try_parse_int(os.environ.get("MQTT_BROKER_PORT")) or 1883
 MQTT_TOPIC = os.environ.get("MQTT_TOPIC") or "processed_agent_data_topic"
+MQTT_PARKING_TOPIC = os.environ.get("MQTT_PARKING_TOPIC") or "parking_zone_data_topic"
+# QoS, session and in-flight window, see road_vision.mqtt for the MQTT_* variables
+MQTT_SETTINGS = MqttSettings.from_env("MQTT_", "hub")
+
+# Logging, see road_vision.logs
+LOG_LEVEL = os.environ.get("LOG_LEVEL") or "INFO"
+# "json" or "text"
+LOG_FORMAT = os.environ.get("LOG_FORMAT") or "json"
+# Set LOG_FILE to an empty string to log only to the console
+LOG_FILE = os.environ.get("LOG_FILE", "app.log")
+# Maximum records per second logged through the root logger (module level logging.info etc.)
+LOG_RATE_LIMIT = try_parse_int(os.environ.get("LOG_RATE_LIMIT")) or 100
+# With DEBUG logging only every LOG_SAMPLE_RATE-th received message is logged
+LOG_SAMPLE_RATE = try_parse_int(os.environ.get("LOG_SAMPLE_RATE")) or 100
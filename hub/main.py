@@ -1,79 +1,167 @@
 import logging
+import time
 from typing import List
 
-import paho.mqtt.client as mqtt
 from fastapi import FastAPI
+from prometheus_client import make_asgi_app
 from redis import Redis
+from road_vision.dedup import DedupCache, reading_key
+from road_vision.entities import parking_zone_data_batch, processed_agent_data_batch
+from road_vision.logs import setup_logging
+from road_vision.mqtt import create_client, subscribe
+from road_vision.tracing import HUB_ENQUEUE, stamp
 
+import metrics
+from app.adapters.memory_batch_queue import MemoryBatchQueue
+from app.adapters.redis_batch_queue import RedisBatchQueue
 from app.adapters.store_api_adapter import StoreApiAdapter
 # from app.entities.agent_data import EdgeData, AccelerometerData, GpsData
+from app.entities.parking_data import ParkingZoneData
 from app.entities.processed_agent_data import ProcessedAgentData
-from config import (STORE_API_BASE_URL, REDIS_HOST, REDIS_PORT, BATCH_SIZE, MQTT_TOPIC, MQTT_BROKER_HOST,
-                    MQTT_BROKER_PORT, )
+from app.interfaces.batch_queue import BatchQueue
+from config import (STORE_API_BASE_URL, STORE_API_STREAM, REDIS_HOST, REDIS_PORT, BATCH_SIZE, MQTT_TOPIC, MQTT_BROKER_HOST,
+                    MQTT_BROKER_PORT, MQTT_PARKING_TOPIC, LOG_SAMPLE_RATE, LOG_LEVEL, LOG_FORMAT, LOG_FILE, LOG_RATE_LIMIT, QUEUE_BACKEND,
+                    QUEUE_WAL_PATH, QUEUE_WAL_FSYNC, MQTT_SETTINGS, DEDUP_CACHE_SIZE, )
 
 # Configure logging settings
-logging.basicConfig(level=logging.INFO,  # Set the log level to INFO (you can use logging.DEBUG for more detailed logs)
-    format="[%(asctime)s] [%(levelname)s] [%(module)s] %(message)s",
-    handlers=[logging.StreamHandler(),  # Output log messages to the console
-        logging.FileHandler("app.log"),  # Save log messages to a file
-    ], )
-# Create an instance of the Redis using the configuration
-redis_client = Redis(host=REDIS_HOST, port=REDIS_PORT)
+setup_logging(
+    "hub",
+    level=LOG_LEVEL,
+    json_output=LOG_FORMAT == "json",
+    log_file=LOG_FILE,
+    rate_limits={"": LOG_RATE_LIMIT},
+    sample_rates={"hub.messages": LOG_SAMPLE_RATE},
+)
+# Received messages are logged at DEBUG level through this logger, sampled by LOG_SAMPLE_RATE
+message_logger = logging.getLogger("hub.messages")
+# Create the batch queue using the configuration
+if QUEUE_BACKEND == "memory":
+    batch_queue: BatchQueue = MemoryBatchQueue(wal_path=QUEUE_WAL_PATH or None, wal_fsync=QUEUE_WAL_FSYNC)
+elif QUEUE_BACKEND == "redis":
+    batch_queue = RedisBatchQueue(Redis(host=REDIS_HOST, port=REDIS_PORT))
+else:
+    raise ValueError(f"Unknown QUEUE_BACKEND: {QUEUE_BACKEND}")
+# Recently received readings, to drop repeated deliveries before they are queued
+dedup_cache = DedupCache(DEDUP_CACHE_SIZE)
 # Create an instance of the StoreApiAdapter using the configuration
-store_adapter = StoreApiAdapter(api_base_url=STORE_API_BASE_URL)
+store_adapter = StoreApiAdapter(api_base_url=STORE_API_BASE_URL, stream=STORE_API_STREAM)
 # Create an instance of the AgentMQTTAdapter using the configuration
 
 # FastAPI
 app = FastAPI()
+app.mount("/metrics", make_asgi_app())
+
+
+def enqueue(processed_agent_data: ProcessedAgentData):
+    """
+    Put the message into the batch queue and send a batch to the Store once BATCH_SIZE messages are queued.
+    Parameters:
+        processed_agent_data (ProcessedAgentData): Message received from the edge.
+    """
+    if not dedup_cache.add(reading_key(processed_agent_data.agent_data)):
+        # Delivered again, e.g. redelivered by MQTT or resent from the edge's offline buffer
+        metrics.messages_duplicate.inc()
+        return
+    stamp(processed_agent_data.agent_data.trace, HUB_ENQUEUE)
+    depth = batch_queue.push(processed_agent_data.model_dump_json().encode("utf-8"))
+    metrics.queue_depth.set(depth)
+    if depth >= BATCH_SIZE:
+        # The queued messages were validated on receipt and serialized by the hub, so they are sent as they are
+        messages = batch_queue.pop_batch(BATCH_SIZE)
+        if not messages:
+            return
+        flushed_at = time.time()
+        metrics.queue_depth.set(depth - len(messages))
+        metrics.batch_size.observe(len(messages))
+        started = time.perf_counter()
+        saved = store_adapter.save_serialized_data(messages, flushed_at)
+        metrics.store_request_latency.observe(time.perf_counter() - started)
+        metrics.messages_forwarded.labels("ok" if saved else "failed").inc(len(messages))
+        logging.debug("Sent %d messages to the Store", len(messages))
+
+
+def forward_parking_data(parking_zones: List[ParkingZoneData]):
+    """
+    Send aggregated parking zones to the Store right away; the edge already batches them per time window.
+    Parameters:
+        parking_zones (List[ParkingZoneData]): Parking zones received from the edge.
+    """
+    saved = store_adapter.save_parking_data(parking_zones)
+    metrics.parking_zones_forwarded.labels("ok" if saved else "failed").inc(len(parking_zones))
 
 
 @app.post("/processed_agent_data/")
 async def save_processed_agent_data(processed_agent_data: ProcessedAgentData):
-    redis_client.lpush("processed_agent_data", processed_agent_data.model_dump_json())
-    if redis_client.llen("processed_agent_data") >= BATCH_SIZE:
-        processed_agent_data_batch: List[ProcessedAgentData] = []
-        for _ in range(BATCH_SIZE):
-            processed_agent_data = ProcessedAgentData.model_validate_json(redis_client.lpop("processed_agent_data"))
-            processed_agent_data_batch.append(processed_agent_data)
-        store_adapter.save_data(processed_agent_data_batch=processed_agent_data_batch)
+    metrics.messages_received.labels("http").inc()
+    message_logger.debug("http message: %s", processed_agent_data)
+    enqueue(processed_agent_data)
+    return {"status": "ok"}
+
+
+@app.post("/parking_data/")
+async def save_parking_data(parking_zones: List[ParkingZoneData]):
+    forward_parking_data(parking_zones)
     return {"status": "ok"}
 
 
 # MQTT
-client = mqtt.Client()
+client = create_client(MQTT_SETTINGS)
 
 
 def on_connect(client, userdata, flags, rc):
     if rc == 0:
         logging.info("Connected to MQTT broker")
-        client.subscribe(MQTT_TOPIC)
+        subscribe(client, MQTT_SETTINGS, [MQTT_TOPIC, MQTT_PARKING_TOPIC])
     else:
         logging.info(f"Failed to connect to MQTT broker with code: {rc}")
 
 
 def on_message(client, userdata, msg):
+    if msg.topic == MQTT_PARKING_TOPIC:
+        on_parking_message(msg)
+        return
+    if msg.payload[:1] == b"[":
+        on_batch_message(msg)
+        return
+    metrics.messages_received.labels("mqtt").inc()
     try:
         payload: str = msg.payload.decode("utf-8")
+        message_logger.debug("mqtt message: %s", payload)
         # Create ProcessedAgentData instance with the received data
-        logging.info(f"mqtt message: {payload}")
         processed_agent_data = ProcessedAgentData.model_validate_json(payload, strict=True)
-        redis_client.lpush("processed_agent_data", processed_agent_data.model_dump_json())
-        if redis_client.llen("processed_agent_data") >= BATCH_SIZE:
-            processed_agent_data_batch: List[ProcessedAgentData] = []
-            for _ in range(BATCH_SIZE):
-                processed_agent_data = ProcessedAgentData.model_validate_json(redis_client.lpop("processed_agent_data"))
-                processed_agent_data_batch.append(processed_agent_data)
-            store_adapter.save_data(processed_agent_data_batch=processed_agent_data_batch)
-            logging.info(f"Saved {BATCH_SIZE} messages to db")
+        enqueue(processed_agent_data)
         return {"status": "ok"}
     except Exception as e:
-        logging.info(f"Error processing MQTT message: {e}")
+        metrics.messages_rejected.labels("mqtt").inc()
+        logging.info("Error processing MQTT message: %s", e)
+
+
+def on_batch_message(msg):
+    """A JSON array of readings the edge buffered while the hub was unreachable."""
+    try:
+        batch = processed_agent_data_batch.validate_json(msg.payload, strict=True)
+    except Exception as e:
+        metrics.messages_rejected.labels("mqtt").inc()
+        logging.info("Error processing MQTT batch message: %s", e)
+        return
+    metrics.messages_received.labels("mqtt").inc(len(batch))
+    message_logger.debug("mqtt batch of %d messages", len(batch))
+    for processed_agent_data in batch:
+        enqueue(processed_agent_data)
+
+
+def on_parking_message(msg):
+    try:
+        forward_parking_data(parking_zone_data_batch.validate_json(msg.payload, strict=True))
+    except Exception as e:
+        metrics.messages_rejected.labels("mqtt").inc()
+        logging.info("Error processing MQTT parking message: %s", e)
 
 
 # Connect
 client.on_connect = on_connect
 client.on_message = on_message
-client.connect(MQTT_BROKER_HOST, MQTT_BROKER_PORT)
+client.connect(MQTT_BROKER_HOST, MQTT_BROKER_PORT, MQTT_SETTINGS.keepalive)
 
 # Start
 client.loop_start()
@@ -0,0 +1,39 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+messages_received = Counter(
+    "hub_messages_received_total",
+    "Processed agent data messages received by the hub",
+    ["source"],
+)
+messages_rejected = Counter(
+    "hub_messages_rejected_total",
+    "Messages that could not be parsed or enqueued",
+    ["source"],
+)
+messages_duplicate = Counter(
+    "hub_messages_duplicate_total",
+    "Readings dropped because the hub had already received them",
+)
+messages_forwarded = Counter(
+    "hub_messages_forwarded_total",
+    "Messages sent to the Store, by result of the Store request",
+    ["result"],
+)
+parking_zones_forwarded = Counter(
+    "hub_parking_zones_forwarded_total",
+    "Aggregated parking zones sent to the Store, by result of the Store request",
+    ["result"],
+)
+queue_depth = Gauge(
+    "hub_queue_depth",
+    "Length of the batch queue after the last enqueue",
+)
+batch_size = Histogram(
+    "hub_batch_size",
+    "Number of messages sent to the Store in one request",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000),
+)
+store_request_latency = Histogram(
+    "hub_store_request_seconds",
+    "Duration of the Store save request, including serialization",
+)
@@ -0,0 +1,52 @@
+import os
+import tempfile
+import unittest
+from app.adapters.memory_batch_queue import MemoryBatchQueue
+
+class TestMemoryBatchQueue(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.wal_path = os.path.join(self.directory.name, "queue.wal")
+    def tearDown(self):
+        self.directory.cleanup()
+    def test_pop_batch_in_push_order(self):
+        queue = MemoryBatchQueue()
+        depths = [queue.push(f'{{"n": {i}}}'.encode()) for i in range(5)]
+        self.assertEqual(depths, [1, 2, 3, 4, 5])
+        self.assertEqual(queue.pop_batch(3), [b'{"n": 0}', b'{"n": 1}', b'{"n": 2}'])
+        # Fewer messages than requested are left
+        self.assertEqual(queue.pop_batch(3), [b'{"n": 3}', b'{"n": 4}'])
+        self.assertEqual(queue.pop_batch(3), [])
+    def test_wal_restores_queued_messages(self):
+        queue = MemoryBatchQueue(wal_path=self.wal_path)
+        for i in range(5):
+            queue.push(f'{{"n": {i}}}'.encode())
+        queue.pop_batch(2)
+        queue.close()
+        restored = MemoryBatchQueue(wal_path=self.wal_path)
+        self.assertEqual(len(restored), 3)
+        self.assertEqual(restored.pop_batch(10), [b'{"n": 2}', b'{"n": 3}', b'{"n": 4}'])
+        restored.close()
+        # The WAL is truncated once the queue is empty
+        self.assertEqual(os.path.getsize(self.wal_path), 0)
+    def test_wal_ignores_torn_last_record(self):
+        with open(self.wal_path, "wb") as wal:
+            wal.write(b'+{"n": 0}\n+{"n": 1}\n-1\n+{"n": 2')
+        queue = MemoryBatchQueue(wal_path=self.wal_path)
+        self.assertEqual(queue.pop_batch(10), [b'{"n": 1}'])
+        queue.close()
+    def test_wal_is_compacted(self):
+        queue = MemoryBatchQueue(wal_path=self.wal_path, wal_compact_bytes=100)
+        for i in range(20):
+            queue.push(f'{{"n": {i}}}'.encode())
+        # The WAL is past 100 bytes, so the pop rewrites it with the 19 queued messages instead of appending
+        queue.pop_batch(1)
+        queue.close()
+        with open(self.wal_path, "rb") as wal:
+            self.assertEqual(len(wal.read().splitlines()), 19)
+        restored = MemoryBatchQueue(wal_path=self.wal_path)
+        self.assertEqual(restored.pop_batch(1), [b'{"n": 1}'])
+        restored.close()
+
+if __name__ == "__main__":
+    unittest.main()
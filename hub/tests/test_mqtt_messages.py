@@ -0,0 +1,68 @@
+import json
+import os
+import unittest
+from unittest.mock import Mock, patch
+
+os.environ.setdefault("QUEUE_BACKEND", "memory")
+os.environ.setdefault("BATCH_SIZE", "2")
+os.environ.setdefault("LOG_FILE", "")
+# main connects to the broker when it is imported
+with patch("paho.mqtt.client.Client.connect"), patch("paho.mqtt.client.Client.loop_start"):
+    import main
+from app.adapters.memory_batch_queue import MemoryBatchQueue
+from road_vision.dedup import DedupCache
+from road_vision.tracing import HUB_ENQUEUE
+
+def reading(seq, y=0.2):
+    return {
+        "road_state": "smooth road",
+        "agent_data": {
+            "user_id": 1, "seq": seq, "accelerometer": {"x": 0.1, "y": y, "z": 0.3},
+            "gps": {"latitude": 10.123, "longitude": 20.456}, "timestamp": "2023-07-21T12:34:56Z",
+        },
+        "traffic_data": {"vehicle_count": 3},
+    }
+
+def message(payload, topic=main.MQTT_TOPIC):
+    return Mock(topic=topic, payload=json.dumps(payload).encode("utf-8"))
+
+class TestMqttMessages(unittest.TestCase):
+    def setUp(self):
+        main.batch_queue = MemoryBatchQueue()
+        main.dedup_cache = DedupCache(100)
+        self.store_adapter = main.store_adapter = Mock()
+        self.store_adapter.save_serialized_data.return_value = True
+    def sent_readings(self):
+        return [
+            json.loads(data) for call in self.store_adapter.save_serialized_data.call_args_list for data in call.args[0]
+        ]
+    def test_valid_message_is_queued(self):
+        main.on_message(None, None, message(reading(1)))
+        (queued,) = main.batch_queue.pop_batch(10)
+        self.assertEqual(json.loads(queued)["agent_data"]["seq"], 1)
+        # Less than BATCH_SIZE readings are kept in the queue
+        self.assertEqual(self.sent_readings(), [])
+    def test_full_batch_is_sent_to_the_store(self):
+        main.on_message(None, None, message(reading(1)))
+        main.on_message(None, None, message(reading(2, y=-9000.0)))
+        readings = self.sent_readings()
+        self.assertEqual([data["agent_data"]["seq"] for data in readings], [1, 2])
+        self.assertEqual(readings[1]["agent_data"]["accelerometer"]["y"], -9000.0)
+        self.assertIn(HUB_ENQUEUE, readings[0]["agent_data"]["trace"])
+    def test_invalid_message_is_rejected(self):
+        invalid = reading(1)
+        del invalid["agent_data"]["gps"]["longitude"]
+        main.on_message(None, None, message(invalid))
+        main.on_message(None, None, Mock(topic=main.MQTT_TOPIC, payload=b"not json"))
+        self.assertEqual(main.batch_queue.pop_batch(10), [])
+    def test_repeated_delivery_is_queued_once(self):
+        main.on_message(None, None, message(reading(1)))
+        main.on_message(None, None, message(reading(1)))
+        self.assertEqual(len(main.batch_queue.pop_batch(10)), 1)
+    def test_batch_message_queues_every_reading(self):
+        main.on_message(None, None, message([reading(1), reading(2), reading(3)]))
+        self.assertEqual([data["agent_data"]["seq"] for data in self.sent_readings()], [1, 2])
+        self.assertEqual(len(main.batch_queue.pop_batch(10)), 1)
+
+if __name__ == "__main__":
+    unittest.main()
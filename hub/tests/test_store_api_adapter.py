@@ -1,17 +1,16 @@
+import gzip
+import json
 import requests
 import unittest
 from unittest.mock import Mock, patch
 from app.adapters.store_api_adapter import StoreApiAdapter
-from app.entities.agent_data import AccelerometerData, AgentData, GpsData
+from app.entities.agent_data import AccelerometerData, AgentData, GpsData, TrafficData
 from app.entities.processed_agent_data import ProcessedAgentData
 
 class TestStoreApiAdapter(unittest.TestCase):
     def setUp(self):
         # Create the StoreApiAdapter instance
         self.store_api_adapter = StoreApiAdapter(api_base_url="http://test-api.com")
-    @patch.object(requests, "post")
-    def test_save_data_success(self, mock_post):
-        # Test successful saving of data to the Store API
         # Sample processed road data
         agent_data = AgentData(
             user_id=1,
@@ -26,47 +25,51 @@ class TestStoreApiAdapter(unittest.TestCase):
             ),
             timestamp="2023-07-21T12:34:56Z",
         )
-        processed_data = ProcessedAgentData(road_state="normal", agent_data=agent_data)
+        self.processed_data = ProcessedAgentData(
+            road_state="normal", agent_data=agent_data, traffic_data=TrafficData(vehicle_count=3)
+        )
+    @patch.object(requests, "post")
+    def test_save_data_success(self, mock_post):
+        # Test successful saving of data to the Store API
         # Mock the response from the Store API
         mock_response = Mock(status_code=201)  # 201 indicates successful creation
         mock_post.return_value = mock_response
         # Call the save_data method
-        result = self.store_api_adapter.save_data(processed_data)
-        # Ensure that the post method of the mock is called with the correct arguments
-        mock_post.assert_called_once_with(
-            "http://test-api.com/agent_data", json=processed_data.model_dump()
-        )
+        result = self.store_api_adapter.save_data([self.processed_data])
+        # Ensure that the post method of the mock is called with the batch as a JSON array
+        mock_post.assert_called_once()
+        url = mock_post.call_args.args[0]
+        self.assertEqual(url, "http://test-api.com/processed_agent_data/")
+        body = json.loads(mock_post.call_args.kwargs["data"])
+        self.assertEqual(body, [json.loads(self.processed_data.model_dump_json())])
         # Ensure that the result is True, indicating successful saving
         self.assertTrue(result)
     @patch.object(requests, "post")
     def test_save_data_failure(self, mock_post):
         # Test failure to save data to the Store API
-        # Sample processed road data
-        agent_data = AgentData(
-            user_id=1,
-            accelerometer=AccelerometerData(
-                x=0.1,
-                y=0.2,
-                z=0.3,
-            ),
-            gps=GpsData(
-                latitude=10.123,
-                longitude=20.456,
-            ),
-            timestamp="2023-07-21T12:34:56Z",
-        )
-        processed_data = ProcessedAgentData(road_state="normal", agent_data=agent_data)
         # Mock the response from the Store API
         mock_response = Mock(status_code=400)  # 400 indicates a client error
         mock_post.return_value = mock_response
         # Call the save_data method
-        result = self.store_api_adapter.save_data(processed_data)
-        # Ensure that the post method of the mock is called with the correct arguments
-        mock_post.assert_called_once_with(
-            "http://test-api.com/agent_data", json=processed_data.model_dump()
-        )
+        result = self.store_api_adapter.save_data([self.processed_data])
+        mock_post.assert_called_once()
         # Ensure that the result is False, indicating failure to save
         self.assertFalse(result)
+    @patch.object(requests, "post")
+    def test_save_serialized_data_streams_gzip_ndjson(self, mock_post):
+        # In stream mode the messages are sent as gzip compressed NDJSON to the streaming endpoint
+        mock_post.return_value = Mock(status_code=200)
+        adapter = StoreApiAdapter(api_base_url="http://test-api.com", stream=True)
+        messages = [self.processed_data.model_dump_json().encode("utf-8")] * 3
+        result = adapter.save_serialized_data(messages, 1700000000.5)
+        url = mock_post.call_args.args[0]
+        headers = mock_post.call_args.kwargs["headers"]
+        body = b"".join(mock_post.call_args.kwargs["data"])
+        self.assertEqual(url, "http://test-api.com/processed_agent_data/stream")
+        self.assertEqual(headers["Content-Encoding"], "gzip")
+        self.assertEqual(headers["Content-Type"], "application/x-ndjson")
+        self.assertEqual(gzip.decompress(body).splitlines(), messages)
+        self.assertTrue(result)
 
 if __name__ == "__main__":
     unittest.main()
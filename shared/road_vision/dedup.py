@@ -0,0 +1,51 @@
+"""
+Duplicate detection for readings delivered more than once (MQTT redelivery, edge store-and-forward, retries).
+
+A reading is identified by (user_id, seq): the agent numbers its readings with a sequence that starts at its
+start time in microseconds, so numbers stay unique across agent restarts. Readings without a seq (older agents)
+are never treated as duplicates.
+"""
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+
+from road_vision.entities import AgentData
+
+
+def reading_key(agent_data: AgentData) -> Optional[Tuple[int, int]]:
+    """Identity of a reading, None when the agent did not number it."""
+    if agent_data.seq is None:
+        return None
+    return agent_data.user_id, agent_data.seq
+
+
+class DedupCache:
+    """
+    The ``max_size`` most recently added keys (LRU). Lookups and additions are O(1); a repeat that arrives after
+    max_size newer keys is not detected, so the database keeps a unique index as the final guard.
+    Thread safe: the hub adds keys from the MQTT network thread and from HTTP handlers.
+    """
+
+    def __init__(self, max_size: int = 100000):
+        self.max_size = max_size
+        self._keys: "OrderedDict[Hashable, None]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key: Optional[Hashable]) -> bool:
+        return key is not None and key in self._keys
+
+    def add(self, key: Optional[Hashable]) -> bool:
+        """Remember ``key``; returns False when it was already there (a duplicate)."""
+        if key is None:
+            return True
+        with self._lock:
+            if key in self._keys:
+                self._keys.move_to_end(key)
+                return False
+            self._keys[key] = None
+            if len(self._keys) > self.max_size:
+                self._keys.popitem(last=False)
+            return True
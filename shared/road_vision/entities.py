@@ -0,0 +1,89 @@
+"""
+Messages passed between the services.
+
+Untrusted input (MQTT messages, HTTP request bodies) is validated with model_validate_json or the precompiled
+batch adapter, which parse the JSON and validate it in one pass. Messages a service produced itself from
+already validated models skip validation: see ProcessedAgentData.model_construct and join_json.
+"""
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Union
+
+from pydantic import BaseModel, Field, TypeAdapter
+
+
+class AccelerometerData(BaseModel):
+    x: float
+    y: float
+    z: float
+
+
+class GpsData(BaseModel):
+    latitude: float
+    longitude: float
+
+
+class TrafficData(BaseModel):
+    vehicle_count: int
+
+
+class AgentData(BaseModel):
+    user_id: int
+    accelerometer: AccelerometerData
+    gps: GpsData
+    # ISO 8601, set by the agent when the reading was taken
+    timestamp: datetime
+    # Pipeline trace stamps, see road_vision.tracing
+    trace: Dict[str, float] = Field(default_factory=dict)
+    # Sequence number of the reading per agent, see road_vision.dedup
+    seq: Optional[int] = None
+
+
+class ParkingData(BaseModel):
+    """Free parking places the agent sees at its position, sent every tick."""
+    empty_count: int
+    gps: GpsData
+
+
+class ParkingZoneData(BaseModel):
+    """Parking occupancy of one geohash cell aggregated over a time window by the edge."""
+    geohash: str
+    # Cell center
+    latitude: float
+    longitude: float
+    latest_empty_count: int
+    min_empty_count: int
+    average_empty_count: float
+    sample_count: int
+    window_start: datetime
+    window_end: datetime
+
+
+class ProcessedAgentData(BaseModel):
+    road_state: str
+    agent_data: AgentData
+    traffic_data: TrafficData
+
+
+# Validates a whole JSON array in one call, faster than validating the items one by one
+processed_agent_data_batch = TypeAdapter(List[ProcessedAgentData])
+# Accelerometer samples of one GPS interval, sent by the agent in one message
+agent_data_batch = TypeAdapter(List[AgentData])
+parking_zone_data_batch = TypeAdapter(List[ParkingZoneData])
+
+
+def parse_batch(data: Union[str, bytes]) -> List[ProcessedAgentData]:
+    """Validate a JSON array of ProcessedAgentData."""
+    return processed_agent_data_batch.validate_json(data)
+
+
+def dump_batch(batch: List[ProcessedAgentData]) -> bytes:
+    """Serialize a batch to a JSON array."""
+    return processed_agent_data_batch.dump_json(batch)
+
+
+def join_json(messages: Iterable[Union[str, bytes]]) -> bytes:
+    """
+    Build a JSON array from messages that are already serialized JSON objects, without parsing them.
+    Only for messages this service serialized itself, e.g. the ones it put into its own queue.
+    """
+    return b"[" + b",".join(m.encode("utf-8") if isinstance(m, str) else m for m in messages) + b"]"
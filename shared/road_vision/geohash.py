@@ -0,0 +1,59 @@
+"""
+Geohash cells (https://en.wikipedia.org/wiki/Geohash).
+
+Precision 7 is a cell of about 153 x 153 m, precision 6 about 1.2 x 0.6 km.
+"""
+from typing import Tuple
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def encode(latitude: float, longitude: float, precision: int = 7) -> str:
+    """Geohash of the cell that contains the point."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        # Bits alternate between longitude and latitude, starting with longitude
+        value, value_range = (longitude, lon_range) if even else (latitude, lat_range)
+        middle = (value_range[0] + value_range[1]) / 2
+        if value >= middle:
+            bits = bits * 2 + 1
+            value_range[0] = middle
+        else:
+            bits = bits * 2
+            value_range[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+
+def bounds(geohash: str) -> Tuple[float, float, float, float]:
+    """(min latitude, min longitude, max latitude, max longitude) of the cell."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        bits = BASE32.index(char)
+        for shift in range(4, -1, -1):
+            value_range = lon_range if even else lat_range
+            middle = (value_range[0] + value_range[1]) / 2
+            if bits >> shift & 1:
+                value_range[0] = middle
+            else:
+                value_range[1] = middle
+            even = not even
+    return lat_range[0], lon_range[0], lat_range[1], lon_range[1]
+
+
+def center(geohash: str) -> Tuple[float, float]:
+    """(latitude, longitude) of the cell center."""
+    min_lat, min_lon, max_lat, max_lon = bounds(geohash)
+    return (min_lat + max_lat) / 2, (min_lon + max_lon) / 2
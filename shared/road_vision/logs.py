@@ -0,0 +1,186 @@
+"""
+Logging setup shared by the services.
+
+Records are put on an in-memory queue by the calling thread and formatted and written by a background
+QueueListener thread, so a slow disk or console never blocks the MQTT and HTTP threads. Rate limits and
+sampling are applied per logger before a record is queued.
+"""
+import atexit
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Optional, Tuple
+
+TEXT_FORMAT = "[%(asctime)s] [%(levelname)s] [%(module)s] %(message)s"
+# Attributes every LogRecord has, anything else was passed through ``extra`` and is added to the JSON output
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_listener: Optional[QueueListener] = None
+# (logger, filter) pairs added by setup_logging, removed again by stop_logging
+_filters: List[Tuple[logging.Logger, logging.Filter]] = []
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as one JSON object per line."""
+
+    def __init__(self, service: str):
+        super().__init__()
+        self.service = service
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "service": self.service,
+            "logger": record.name,
+            "module": record.module,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Token bucket: lets through at most ``per_second`` records per second, with bursts up to one second's worth.
+    The number of records dropped since the last one let through is attached to it as ``suppressed``.
+    """
+
+    def __init__(self, per_second: float):
+        super().__init__()
+        self.per_second = per_second
+        self._tokens = per_second
+        self._updated = time.monotonic()
+        self._suppressed = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.per_second, self._tokens + (now - self._updated) * self.per_second)
+            self._updated = now
+            if self._tokens < 1:
+                self._suppressed += 1
+                return False
+            self._tokens -= 1
+            if self._suppressed:
+                record.suppressed = self._suppressed
+                self._suppressed = 0
+            return True
+
+
+class SamplingFilter(logging.Filter):
+    """Lets through every ``rate``-th record below WARNING; warnings and errors always pass."""
+
+    def __init__(self, rate: int):
+        super().__init__()
+        self.rate = rate
+        self._count = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        self._count += 1
+        return self._count % self.rate == 0
+
+
+class _LazyQueueHandler(QueueHandler):
+    """
+    Queues the record as it is. The default QueueHandler formats the message in the calling thread so the
+    record can be pickled; the queue here never leaves the process, so formatting is left to the listener.
+    """
+
+    def __init__(self, records: queue.Queue):
+        super().__init__(records)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        # Dropping is preferred to blocking the caller when the writer thread falls behind
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logging(
+    service: str,
+    level: str = "INFO",
+    json_output: bool = True,
+    log_file: Optional[str] = "app.log",
+    rate_limits: Optional[Dict[str, float]] = None,
+    sample_rates: Optional[Dict[str, int]] = None,
+    queue_size: int = 10000,
+) -> QueueListener:
+    """
+    Configure the root logger to write through a queue to the console and, if ``log_file`` is set, to a file.
+    Parameters:
+        service (str): Service name added to every JSON record.
+        level (str): Root log level.
+        json_output (bool): Write JSON lines instead of the plain text format.
+        log_file (str): File to append to, None or "" to log only to the console.
+        rate_limits (dict): Logger name -> maximum records per second; "" is the root logger.
+        sample_rates (dict): Logger name -> keep every n-th record below WARNING.
+        queue_size (int): Records waiting for the writer thread; when it is full new records are dropped.
+    Returns:
+        QueueListener: The started listener, also stopped at interpreter exit.
+    """
+    global _listener
+    stop_logging()
+
+    formatter = JsonFormatter(service) if json_output else logging.Formatter(TEXT_FORMAT)
+    handlers = [logging.StreamHandler(sys.stderr)]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    records = queue.Queue(queue_size)
+    queue_handler = _LazyQueueHandler(records)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    # Filters are attached to loggers, so a limit applies to the records logged through that logger
+    for name, per_second in (rate_limits or {}).items():
+        _filters.append((logging.getLogger(name), RateLimitFilter(per_second)))
+    for name, rate in (sample_rates or {}).items():
+        if rate > 1:
+            _filters.append((logging.getLogger(name), SamplingFilter(rate)))
+    for logger, log_filter in _filters:
+        logger.addFilter(log_filter)
+
+    _listener = QueueListener(records, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def stop_logging() -> None:
+    """Write out the queued records and stop the writer thread started by setup_logging."""
+    global _listener
+    for logger, log_filter in _filters:
+        logger.removeFilter(log_filter)
+    _filters.clear()
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,169 @@
+"""
+MQTT client factory shared by the services.
+
+Every service builds its paho clients from MqttSettings, so QoS per topic, persistent sessions and the in-flight
+and queue limits are configured the same way everywhere, through environment variables with a per-client prefix:
+
+    <PREFIX>CLIENT_ID         client id, defaults to "<name>-<hostname>"
+    <PREFIX>CLEAN_SESSION     "false" (default) keeps subscriptions and undelivered QoS 1/2 messages on the broker
+                              while the client is away
+    <PREFIX>QOS               QoS for topics without an entry in TOPIC_QOS (default 0)
+    <PREFIX>TOPIC_QOS         per topic QoS, e.g. "agent_data_topic:1,parking_data_topic:0"
+    <PREFIX>MAX_INFLIGHT      QoS 1/2 messages sent but not yet acknowledged (default 20, paho's default)
+    <PREFIX>MAX_QUEUED        messages waiting for the in-flight window, 0 for no limit (default)
+    <PREFIX>KEEPALIVE         seconds (default 60)
+
+The QoS of a subscription is the one configured for its topic as well; the broker delivers a message with the
+lower of the publish and the subscription QoS.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from paho.mqtt import client as mqtt_client
+
+
+def _parse_topic_qos(value: str) -> Dict[str, int]:
+    topic_qos = {}
+    for entry in value.split(","):
+        if not entry.strip():
+            continue
+        topic, _, qos = entry.rpartition(":")
+        topic_qos[topic.strip()] = int(qos)
+    return topic_qos
+
+
+@dataclass(frozen=True)
+class MqttSettings:
+    client_id: str = ""
+    clean_session: bool = True
+    qos: int = 0
+    topic_qos: Dict[str, int] = field(default_factory=dict)
+    max_inflight: int = 20
+    max_queued: int = 0
+    keepalive: int = 60
+    reconnect_min_delay: int = 1
+    reconnect_max_delay: int = 60
+
+    @classmethod
+    def from_env(cls, prefix: str, name: str) -> "MqttSettings":
+        """
+        Read the settings from environment variables starting with ``prefix``.
+        Parameters:
+            prefix (str): Variable name prefix, e.g. "MQTT_" or "HUB_MQTT_".
+            name (str): Client name used in the default client id.
+        """
+        env = os.environ
+        return cls(
+            client_id=env.get(prefix + "CLIENT_ID") or f"{name}-{socket.gethostname()}",
+            clean_session=(env.get(prefix + "CLEAN_SESSION") or "false").lower() == "true",
+            qos=int(env.get(prefix + "QOS") or 0),
+            topic_qos=_parse_topic_qos(env.get(prefix + "TOPIC_QOS") or ""),
+            max_inflight=int(env.get(prefix + "MAX_INFLIGHT") or 20),
+            max_queued=int(env.get(prefix + "MAX_QUEUED") or 0),
+            keepalive=int(env.get(prefix + "KEEPALIVE") or 60),
+        )
+
+    def qos_for(self, topic: str) -> int:
+        return self.topic_qos.get(topic, self.qos)
+
+
+class PublishTracker:
+    """
+    Counts the messages a client published and the ones the broker acknowledged (PUBACK/PUBCOMP for QoS 1/2;
+    for QoS 0 paho reports a message as published once it is written to the socket).
+    """
+
+    def __init__(self, on_ack: Optional[Callable[[str, float], None]] = None):
+        """
+        Parameters:
+            on_ack (callable): Called with (topic, seconds from publish to acknowledgement) in the network thread.
+        """
+        self.on_ack = on_ack
+        self.published = 0
+        self.acknowledged = 0
+        self.failed = 0
+        self._pending: Dict[int, Tuple[str, float]] = {}
+        # Acknowledgements that arrived before publish() returned and the message was registered
+        self._early = set()
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        """Messages published but not acknowledged yet."""
+        return len(self._pending)
+
+    def track(self, topic: str, info: mqtt_client.MQTTMessageInfo, published_at: float) -> bool:
+        if info.rc != mqtt_client.MQTT_ERR_SUCCESS:
+            self.failed += 1
+            return False
+        with self._lock:
+            self.published += 1
+            if info.mid in self._early:
+                self._early.discard(info.mid)
+                self._acknowledge(topic, published_at)
+            else:
+                self._pending[info.mid] = (topic, published_at)
+        return True
+
+    def on_publish(self, client, userdata, mid):
+        with self._lock:
+            entry = self._pending.pop(mid, None)
+            if entry is None:
+                self._early.add(mid)
+                return
+            self._acknowledge(*entry)
+
+    def _acknowledge(self, topic: str, published_at: float):
+        self.acknowledged += 1
+        if self.on_ack is not None:
+            self.on_ack(topic, time.monotonic() - published_at)
+
+
+def create_client(settings: MqttSettings, tracker: Optional[PublishTracker] = None) -> mqtt_client.Client:
+    """
+    Create a paho client configured from ``settings``; connecting is left to the caller.
+    Parameters:
+        settings (MqttSettings): Session, in-flight window and reconnect settings.
+        tracker (PublishTracker): Receives the client's publish acknowledgements.
+    Returns:
+        mqtt_client.Client: The client.
+    """
+    client = mqtt_client.Client(client_id=settings.client_id, clean_session=settings.clean_session)
+    client.max_inflight_messages_set(settings.max_inflight)
+    client.max_queued_messages_set(settings.max_queued)
+    client.reconnect_delay_set(settings.reconnect_min_delay, settings.reconnect_max_delay)
+    if tracker is not None:
+        client.on_publish = tracker.on_publish
+    return client
+
+
+def subscribe(client: mqtt_client.Client, settings: MqttSettings, topics: Iterable[str]) -> None:
+    """Subscribe to ``topics`` with the QoS configured for each of them."""
+    client.subscribe([(topic, settings.qos_for(topic)) for topic in topics])
+
+
+def publish(
+    client: mqtt_client.Client,
+    settings: MqttSettings,
+    topic: str,
+    payload,
+    tracker: Optional[PublishTracker] = None,
+    qos: Optional[int] = None,
+) -> mqtt_client.MQTTMessageInfo:
+    """
+    Publish with the QoS configured for ``topic`` (or ``qos``) and log a failure.
+    Returns:
+        MQTTMessageInfo: paho's result; ``rc`` is MQTT_ERR_SUCCESS when the message was accepted.
+    """
+    published_at = time.monotonic()
+    info = client.publish(topic, payload, qos=settings.qos_for(topic) if qos is None else qos)
+    if tracker is not None:
+        tracker.track(topic, info, published_at)
+    if info.rc != mqtt_client.MQTT_ERR_SUCCESS:
+        logging.error("Failed to send message to topic %s: %s", topic, mqtt_client.error_string(info.rc))
+    return info
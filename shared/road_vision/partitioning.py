@@ -0,0 +1,62 @@
+"""
+Partitioned MQTT topics, so several edge instances can share the agents' readings.
+
+Agents publish to ``<topic>/<partition>/<key>`` instead of ``<topic>``. The key is the user id for agent and
+traffic readings and a coarse geohash cell for parking readings, and the partition is a stable hash of the
+key. Every edge instance subscribes to ``<topic>/<partition>/+`` for the partitions it owns, so all readings
+of one vehicle (and all parking readings of one zone) reach the same instance and its per-vehicle state stays
+local.
+
+Partitions are assigned to instances by rendezvous hashing: every instance computes the same owner for a
+partition without coordination, and when an instance is added or removed only the partitions of that
+instance move. (MQTT shared subscriptions balance single messages, not keys, so they would split a vehicle's
+readings across instances.)
+"""
+import hashlib
+from typing import List, Optional, Tuple, Union
+
+# Geohash precision of the key of parking readings (about 5 x 5 km). Zones aggregated by the edge must not be
+# larger than this cell, i.e. the edge's parking geohash precision must be at least this value.
+PARKING_KEY_PRECISION = 5
+
+
+def _hash(value: str) -> int:
+    # Python's hash() of a str differs between processes, blake2b is the same on every host
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def partition_of(key: Union[int, str], partitions: int) -> int:
+    """Partition of a user id or zone key."""
+    return _hash(str(key)) % partitions
+
+
+def owner_of(partition: int, instances: int) -> int:
+    """Index of the instance that consumes ``partition`` (rendezvous hashing)."""
+    return max(range(instances), key=lambda instance: _hash(f"{partition}:{instance}"))
+
+
+def owned_partitions(instance: int, instances: int, partitions: int) -> List[int]:
+    """Partitions consumed by instance number ``instance`` of ``instances``."""
+    return [partition for partition in range(partitions) if owner_of(partition, instances) == instance]
+
+
+def partition_topic(topic: str, key: Union[int, str], partitions: int) -> str:
+    """Topic to publish a reading with ``key`` to; ``topic`` itself when partitioning is off (partitions 0)."""
+    if not partitions:
+        return topic
+    return f"{topic}/{partition_of(key, partitions)}/{key}"
+
+
+def subscriptions(topic: str, owned: Optional[List[int]]) -> List[str]:
+    """Topic filters for the ``owned`` partitions of ``topic``; None subscribes to the unpartitioned topic."""
+    if owned is None:
+        return [topic]
+    return [f"{topic}/{partition}/+" for partition in owned]
+
+
+def split_topic(topic: str, partitioned: bool) -> Tuple[str, Optional[str]]:
+    """(base topic, key) of a received message; the key is None for unpartitioned topics."""
+    if not partitioned:
+        return topic, None
+    base, _, key = topic.rsplit("/", 2)
+    return base, key
@@ -0,0 +1,11 @@
+"""
+Road states the edge classifies readings into (see edge/app/usecases/data_processing.py), from the vertical
+acceleration: "big bumps", "dribble", "smooth road", "small bumps" and "humps".
+"""
+
+SMOOTH_ROAD = "smooth road"
+# Road states that count as a defect: in trip statistics, road segment quality, the hourly summaries and the map
+# tiles; the edge delta filter always forwards them
+DEFECT_ROAD_STATES = frozenset({"big bumps", "humps"})
+# Defects that damage vehicles; humps also include speed humps built into the road
+SEVERE_ROAD_STATES = frozenset({"big bumps"})
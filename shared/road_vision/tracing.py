@@ -0,0 +1,51 @@
+"""
+Pipeline trace stamps.
+
+Every reading carries a ``trace`` dict that maps a stamp name to the wall-clock time (POSIX seconds) at which the
+reading passed that point. Stamps are taken with time.time() on different hosts, so hop durations are only as
+accurate as the clock synchronisation between them.
+"""
+import time
+from typing import Dict, Iterator, Tuple
+
+AGENT_SEND = "agent_send"
+EDGE_RECEIVE = "edge_receive"
+EDGE_PROCESS = "edge_process"
+HUB_ENQUEUE = "hub_enqueue"
+HUB_FLUSH = "hub_flush"
+STORE_COMMIT = "store_commit"
+WS_PUSH = "ws_push"
+
+# The hub flushes a whole batch at once and sends the flush time in this header instead of stamping every reading
+HUB_FLUSH_HEADER = "X-Hub-Flush-Time"
+
+# Order in which a reading passes the stamps
+STAMPS = (AGENT_SEND, EDGE_RECEIVE, EDGE_PROCESS, HUB_ENQUEUE, HUB_FLUSH, STORE_COMMIT, WS_PUSH)
+
+
+def stamp(trace: Dict[str, float], name: str, at: float = None) -> None:
+    """Record that the reading passed ``name`` now (or at ``at``)."""
+    trace[name] = time.time() if at is None else at
+
+
+def hop_durations(trace: Dict[str, float]) -> Iterator[Tuple[str, float]]:
+    """
+    Yield (stamp name, seconds since the previous stamp present in the trace) in pipeline order.
+    Missing stamps are skipped, so the time is attributed to the next hop that was recorded.
+    """
+    previous = None
+    for name in STAMPS:
+        at = trace.get(name)
+        if at is None:
+            continue
+        if previous is not None:
+            yield name, at - previous
+        previous = at
+
+
+def end_to_end(trace: Dict[str, float], until: str) -> float:
+    """Seconds from the first stamp of the trace until ``until``, or None when either is missing."""
+    first = next((trace[name] for name in STAMPS if name in trace), None)
+    if first is None or until not in trace:
+        return None
+    return trace[until] - first
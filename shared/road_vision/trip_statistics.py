@@ -0,0 +1,106 @@
+from datetime import datetime
+from math import asin, cos, radians, sin, sqrt
+from typing import Optional, Union
+
+from road_vision.road_states import DEFECT_ROAD_STATES
+
+EARTH_RADIUS_KM = 6371.0088
+# Below this speed the vehicle is considered stopped and GPS jitter is not added to the distance
+MOVING_SPEED_THRESHOLD_KMH = 2.0
+# Segments faster than this are GPS jumps and are skipped
+MAX_PLAUSIBLE_SPEED_KMH = 250.0
+# A longer gap between two readings is a pause in the trip, not driving time
+MAX_GAP_SECONDS = 60.0
+
+
+def haversine_km(latitude1: float, longitude1: float, latitude2: float, longitude2: float) -> float:
+    """Great-circle distance between two points in kilometres."""
+    phi1, phi2 = radians(latitude1), radians(latitude2)
+    d_phi = phi2 - phi1
+    d_lambda = radians(longitude2 - longitude1)
+    a = sin(d_phi / 2) ** 2 + cos(phi1) * cos(phi2) * sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * asin(min(1.0, sqrt(a)))
+
+
+class TripStatistics:
+    """
+    Running trip totals updated in O(1) per reading, independent of how readings are batched.
+    Readings must be added in timestamp order; readings that are not newer than the last one are ignored
+    for distance and time but still counted as defects.
+    """
+
+    def __init__(
+        self,
+        moving_speed_threshold_kmh: float = MOVING_SPEED_THRESHOLD_KMH,
+        max_plausible_speed_kmh: float = MAX_PLAUSIBLE_SPEED_KMH,
+        max_gap_seconds: float = MAX_GAP_SECONDS,
+    ):
+        self.moving_speed_threshold_kmh = moving_speed_threshold_kmh
+        self.max_plausible_speed_kmh = max_plausible_speed_kmh
+        self.max_gap_seconds = max_gap_seconds
+        self.distance_km = 0.0
+        self.moving_time_seconds = 0.0
+        self.max_speed_kmh = 0.0
+        self.defect_count = 0
+        self.reading_count = 0
+        self._last = None
+
+    def add(
+        self,
+        latitude: float,
+        longitude: float,
+        timestamp: Union[datetime, float],
+        road_state: Optional[str] = None,
+    ) -> None:
+        """
+        Add one reading to the totals.
+        Parameters:
+            latitude (float): Latitude of the reading.
+            longitude (float): Longitude of the reading.
+            timestamp (datetime | float): Time of the reading, datetime or POSIX seconds.
+            road_state (str): Classified road state, used to count defects.
+        """
+        if isinstance(timestamp, datetime):
+            timestamp = timestamp.timestamp()
+        self.reading_count += 1
+        if road_state in DEFECT_ROAD_STATES:
+            self.defect_count += 1
+        last = self._last
+        if last is not None:
+            last_latitude, last_longitude, last_timestamp = last
+            elapsed = timestamp - last_timestamp
+            if elapsed <= 0:
+                return
+            if elapsed <= self.max_gap_seconds:
+                distance = haversine_km(last_latitude, last_longitude, latitude, longitude)
+                speed = distance / (elapsed / 3600)
+                if self.moving_speed_threshold_kmh <= speed <= self.max_plausible_speed_kmh:
+                    self.distance_km += distance
+                    self.moving_time_seconds += elapsed
+                    if speed > self.max_speed_kmh:
+                        self.max_speed_kmh = speed
+        self._last = (latitude, longitude, timestamp)
+
+    @property
+    def average_speed_kmh(self) -> float:
+        """Average speed over moving time."""
+        if not self.moving_time_seconds:
+            return 0.0
+        return self.distance_km / (self.moving_time_seconds / 3600)
+
+    @property
+    def defects_per_km(self) -> float:
+        if not self.distance_km:
+            return 0.0
+        return self.defect_count / self.distance_km
+
+    def snapshot(self) -> dict:
+        return {
+            "distance_km": self.distance_km,
+            "moving_time_seconds": self.moving_time_seconds,
+            "average_speed_kmh": self.average_speed_kmh,
+            "max_speed_kmh": self.max_speed_kmh,
+            "defect_count": self.defect_count,
+            "defects_per_km": self.defects_per_km,
+            "reading_count": self.reading_count,
+        }
@@ -0,0 +1,43 @@
+import unittest
+
+from road_vision.dedup import DedupCache, reading_key
+from road_vision.entities import AgentData
+
+AGENT_JSON = (
+    '{"user_id": 1, "accelerometer": {"x": 0.1, "y": 0.2, "z": 0.3}, '
+    '"gps": {"latitude": 50.45, "longitude": 30.52}, "timestamp": "2024-03-01T12:00:00"%s}'
+)
+
+
+class TestDedup(unittest.TestCase):
+    def test_reading_key(self):
+        self.assertEqual(reading_key(AgentData.model_validate_json(AGENT_JSON % ', "seq": 7')), (1, 7))
+        self.assertIsNone(reading_key(AgentData.model_validate_json(AGENT_JSON % "")))
+
+    def test_repeated_key_is_a_duplicate(self):
+        cache = DedupCache(10)
+        self.assertTrue(cache.add((1, 7)))
+        self.assertFalse(cache.add((1, 7)))
+        self.assertIn((1, 7), cache)
+        self.assertTrue(cache.add((2, 7)))
+
+    def test_readings_without_seq_are_never_duplicates(self):
+        cache = DedupCache(10)
+        self.assertTrue(cache.add(None))
+        self.assertTrue(cache.add(None))
+        self.assertNotIn(None, cache)
+        self.assertEqual(len(cache), 0)
+
+    def test_least_recently_seen_key_is_evicted(self):
+        cache = DedupCache(2)
+        cache.add((1, 1))
+        cache.add((1, 2))
+        cache.add((1, 1))
+        cache.add((1, 3))
+        self.assertIn((1, 1), cache)
+        self.assertNotIn((1, 2), cache)
+        self.assertEqual(len(cache), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+from datetime import datetime
+
+from road_vision.entities import AgentData, ProcessedAgentData, TrafficData, dump_batch, join_json, parse_batch
+
+AGENT_JSON = (
+    '{"user_id": 1, "accelerometer": {"x": 0.1, "y": 0.2, "z": 0.3}, '
+    '"gps": {"latitude": 50.45, "longitude": 30.52}, "timestamp": "2024-03-01T12:00:00"}'
+)
+
+
+class TestEntities(unittest.TestCase):
+    def setUp(self):
+        self.item = ProcessedAgentData.model_construct(
+            road_state="smooth road",
+            agent_data=AgentData.model_validate_json(AGENT_JSON, strict=True),
+            traffic_data=TrafficData(vehicle_count=3),
+        )
+
+    def test_batch_round_trip(self):
+        batch = parse_batch(dump_batch([self.item, self.item]))
+        self.assertEqual(batch, [self.item, self.item])
+        self.assertEqual(batch[0].agent_data.timestamp, datetime(2024, 3, 1, 12, 0, 0))
+
+    def test_join_json_matches_dump_batch(self):
+        messages = [self.item.model_dump_json(), self.item.model_dump_json().encode("utf-8")]
+        self.assertEqual(parse_batch(join_json(messages)), parse_batch(dump_batch([self.item, self.item])))
+        self.assertEqual(join_json([]), b"[]")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,23 @@
+import unittest
+
+from road_vision import geohash
+
+
+class TestGeohash(unittest.TestCase):
+    def test_encode(self):
+        # Reference value from https://en.wikipedia.org/wiki/Geohash
+        self.assertEqual(geohash.encode(57.64911, 10.40744, 11), "u4pruydqqvj")
+        self.assertEqual(geohash.encode(57.64911, 10.40744, 5), "u4pru")
+
+    def test_point_is_inside_its_cell(self):
+        for latitude, longitude in ((50.4501, 30.5234), (-33.8688, 151.2093), (0.0, 0.0)):
+            min_lat, min_lon, max_lat, max_lon = geohash.bounds(geohash.encode(latitude, longitude, 7))
+            self.assertTrue(min_lat <= latitude <= max_lat)
+            self.assertTrue(min_lon <= longitude <= max_lon)
+            center_lat, center_lon = geohash.center(geohash.encode(latitude, longitude, 7))
+            self.assertAlmostEqual(center_lat, latitude, delta=0.001)
+            self.assertAlmostEqual(center_lon, longitude, delta=0.001)
+
+
+if __name__ == "__main__":
+    unittest.main()
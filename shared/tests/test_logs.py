@@ -0,0 +1,42 @@
+import json
+import logging
+import unittest
+from unittest.mock import patch
+
+from road_vision.logs import JsonFormatter, RateLimitFilter, SamplingFilter
+
+
+def make_record(level=logging.INFO, msg="message %s", args=("text",), **extra):
+    record = logging.LogRecord("test", level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+class TestLogs(unittest.TestCase):
+    def test_json_formatter_includes_extra_fields(self):
+        entry = json.loads(JsonFormatter("hub").format(make_record(user_id=7)))
+        self.assertEqual(entry["message"], "message text")
+        self.assertEqual(entry["service"], "hub")
+        self.assertEqual(entry["level"], "INFO")
+        self.assertEqual(entry["user_id"], 7)
+
+    def test_rate_limit_reports_suppressed_records(self):
+        with patch("road_vision.logs.time.monotonic", return_value=100.0) as monotonic:
+            log_filter = RateLimitFilter(per_second=2)
+            passed = [log_filter.filter(make_record()) for _ in range(5)]
+            self.assertEqual(passed, [True, True, False, False, False])
+            # Half a second later one token is back
+            monotonic.return_value = 100.5
+            record = make_record()
+            self.assertTrue(log_filter.filter(record))
+            self.assertEqual(record.suppressed, 3)
+
+    def test_sampling_keeps_warnings(self):
+        log_filter = SamplingFilter(rate=3)
+        passed = [log_filter.filter(make_record()) for _ in range(6)]
+        self.assertEqual(passed, [False, False, True, False, False, True])
+        self.assertTrue(log_filter.filter(make_record(level=logging.WARNING)))
+
+
+if __name__ == "__main__":
+    unittest.main()
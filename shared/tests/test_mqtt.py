@@ -0,0 +1,55 @@
+import unittest
+from unittest.mock import patch
+
+from paho.mqtt import client as mqtt_client
+
+from road_vision.mqtt import MqttSettings, PublishTracker, create_client
+
+
+def message_info(mid, rc=mqtt_client.MQTT_ERR_SUCCESS):
+    info = mqtt_client.MQTTMessageInfo(mid)
+    info.rc = rc
+    return info
+
+
+class TestMqtt(unittest.TestCase):
+    def test_settings_from_env(self):
+        env = {"HUB_MQTT_QOS": "1", "HUB_MQTT_TOPIC_QOS": "parking:0, agent/data:2", "HUB_MQTT_MAX_INFLIGHT": "100"}
+        with patch.dict("os.environ", env, clear=True), patch("socket.gethostname", return_value="host"):
+            settings = MqttSettings.from_env("HUB_MQTT_", "edge")
+        self.assertEqual(settings.client_id, "edge-host")
+        self.assertFalse(settings.clean_session)
+        self.assertEqual(settings.max_inflight, 100)
+        self.assertEqual(settings.qos_for("parking"), 0)
+        self.assertEqual(settings.qos_for("agent/data"), 2)
+        self.assertEqual(settings.qos_for("traffic"), 1)
+
+    def test_create_client_applies_session_settings(self):
+        client = create_client(MqttSettings(client_id="hub-1", clean_session=False, max_inflight=50, max_queued=10))
+        self.assertEqual(client._client_id, b"hub-1")
+        self.assertFalse(client._clean_session)
+        self.assertEqual(client._max_inflight_messages, 50)
+        self.assertEqual(client._max_queued_messages, 10)
+
+    def test_tracker_counts_acknowledgements(self):
+        acks = []
+        tracker = PublishTracker(on_ack=lambda topic, seconds: acks.append(topic))
+        self.assertTrue(tracker.track("a", message_info(1), 0.0))
+        self.assertTrue(tracker.track("b", message_info(2), 0.0))
+        self.assertFalse(tracker.track("c", message_info(3, mqtt_client.MQTT_ERR_NO_CONN), 0.0))
+        self.assertEqual(tracker.pending, 2)
+        tracker.on_publish(None, None, 2)
+        self.assertEqual((tracker.published, tracker.acknowledged, tracker.failed), (2, 1, 1))
+        self.assertEqual(acks, ["b"])
+
+    def test_tracker_handles_ack_before_track(self):
+        # The network thread can acknowledge a message before publish() returned to the caller
+        tracker = PublishTracker()
+        tracker.on_publish(None, None, 7)
+        tracker.track("a", message_info(7), 0.0)
+        self.assertEqual(tracker.pending, 0)
+        self.assertEqual(tracker.acknowledged, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
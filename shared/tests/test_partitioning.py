@@ -0,0 +1,35 @@
+import unittest
+
+from road_vision.partitioning import owned_partitions, partition_topic, split_topic, subscriptions
+
+
+class TestPartitioning(unittest.TestCase):
+    def test_partitions_are_split_between_instances(self):
+        owned = [owned_partitions(instance, 3, 32) for instance in range(3)]
+        self.assertEqual(sorted(p for partitions in owned for p in partitions), list(range(32)))
+        for partitions in owned:
+            self.assertTrue(partitions)
+
+    def test_adding_an_instance_only_moves_partitions_to_it(self):
+        before = {p: i for i in range(3) for p in owned_partitions(i, 3, 64)}
+        after = {p: i for i in range(4) for p in owned_partitions(i, 4, 64)}
+        moved = [p for p in range(64) if before[p] != after[p]]
+        self.assertTrue(moved)
+        self.assertTrue(all(after[p] == 3 for p in moved))
+
+    def test_published_topic_matches_a_subscription(self):
+        topic = partition_topic("agent_data_topic", 42, 16)
+        partition = int(topic.split("/")[1])
+        self.assertIn(f"agent_data_topic/{partition}/+", subscriptions("agent_data_topic", [partition]))
+        self.assertEqual(split_topic(topic, True), ("agent_data_topic", "42"))
+        # The user id always maps to the same partition
+        self.assertEqual(topic, partition_topic("agent_data_topic", 42, 16))
+
+    def test_unpartitioned_topics_are_unchanged(self):
+        self.assertEqual(partition_topic("agent_data_topic", 42, 0), "agent_data_topic")
+        self.assertEqual(subscriptions("agent_data_topic", None), ["agent_data_topic"])
+        self.assertEqual(split_topic("agent_data_topic", False), ("agent_data_topic", None))
+
+
+if __name__ == "__main__":
+    unittest.main()
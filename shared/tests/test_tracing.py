@@ -0,0 +1,33 @@
+import unittest
+
+from road_vision.tracing import (
+    AGENT_SEND, EDGE_PROCESS, EDGE_RECEIVE, HUB_ENQUEUE, HUB_FLUSH, STORE_COMMIT, end_to_end, hop_durations, stamp
+)
+
+
+class TestTracing(unittest.TestCase):
+    def test_hop_durations_follow_pipeline_order(self):
+        trace = {}
+        # Stamped out of order on purpose, hops are computed in pipeline order
+        stamp(trace, HUB_FLUSH, 13.0)
+        stamp(trace, AGENT_SEND, 10.0)
+        stamp(trace, EDGE_RECEIVE, 10.5)
+        stamp(trace, EDGE_PROCESS, 10.75)
+        stamp(trace, HUB_ENQUEUE, 11.0)
+        stamp(trace, STORE_COMMIT, 13.5)
+        self.assertEqual(
+            list(hop_durations(trace)),
+            [(EDGE_RECEIVE, 0.5), (EDGE_PROCESS, 0.25), (HUB_ENQUEUE, 0.25), (HUB_FLUSH, 2.0), (STORE_COMMIT, 0.5)],
+        )
+        self.assertEqual(end_to_end(trace, STORE_COMMIT), 3.5)
+
+    def test_missing_stamps_are_attributed_to_the_next_hop(self):
+        # A reading posted straight to the hub has no agent or edge stamps
+        trace = {HUB_ENQUEUE: 1.0, STORE_COMMIT: 4.0}
+        self.assertEqual(list(hop_durations(trace)), [(STORE_COMMIT, 3.0)])
+        self.assertEqual(end_to_end(trace, STORE_COMMIT), 3.0)
+        self.assertIsNone(end_to_end({}, STORE_COMMIT))
+
+
+if __name__ == "__main__":
+    unittest.main()
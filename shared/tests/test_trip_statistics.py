@@ -0,0 +1,61 @@
+import unittest
+from datetime import datetime, timedelta
+
+from road_vision.trip_statistics import TripStatistics, haversine_km
+
+
+class TestTripStatistics(unittest.TestCase):
+    def setUp(self):
+        self.start = datetime(2024, 3, 1, 12, 0, 0)
+
+    def test_haversine_km(self):
+        # Kyiv - Lviv, about 468 km
+        self.assertAlmostEqual(haversine_km(50.4501, 30.5234, 49.8397, 24.0297), 468, delta=3)
+
+    def test_totals_of_a_steady_drive(self):
+        stats = TripStatistics()
+        for i in range(50):
+            stats.add(50.45 + i * 0.0001, 30.52, self.start + timedelta(seconds=i))
+        # 49 segments of 0.0001 deg latitude, ~11.1 m each, one per second
+        self.assertAlmostEqual(stats.distance_km, 49 * 0.01112, delta=0.01)
+        self.assertAlmostEqual(stats.average_speed_kmh, 40.0, delta=0.5)
+        self.assertEqual(stats.moving_time_seconds, 49)
+
+    def test_duplicate_and_out_of_order_timestamps_are_ignored(self):
+        points = [(50.45 + i * 0.0001, 30.52, self.start + timedelta(seconds=i)) for i in range(20)]
+        in_order = TripStatistics()
+        for point in points:
+            in_order.add(*point)
+        delayed = TripStatistics()
+        for i, point in enumerate(points):
+            delayed.add(*point)
+            if i == 10:
+                # A repeat of the last timestamp and a late reading from 5 s ago, both far off the route
+                delayed.add(50.46, 30.53, point[2])
+                delayed.add(50.46, 30.53, points[5][2])
+        self.assertEqual(delayed.reading_count, in_order.reading_count + 2)
+        self.assertEqual(delayed.distance_km, in_order.distance_km)
+        self.assertEqual(delayed.moving_time_seconds, in_order.moving_time_seconds)
+        self.assertEqual(delayed.max_speed_kmh, in_order.max_speed_kmh)
+
+    def test_stationary_jitter_and_gps_jumps_are_ignored(self):
+        stats = TripStatistics()
+        stats.add(50.45, 30.52, self.start)
+        # 1 m of jitter over 10 s is below the moving threshold
+        stats.add(50.450009, 30.52, self.start + timedelta(seconds=10))
+        # 10 km in one second is a GPS jump
+        stats.add(50.54, 30.52, self.start + timedelta(seconds=11))
+        self.assertEqual(stats.distance_km, 0)
+        self.assertEqual(stats.moving_time_seconds, 0)
+        self.assertEqual(stats.reading_count, 3)
+
+    def test_defects_per_km(self):
+        stats = TripStatistics()
+        stats.add(50.45, 30.52, self.start, "smooth road")
+        stats.add(50.46, 30.52, self.start + timedelta(seconds=60), "humps")
+        self.assertEqual(stats.defect_count, 1)
+        self.assertAlmostEqual(stats.defects_per_km, 1 / 1.112, delta=0.01)
+
+
+if __name__ == "__main__":
+    unittest.main()
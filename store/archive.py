@@ -0,0 +1,194 @@
+"""
+Columnar archive files of processed_agent_data rows.
+
+Every column is stored as one zlib compressed block of 64-bit words:
+    * delta - integers and timestamps (microseconds), stored as zigzag encoded differences to the previous row
+    * xor - floats, stored as the XOR of their bits with the previous row, so repeated and close values
+      turn into words with long runs of zero bits
+    * dictionary - strings, stored as indexes into a list of the distinct values kept in the header
+The words are written byte-transposed (all first bytes, then all second bytes, ...), which puts the zero bytes
+next to each other for zlib. Columns with NULLs also get a compressed block of one byte per row.
+
+File layout: MAGIC, a 4 byte big-endian header length, the JSON header, then the blocks in header order.
+Archives can be concatenated (e.g. GET /export/processed_agent_data?format=archive); decode reads them all.
+"""
+import json
+import os
+import struct
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+MAGIC = b"RVARCH1\n"
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+MASK = (1 << 64) - 1
+# (column, encoding) of the archived processed_agent_data columns
+COLUMNS = (
+    ("id", "delta"),
+    ("user_id", "delta"),
+    ("seq", "delta"),
+    ("timestamp", "delta"),
+    ("event_timestamp", "delta"),
+    ("vehicle_count", "delta"),
+    ("x", "xor"),
+    ("y", "xor"),
+    ("z", "xor"),
+    ("latitude", "xor"),
+    ("longitude", "xor"),
+    ("road_state", "dictionary"),
+    ("segment_id", "dictionary"),
+)
+TIMESTAMP_COLUMNS = ("timestamp", "event_timestamp")
+
+
+def _shuffle(words: Sequence[int]) -> bytes:
+    data = struct.pack(f">{len(words)}Q", *words)
+    return b"".join(data[i::8] for i in range(8))
+
+
+def _unshuffle(data: bytes, count: int) -> Tuple[int, ...]:
+    words = bytearray(8 * count)
+    for i in range(8):
+        words[i::8] = data[i * count:(i + 1) * count]
+    return struct.unpack(f">{count}Q", words)
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) & MASK if value >= 0 else ((-value << 1) - 1) & MASK
+
+
+def _unzigzag(word: int) -> int:
+    return -((word + 1) >> 1) if word & 1 else word >> 1
+
+
+def _fill_nulls(values: List, default) -> Tuple[List, Optional[bytes]]:
+    """Replace NULLs by the previous value, which costs a zero word; returns the values and the null mask."""
+    if all(value is not None for value in values):
+        return values, None
+    filled = []
+    previous = default
+    for value in values:
+        previous = previous if value is None else value
+        filled.append(previous)
+    return filled, bytes(value is None for value in values)
+
+
+def _encode_delta(values: List[int]) -> bytes:
+    words = []
+    previous = 0
+    for value in values:
+        words.append(_zigzag(value - previous))
+        previous = value
+    return _shuffle(words)
+
+
+def _decode_delta(data: bytes, count: int) -> List[int]:
+    values = []
+    previous = 0
+    for word in _unshuffle(data, count):
+        previous += _unzigzag(word)
+        values.append(previous)
+    return values
+
+
+def _encode_xor(values: List[float]) -> bytes:
+    bits = struct.unpack(f">{len(values)}Q", struct.pack(f">{len(values)}d", *values))
+    return _shuffle([word ^ previous for word, previous in zip(bits, (0,) + bits[:-1])])
+
+
+def _decode_xor(data: bytes, count: int) -> List[float]:
+    bits = []
+    previous = 0
+    for word in _unshuffle(data, count):
+        previous ^= word
+        bits.append(previous)
+    return list(struct.unpack(f">{count}d", struct.pack(f">{count}Q", *bits)))
+
+
+def encode(rows: List[Dict]) -> bytes:
+    """Encode rows (mappings with the COLUMNS keys) into the archive format."""
+    header = {"rows": len(rows), "columns": []}
+    blocks = []
+    for name, encoding in COLUMNS:
+        values = [row.get(name) for row in rows]
+        if name in TIMESTAMP_COLUMNS:
+            values = [None if value is None else (value - EPOCH) // MICROSECOND for value in values]
+        column = {"name": name, "encoding": encoding}
+        if encoding == "dictionary":
+            values, nulls = _fill_nulls(values, "")
+            column["dictionary"] = sorted(set(values))
+            indexes = {value: index for index, value in enumerate(column["dictionary"])}
+            data = _shuffle([indexes[value] for value in values])
+        else:
+            values, nulls = _fill_nulls(values, 0)
+            data = _encode_delta(values) if encoding == "delta" else _encode_xor(values)
+        data = zlib.compress(data, 9)
+        column["size"] = len(data)
+        blocks.append(data)
+        if nulls is not None:
+            nulls = zlib.compress(nulls, 9)
+            column["null_size"] = len(nulls)
+            blocks.append(nulls)
+        header["columns"].append(column)
+    header = json.dumps(header).encode("utf-8")
+    return MAGIC + struct.pack(">I", len(header)) + header + b"".join(blocks)
+
+
+def _decode_at(data: bytes, offset: int) -> Tuple[List[Dict], int]:
+    if not data.startswith(MAGIC, offset):
+        raise ValueError("Not a processed_agent_data archive")
+    offset += len(MAGIC)
+    (header_size,) = struct.unpack_from(">I", data, offset)
+    offset += 4
+    header = json.loads(data[offset:offset + header_size])
+    offset += header_size
+    count = header["rows"]
+    columns = {}
+    for column in header["columns"]:
+        block = zlib.decompress(data[offset:offset + column["size"]])
+        offset += column["size"]
+        if column["encoding"] == "dictionary":
+            values = [column["dictionary"][index] for index in _unshuffle(block, count)]
+        elif column["encoding"] == "delta":
+            values = _decode_delta(block, count)
+        else:
+            values = _decode_xor(block, count)
+        if column["name"] in TIMESTAMP_COLUMNS:
+            values = [EPOCH + value * MICROSECOND for value in values]
+        if "null_size" in column:
+            nulls = zlib.decompress(data[offset:offset + column["null_size"]])
+            offset += column["null_size"]
+            values = [None if null else value for value, null in zip(values, nulls)]
+        columns[column["name"]] = values
+    return [dict(zip(columns, row)) for row in zip(*columns.values())], offset
+
+
+def decode_chunks(data: bytes) -> Iterator[List[Dict]]:
+    """Rows of each archive in ``data``, which may hold several encoded archives one after another."""
+    offset = 0
+    while offset < len(data):
+        rows, offset = _decode_at(data, offset)
+        yield rows
+
+
+def decode(data: bytes) -> List[Dict]:
+    """Rows of an archive created by encode, or of several concatenated ones."""
+    return [row for rows in decode_chunks(data) for row in rows]
+
+
+def write(path: str, rows: List[Dict]) -> int:
+    """Write rows to an archive file atomically and durably; returns the file size."""
+    data = encode(rows)
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+    return len(data)
+
+
+def read(path: str) -> List[Dict]:
+    with open(path, "rb") as file:
+        return decode(file.read())
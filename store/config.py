@@ -14,3 +14,57 @@ POSTGRES_PORT = try_parse(int, os.environ.get("POSTGRES_PORT")) or 5432
 POSTGRES_USER = os.environ.get("POSTGRES_USER") or "user"
 POSTGRES_PASSWORD = os.environ.get("POSTGRES_PASS") or "pass"
 POSTGRES_DB = os.environ.get("POSTGRES_DB") or "test_db"
+# Full SQLAlchemy URL, overrides the POSTGRES_* settings (e.g. sqlite:///bench.db for benchmarks)
+DATABASE_URL = (
+    os.environ.get("DATABASE_URL")
+    or f"postgresql+psycopg2://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
+)
+
+# Group commit: readings of concurrent requests are written in one transaction. The first request waits up to
+# GROUP_COMMIT_MAX_DELAY_MS for others, or until GROUP_COMMIT_MAX_ROWS rows are collected; 0 commits every request
+# on its own
+GROUP_COMMIT_MAX_DELAY_MS = try_parse(float, os.environ.get("GROUP_COMMIT_MAX_DELAY_MS"))
+if GROUP_COMMIT_MAX_DELAY_MS is None:
+    GROUP_COMMIT_MAX_DELAY_MS = 5
+GROUP_COMMIT_MAX_ROWS = try_parse(int, os.environ.get("GROUP_COMMIT_MAX_ROWS")) or 1000
+
+# POST /processed_agent_data/stream: readings saved at a time, and the longest accepted NDJSON line
+STREAM_INSERT_ROWS = try_parse(int, os.environ.get("STREAM_INSERT_ROWS")) or 1000
+STREAM_MAX_LINE_BYTES = try_parse(int, os.environ.get("STREAM_MAX_LINE_BYTES")) or 1024 * 1024
+
+# Number of recent (user_id, seq) reading keys remembered to drop duplicates without a query
+DEDUP_CACHE_SIZE = try_parse(int, os.environ.get("DEDUP_CACHE_SIZE")) or 100000
+
+# Retention: readings older than RETENTION_MAX_AGE_HOURS (0 keeps them forever) are written to columnar archive
+# files in ARCHIVE_DIR, added to the hourly summaries and deleted, RETENTION_BATCH_ROWS at a time
+RETENTION_MAX_AGE_HOURS = try_parse(float, os.environ.get("RETENTION_MAX_AGE_HOURS")) or 0
+RETENTION_INTERVAL_SECONDS = try_parse(float, os.environ.get("RETENTION_INTERVAL_SECONDS")) or 3600
+RETENTION_BATCH_ROWS = try_parse(int, os.environ.get("RETENTION_BATCH_ROWS")) or 50000
+ARCHIVE_DIR = os.environ.get("ARCHIVE_DIR") or "archive"
+
+# Rows fetched from the server-side cursor and written at a time by GET /export/processed_agent_data
+EXPORT_CHUNK_ROWS = try_parse(int, os.environ.get("EXPORT_CHUNK_ROWS")) or 10000
+
+# Map-matching: GeoJSON road graph (empty: readings are not matched to road segments), the farthest a reading is
+# matched to a segment in meters, and the size of the grid cells the segments are indexed in
+ROAD_GRAPH_PATH = os.environ.get("ROAD_GRAPH_PATH") or ""
+MAP_MATCH_MAX_DISTANCE_M = try_parse(float, os.environ.get("MAP_MATCH_MAX_DISTANCE_M")) or 20
+ROAD_GRID_CELL_DEGREES = try_parse(float, os.environ.get("ROAD_GRID_CELL_DEGREES")) or 0.001
+
+# Live congestion: readings are counted per geohash cell of CONGESTION_GEOHASH_PRECISION over a sliding window of
+# CONGESTION_WINDOW_SECONDS that moves in steps of CONGESTION_SLOT_SECONDS; a cell is congested from an average
+# vehicle_count of CONGESTION_VEHICLE_COUNT. The WebSocket feed is sent every CONGESTION_PUSH_INTERVAL_SECONDS
+CONGESTION_GEOHASH_PRECISION = try_parse(int, os.environ.get("CONGESTION_GEOHASH_PRECISION")) or 6
+CONGESTION_WINDOW_SECONDS = try_parse(float, os.environ.get("CONGESTION_WINDOW_SECONDS")) or 300
+CONGESTION_SLOT_SECONDS = try_parse(float, os.environ.get("CONGESTION_SLOT_SECONDS")) or 10
+CONGESTION_VEHICLE_COUNT = try_parse(float, os.environ.get("CONGESTION_VEHICLE_COUNT")) or 6
+CONGESTION_PUSH_INTERVAL_SECONDS = try_parse(float, os.environ.get("CONGESTION_PUSH_INTERVAL_SECONDS")) or 1
+
+# Logging, see road_vision.logs
+LOG_LEVEL = os.environ.get("LOG_LEVEL") or "INFO"
+# "json" or "text"
+LOG_FORMAT = os.environ.get("LOG_FORMAT") or "json"
+# Set LOG_FILE to an empty string to log only to the console
+LOG_FILE = os.environ.get("LOG_FILE", "app.log")
+# Maximum records per second logged through the root logger (module level logging.info etc.)
+LOG_RATE_LIMIT = try_parse(int, os.environ.get("LOG_RATE_LIMIT")) or 100
@@ -0,0 +1,119 @@
+from typing import Dict, List, Optional, Tuple
+
+from road_vision import geohash
+
+
+class TimeWheel:
+    """
+    Reading count and vehicle_count sum of a sliding window, kept in a ring buffer of ``slots`` time slots of
+    ``slot_seconds`` each. The window totals are updated as slots are added and expire, so adding a reading
+    and reading the totals are O(1) (moving the wheel forward clears at most ``slots`` slots).
+    """
+
+    __slots__ = ("slot_seconds", "readings", "vehicles", "total_readings", "total_vehicles", "current")
+
+    def __init__(self, slots: int, slot_seconds: float):
+        self.slot_seconds = slot_seconds
+        self.readings = [0] * slots
+        self.vehicles = [0] * slots
+        self.total_readings = 0
+        self.total_vehicles = 0
+        # Number of the newest slot since the epoch
+        self.current: Optional[int] = None
+
+    def advance(self, now: float):
+        """Move the wheel to the time ``now``, expiring the slots that left the window."""
+        slot = int(now // self.slot_seconds)
+        if self.current is None:
+            self.current = slot
+            return
+        if slot <= self.current:
+            return
+        for number in range(self.current + 1, self.current + 1 + min(slot - self.current, len(self.readings))):
+            index = number % len(self.readings)
+            self.total_readings -= self.readings[index]
+            self.total_vehicles -= self.vehicles[index]
+            self.readings[index] = 0
+            self.vehicles[index] = 0
+        self.current = slot
+
+    def add(self, timestamp: float, vehicle_count: int):
+        """Count a reading in the slot of ``timestamp``; readings older than the window are ignored."""
+        self.advance(timestamp)
+        slot = int(timestamp // self.slot_seconds)
+        if slot <= self.current - len(self.readings):
+            return
+        index = slot % len(self.readings)
+        self.readings[index] += 1
+        self.vehicles[index] += vehicle_count
+        self.total_readings += 1
+        self.total_vehicles += vehicle_count
+
+
+class CongestionEngine:
+    """
+    Sliding window of the readings and vehicle counts of every geohash cell with recent readings.
+    Not thread safe: add and snapshot have to be called from the same thread (the Store's event loop).
+    """
+
+    def __init__(self, precision: int = 6, window_seconds: float = 300, slot_seconds: float = 10,
+                 congested_vehicle_count: float = 6):
+        """
+        Parameters:
+            precision (int): Geohash precision of the cells (6 is about 1.2 x 0.6 km).
+            window_seconds (float): Length of the sliding window.
+            slot_seconds (float): Resolution of the window; readings expire a slot at a time.
+            congested_vehicle_count (float): Average vehicle_count from which a cell is congested.
+        """
+        self.precision = precision
+        self.window_seconds = window_seconds
+        self.slot_seconds = slot_seconds
+        self.slots = max(int(round(window_seconds / slot_seconds)), 1)
+        self.congested_vehicle_count = congested_vehicle_count
+        self.cells: Dict[str, TimeWheel] = {}
+        self._centers: Dict[str, Tuple[float, float]] = {}
+
+    def add(self, latitude: float, longitude: float, vehicle_count: int, timestamp: float, now: float):
+        """
+        Count a reading taken at ``timestamp``. Readings older than the window (e.g. sent late from the edge's
+        offline buffer) are not live traffic and are ignored; readings from the future count as taken ``now``.
+        Times are seconds since the epoch.
+        """
+        if timestamp <= now - self.window_seconds:
+            return
+        timestamp = min(timestamp, now)
+        cell = geohash.encode(latitude, longitude, self.precision)
+        wheel = self.cells.get(cell)
+        if wheel is None:
+            wheel = self.cells[cell] = TimeWheel(self.slots, self.slot_seconds)
+            self._centers[cell] = geohash.center(cell)
+        wheel.add(timestamp, vehicle_count)
+
+    def snapshot(self, now: float, bounds: Optional[Tuple[float, float, float, float]] = None) -> List[dict]:
+        """
+        Current congestion of the cells with readings in the window; cells without any are forgotten.
+        Parameters:
+            now (float): Current time, seconds since the epoch.
+            bounds (tuple): Optional (min latitude, min longitude, max latitude, max longitude) of the cell centers.
+        """
+        cells = []
+        for cell, wheel in list(self.cells.items()):
+            wheel.advance(now)
+            if wheel.total_readings == 0:
+                del self.cells[cell]
+                del self._centers[cell]
+                continue
+            latitude, longitude = self._centers[cell]
+            if bounds is not None and not (bounds[0] <= latitude <= bounds[2] and bounds[1] <= longitude <= bounds[3]):
+                continue
+            average = wheel.total_vehicles / wheel.total_readings
+            cells.append({
+                "geohash": cell,
+                "latitude": latitude,
+                "longitude": longitude,
+                "readings": wheel.total_readings,
+                "readings_per_minute": wheel.total_readings * 60 / self.window_seconds,
+                "average_vehicle_count": average,
+                "congested": average >= self.congested_vehicle_count,
+            })
+        return cells
@@ -0,0 +1,42 @@
+import csv
+import io
+import zlib
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Sequence
+
+import archive
+
+# zlib wbits of a gzip stream
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+def csv_gzip_chunks(chunks: Iterable[List[Dict]], columns: Sequence[str]) -> Iterator[bytes]:
+    """
+    Gzip compressed CSV of the rows, with a header line; one compressed piece per chunk of rows.
+    Parameters:
+        chunks (Iterable[List[Dict]]): Rows, a chunk at a time (e.g. Result.partitions()).
+        columns (Sequence[str]): Columns written, in order.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, GZIP_WBITS)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in chunks:
+        for row in rows:
+            writer.writerow([
+                value.isoformat() if isinstance(value, datetime) else value
+                for value in (row[column] for column in columns)
+            ])
+        data = compressor.compress(buffer.getvalue().encode("utf-8"))
+        buffer.seek(0)
+        buffer.truncate()
+        if data:
+            yield data
+    yield compressor.compress(buffer.getvalue().encode("utf-8")) + compressor.flush()
+
+
+def archive_chunks(chunks: Iterable[List[Dict]]) -> Iterator[bytes]:
+    """Concatenated columnar archives (see archive.py), one per chunk of rows; archive.decode reads them back."""
+    for rows in chunks:
+        if rows:
+            yield archive.encode(rows)
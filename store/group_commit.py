@@ -0,0 +1,97 @@
+import asyncio
+import time
+from typing import Any, Callable, List, Optional
+
+import metrics
+
+
+class _Group:
+    """Rows of the requests that are committed in one transaction."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.rows: List[dict] = []
+        self.requests = 0
+        self.full = asyncio.Event()
+        self.committed = loop.create_future()
+        # Task that writes the group; referenced so it is not garbage collected while it runs
+        self.flush_task: Optional[asyncio.Task] = None
+
+
+class GroupCommitWriter:
+    """
+    Merges the rows of concurrent requests into one transaction.
+
+    The first request of a group starts a task that waits up to max_delay seconds, or until max_rows rows were
+    added, while other requests add their rows to the same group; then it writes the whole group with one call
+    of ``write_rows`` in a worker thread. The task does not belong to any request, so a cancelled request does
+    not stop the group from being written. Every request of the group waits until that transaction is
+    committed and gets its error if it fails, or else the results of its own rows. Groups are written one at a time, so the next group fills up
+    while the previous one is being committed.
+    With max_delay 0 every request is written on its own, in the calling thread.
+    """
+
+    def __init__(self, write_rows: Callable[[List[dict]], List[Any]], max_delay: float = 0.005, max_rows: int = 1000):
+        """
+        Parameters:
+            write_rows (callable): Inserts and commits the rows in one transaction and returns one result per row;
+                blocking.
+            max_delay (float): Seconds the first request of a group waits for more rows.
+            max_rows (int): Rows after which a group is written without waiting any longer.
+        """
+        self.write_rows = write_rows
+        self.max_delay = max_delay
+        self.max_rows = max_rows
+        self._group: Optional[_Group] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def write(self, rows: List[dict]) -> List[Any]:
+        """Return the results of ``rows`` (see write_rows) once they are committed."""
+        if self.max_delay <= 0:
+            return self._commit(rows, 1)
+        group = self._group
+        if group is None:
+            group = self._group = _Group(asyncio.get_running_loop())
+            group.flush_task = asyncio.create_task(self._flush(group))
+        start = len(group.rows)
+        group.rows.extend(rows)
+        group.requests += 1
+        if len(group.rows) >= self.max_rows:
+            group.full.set()
+        # Shielded, so a cancelled request does not cancel the result the other requests of the group wait for
+        results = await asyncio.shield(group.committed)
+        return results[start:start + len(rows)]
+
+    async def _flush(self, group: _Group):
+        try:
+            try:
+                await asyncio.wait_for(group.full.wait(), self.max_delay)
+            except asyncio.TimeoutError:
+                pass
+            if self._lock is None:
+                self._lock = asyncio.Lock()
+            async with self._lock:
+                # The group takes rows until it is written, also while the previous group is being committed
+                if self._group is group:
+                    self._group = None
+                results = await asyncio.get_running_loop().run_in_executor(
+                    None, self._commit, group.rows, group.requests
+                )
+        except asyncio.CancelledError:
+            group.committed.set_exception(RuntimeError("Group commit was cancelled"))
+            raise
+        except Exception as e:
+            group.committed.set_exception(e)
+        else:
+            group.committed.set_result(results)
+        finally:
+            # Later requests start a new group even if this one failed before it was taken
+            if self._group is group:
+                self._group = None
+
+    def _commit(self, rows: List[dict], requests: int) -> List[Any]:
+        started = time.perf_counter()
+        results = self.write_rows(rows)
+        metrics.db_insert_latency.observe(time.perf_counter() - started)
+        metrics.group_commit_rows.observe(len(rows))
+        metrics.group_commit_requests.observe(requests)
+        return results
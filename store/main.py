@@ -1,32 +1,64 @@
+import asyncio
 import json
-from typing import Set, Dict, List
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+import logging
+import time
+import zlib
+from itertools import groupby
+from math import atan, ceil, cos, degrees, pi, radians, sinh
+from typing import Optional, Set, Dict, List
+from fastapi import FastAPI, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
 from sqlalchemy import (
     create_engine,
     MetaData,
     Table,
     Column,
     Integer,
+    BigInteger,
+    Index,
     String,
     Float,
     DateTime,
 )
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.sql import select, insert, update, delete
-from datetime import datetime
-from pydantic import BaseModel, field_validator
-from config import (
-    POSTGRES_HOST,
-    POSTGRES_PORT,
-    POSTGRES_DB,
-    POSTGRES_USER,
-    POSTGRES_PASSWORD,
-)
+from sqlalchemy.sql import select, insert, update, delete, func
+from datetime import datetime, timedelta
+from prometheus_client import make_asgi_app
+from pydantic import BaseModel, ValidationError
+from road_vision.dedup import DedupCache, reading_key
+from road_vision.entities import ParkingZoneData, ProcessedAgentData, parse_batch
+from road_vision.logs import setup_logging
+from road_vision.road_states import DEFECT_ROAD_STATES, SEVERE_ROAD_STATES, SMOOTH_ROAD
+from road_vision.tracing import HUB_FLUSH, HUB_FLUSH_HEADER, STORE_COMMIT, WS_PUSH, stamp
+from road_vision.trip_statistics import TripStatistics, haversine_km
+from config import (DATABASE_URL, LOG_LEVEL, LOG_FORMAT, LOG_FILE, LOG_RATE_LIMIT, GROUP_COMMIT_MAX_DELAY_MS,
+                    GROUP_COMMIT_MAX_ROWS, STREAM_INSERT_ROWS, STREAM_MAX_LINE_BYTES, DEDUP_CACHE_SIZE,
+                    RETENTION_MAX_AGE_HOURS, RETENTION_INTERVAL_SECONDS, RETENTION_BATCH_ROWS, ARCHIVE_DIR,
+                    EXPORT_CHUNK_ROWS, ROAD_GRAPH_PATH, MAP_MATCH_MAX_DISTANCE_M, ROAD_GRID_CELL_DEGREES,
+                    CONGESTION_GEOHASH_PRECISION, CONGESTION_WINDOW_SECONDS, CONGESTION_SLOT_SECONDS,
+                    CONGESTION_VEHICLE_COUNT, CONGESTION_PUSH_INTERVAL_SECONDS)
+import metrics
+from congestion import CongestionEngine
+from export import archive_chunks, csv_gzip_chunks
+from group_commit import GroupCommitWriter
+from ndjson_stream import LineTooLong, UnsupportedEncoding, iter_lines
+from retention import RetentionJob
+from road_graph import RoadGraph
+from metrics import observe_trace, observe_ws_push
 
+# Logging setup
+setup_logging(
+    "store",
+    level=LOG_LEVEL,
+    json_output=LOG_FORMAT == "json",
+    log_file=LOG_FILE,
+    rate_limits={"": LOG_RATE_LIMIT},
+)
 # FastAPI app setup
 app = FastAPI()
+app.mount("/metrics", make_asgi_app())
 # SQLAlchemy setup
-DATABASE_URL = f"postgresql+psycopg2://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
 engine = create_engine(DATABASE_URL)
 metadata = MetaData()
 # Define the ProcessedAgentData table
@@ -43,8 +75,81 @@ processed_agent_data = Table(
     Column("longitude", Float),
     Column("timestamp", DateTime),
     Column("vehicle_count", Integer),
+    Column("event_timestamp", DateTime),
+    Column("seq", BigInteger),
+    # Road segment the reading was map-matched to, see road_graph.py
+    Column("segment_id", String),
+    # Final guard against readings delivered more than once, see road_vision.dedup
+    Index("processed_agent_data_user_seq_idx", "user_id", "seq", unique=True),
+)
+# Latest parking occupancy per geohash cell, one row per cell
+parking_zones = Table(
+    "parking_zones",
+    metadata,
+    Column("geohash", String, primary_key=True),
+    Column("latitude", Float),
+    Column("longitude", Float),
+    Column("latest_empty_count", Integer),
+    Column("min_empty_count", Integer),
+    Column("average_empty_count", Float),
+    Column("sample_count", Integer),
+    Column("window_start", DateTime),
+    Column("window_end", DateTime),
 )
+# Quality of every road segment readings were matched to, across all vehicles
+road_segments = Table(
+    "road_segments",
+    metadata,
+    Column("segment_id", String, primary_key=True),
+    Column("name", String),
+    Column("latitude", Float),
+    Column("longitude", Float),
+    Column("sample_count", Integer),
+    Column("defect_count", Integer),
+    Column("severe_defect_count", Integer),
+    Column("defect_score", Float),
+    Column("confidence", Float),
+    Column("updated_at", DateTime),
+)
+# Readings moved out of processed_agent_data by the retention job, per geohash cell and hour
+processed_agent_data_hourly = Table(
+    "processed_agent_data_hourly",
+    metadata,
+    Column("geohash", String(12), primary_key=True),
+    Column("hour", DateTime, primary_key=True),
+    Column("latitude", Float),
+    Column("longitude", Float),
+    Column("reading_count", Integer),
+    Column("defect_count", Integer),
+    Column("y_min", Float),
+    Column("y_max", Float),
+    Column("y_sum", Float),
+    Column("vehicle_count_sum", Integer),
+)
+# INSERT ... ON CONFLICT is dialect specific; SQLite is used by the benchmarks
+if engine.dialect.name == "sqlite":
+    from sqlalchemy.dialects.sqlite import insert as upsert
+else:
+    from sqlalchemy.dialects.postgresql import insert as upsert
 SessionLocal = sessionmaker(bind=engine)
+# Defects within one grid cell are returned as a single row. The grid has TILE_GRID_CELLS cells across a tile,
+# but cells are never smaller than 1 / TILE_GRID deg (~10 m)
+TILE_GRID = 10000
+TILE_GRID_CELLS = 256
+MAX_TILE_DEFECTS = 1000
+# Kilometers per degree of latitude
+KM_PER_DEGREE = 111.32
+# Most points GET /users/{user_id}/track returns
+MAX_TRACK_POINTS = 10000
+# defect_score is the defect rate of a segment shrunk towards SEGMENT_PRIOR_DEFECT_RATE as if the segment had
+# SEGMENT_PRIOR_SAMPLES more readings at that rate, so a few readings cannot make a segment the worst one
+SEGMENT_PRIOR_SAMPLES = 20.0
+SEGMENT_PRIOR_DEFECT_RATE = 0.1
+# (media type, file extension) of the GET /export/processed_agent_data formats
+EXPORT_FORMATS = {
+    "csv": ("application/gzip", "csv.gz"),
+    "archive": ("application/octet-stream", "rva"),
+}
 
 
 # SQLAlchemy model
@@ -59,49 +164,237 @@ class ProcessedAgentDataInDB(BaseModel):
     longitude: float
     timestamp: datetime
     vehicle_count: int
+    event_timestamp: Optional[datetime]
+    seq: Optional[int] = None
+    segment_id: Optional[str] = None
 
 
-# FastAPI models
-class AccelerometerData(BaseModel):
-    x: float
-    y: float
-    z: float
+class NearestParkingZone(ParkingZoneData):
+    distance_km: float
+
 
+class TripStatisticsResponse(BaseModel):
+    distance_km: float
+    moving_time_seconds: float
+    average_speed_kmh: float
+    max_speed_kmh: float
+    defect_count: int
+    defects_per_km: float
+    reading_count: int
 
-class GpsData(BaseModel):
+
+class DefectCluster(BaseModel):
     latitude: float
     longitude: float
+    road_state: str
+    count: int
 
-class TrafficData(BaseModel):
-    vehicle_count: int
 
-class AgentData(BaseModel):
-    user_id: int
-    accelerometer: AccelerometerData
-    gps: GpsData
+class TrackPoint(BaseModel):
     timestamp: datetime
+    latitude: float
+    longitude: float
+    min_y: float
+    max_y: float
+    road_state: str
+    vehicle_count: float
+    count: int
 
-    @classmethod
-    @field_validator("timestamp", mode="before")
-    def check_timestamp(cls, value):
-        if isinstance(value, datetime):
-            return value
-        try:
-            return datetime.fromisoformat(value)
-        except (TypeError, ValueError):
-            raise ValueError(
-                "Invalid timestamp format. Expected ISO 8601 format (YYYY-MM-DDTHH:MM:SSZ)."
-            )
+
+class RoadSegmentQuality(BaseModel):
+    segment_id: str
+    name: Optional[str]
+    latitude: float
+    longitude: float
+    sample_count: int
+    defect_count: int
+    severe_defect_count: int
+    defect_score: float
+    confidence: float
+    updated_at: datetime
 
 
-class ProcessedAgentData(BaseModel):
-    road_state: str
-    agent_data: AgentData
-    traffic_data: TrafficData
+class CongestionCell(BaseModel):
+    geohash: str
+    latitude: float
+    longitude: float
+    readings: int
+    readings_per_minute: float
+    average_vehicle_count: float
+    congested: bool
+
+
+class CongestionSnapshot(BaseModel):
+    precision: int
+    window_seconds: float
+    cells: List[CongestionCell]
+
+
+# Readings that are already in the table are skipped
+insert_readings_query = upsert(processed_agent_data).on_conflict_do_nothing(
+    index_elements=[processed_agent_data.c.user_id, processed_agent_data.c.seq]
+)
+# Only the inserted readings are returned: their keys, and the columns the road segment statistics are computed from
+insert_readings_query = insert_readings_query.returning(
+    processed_agent_data.c.user_id,
+    processed_agent_data.c.seq,
+    processed_agent_data.c.segment_id,
+    processed_agent_data.c.road_state,
+    processed_agent_data.c.timestamp,
+)
+
+
+def segment_scores(sample_count, defect_count) -> dict:
+    """defect_score and confidence of a segment with these counts; numbers or SQL expressions."""
+    return {
+        "defect_score": (
+            (defect_count + SEGMENT_PRIOR_SAMPLES * SEGMENT_PRIOR_DEFECT_RATE) / (sample_count + SEGMENT_PRIOR_SAMPLES)
+        ),
+        "confidence": sample_count / (sample_count + SEGMENT_PRIOR_SAMPLES),
+    }
+
+
+# Segment statistics are added to the stored ones
+upsert_segments_query = upsert(road_segments)
+upsert_segments_query = upsert_segments_query.on_conflict_do_update(
+    index_elements=[road_segments.c.segment_id],
+    set_={
+        "sample_count": road_segments.c.sample_count + upsert_segments_query.excluded.sample_count,
+        "defect_count": road_segments.c.defect_count + upsert_segments_query.excluded.defect_count,
+        "severe_defect_count": (
+            road_segments.c.severe_defect_count + upsert_segments_query.excluded.severe_defect_count
+        ),
+        **segment_scores(
+            road_segments.c.sample_count + upsert_segments_query.excluded.sample_count,
+            road_segments.c.defect_count + upsert_segments_query.excluded.defect_count,
+        ),
+        "updated_at": upsert_segments_query.excluded.updated_at,
+    },
+)
+
+
+def segment_statistics(rows: List[dict]) -> List[dict]:
+    """
+    Statistics of the road segments of map-matched readings.
+    Parameters:
+        rows (List[dict]): processed_agent_data rows.
+    Returns:
+        List[dict]: road_segments rows with the counts of these readings alone.
+    """
+    statistics = {}
+    for row in rows:
+        segment_id = row["segment_id"]
+        if segment_id is None:
+            continue
+        if segment_id not in statistics:
+            segment = road_graph.segments[segment_id]
+            statistics[segment_id] = {
+                "segment_id": segment_id, "name": segment.name, "latitude": segment.latitude,
+                "longitude": segment.longitude, "sample_count": 0, "defect_count": 0, "severe_defect_count": 0,
+                "updated_at": row["timestamp"],
+            }
+        segment = statistics[segment_id]
+        segment["sample_count"] += 1
+        segment["defect_count"] += row["road_state"] in DEFECT_ROAD_STATES
+        segment["severe_defect_count"] += row["road_state"] in SEVERE_ROAD_STATES
+    for segment in statistics.values():
+        segment.update(segment_scores(segment["sample_count"], segment["defect_count"]))
+    return list(statistics.values())
+
+
+def remove_segment_reading(db, segment_id: Optional[str], road_state: str):
+    """Take a reading that is updated or deleted out of the statistics of its road segment."""
+    if segment_id is None:
+        return
+    sample_count = road_segments.c.sample_count - 1
+    defect_count = road_segments.c.defect_count - int(road_state in DEFECT_ROAD_STATES)
+    db.execute(
+        update(road_segments)
+        .where(road_segments.c.segment_id == segment_id)
+        .values(
+            sample_count=sample_count,
+            defect_count=defect_count,
+            severe_defect_count=road_segments.c.severe_defect_count - int(road_state in SEVERE_ROAD_STATES),
+            **segment_scores(sample_count, defect_count),
+        )
+    )
+
+
+def insert_readings(rows: List[dict]) -> List[bool]:
+    """
+    Insert rows of processed_agent_data and update the statistics of their road segments in one transaction.
+    Returns:
+        List[bool]: Per row, whether it was inserted; False for readings already in the table, and for all but the
+            first row with the same (user_id, seq).
+    """
+    try:
+        db = SessionLocal()
+        inserted = db.execute(insert_readings_query, rows).mappings().all()
+        if road_graph is not None:
+            segments = segment_statistics(inserted)
+            if segments:
+                db.execute(upsert_segments_query, segments)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    # Readings without a seq are never skipped
+    keys = {(row["user_id"], row["seq"]) for row in inserted if row["seq"] is not None}
+    results = []
+    for row in rows:
+        if row["seq"] is None:
+            results.append(True)
+        else:
+            key = (row["user_id"], row["seq"])
+            results.append(key in keys)
+            keys.discard(key)
+    return results
+
+
+# Road segments readings are map-matched to; without ROAD_GRAPH_PATH readings are not matched
+road_graph = None
+if ROAD_GRAPH_PATH:
+    road_graph = RoadGraph.load(ROAD_GRAPH_PATH, MAP_MATCH_MAX_DISTANCE_M, ROAD_GRID_CELL_DEGREES)
+# Keys of recently saved readings
+dedup_cache = DedupCache(DEDUP_CACHE_SIZE)
+# Rows of concurrent POST /processed_agent_data/ requests are committed together
+writer = GroupCommitWriter(insert_readings, GROUP_COMMIT_MAX_DELAY_MS / 1000, GROUP_COMMIT_MAX_ROWS)
+# Archives readings older than RETENTION_MAX_AGE_HOURS, see retention.py
+retention_job = RetentionJob(
+    SessionLocal,
+    processed_agent_data,
+    processed_agent_data_hourly,
+    upsert,
+    ARCHIVE_DIR,
+    timedelta(hours=RETENTION_MAX_AGE_HOURS),
+    RETENTION_BATCH_ROWS,
+    RETENTION_INTERVAL_SECONDS,
+)
+
+
+# Live congestion per geohash cell over the last CONGESTION_WINDOW_SECONDS
+congestion = CongestionEngine(
+    CONGESTION_GEOHASH_PRECISION, CONGESTION_WINDOW_SECONDS, CONGESTION_SLOT_SECONDS, CONGESTION_VEHICLE_COUNT
+)
+
+
+@app.on_event("startup")
+def start_retention_job():
+    if RETENTION_MAX_AGE_HOURS > 0:
+        retention_job.start()
+
+
+@app.on_event("startup")
+async def start_congestion_feed():
+    asyncio.create_task(push_congestion())
 
 
 # WebSocket subscriptions
 subscriptions: Dict[int, Set[WebSocket]] = {}
+# Running trip statistics per user, updated for every reading saved since the Store started
+trip_statistics: Dict[int, TripStatistics] = {}
 
 
 # FastAPI WebSocket endpoint
@@ -111,59 +404,219 @@ async def websocket_endpoint(websocket: WebSocket, user_id: int):
     if user_id not in subscriptions:
         subscriptions[user_id] = set()
     subscriptions[user_id].add(websocket)
+    metrics.websocket_subscribers.inc()
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        # Also after other errors, so no dead connection is kept
+        subscriptions[user_id].discard(websocket)
+        metrics.websocket_subscribers.dec()
+
+
+# Subscribers of the congestion feed
+congestion_subscriptions: Set[WebSocket] = set()
+
+
+def congestion_snapshot(bounds=None) -> dict:
+    cells = congestion.snapshot(time.time(), bounds)
+    metrics.congestion_cells.set(len(congestion.cells))
+    return {"precision": congestion.precision, "window_seconds": congestion.window_seconds, "cells": cells}
+
+
+@app.websocket("/congestion/ws")
+async def congestion_websocket_endpoint(websocket: WebSocket):
+    """Sends the congestion snapshot (see GET /congestion) every CONGESTION_PUSH_INTERVAL_SECONDS."""
+    await websocket.accept()
+    congestion_subscriptions.add(websocket)
+    metrics.websocket_subscribers.inc()
     try:
         while True:
             await websocket.receive_text()
     except WebSocketDisconnect:
-        subscriptions[user_id].remove(websocket)
+        pass
+    finally:
+        congestion_subscriptions.discard(websocket)
+        metrics.websocket_subscribers.dec()
+
+
+async def push_congestion():
+    while True:
+        await asyncio.sleep(CONGESTION_PUSH_INTERVAL_SECONDS)
+        if not congestion_subscriptions:
+            continue
+        message = json.dumps(congestion_snapshot())
+        for websocket in list(congestion_subscriptions):
+            metrics.websocket_pending_sends.inc()
+            try:
+                await websocket.send_text(message)
+                metrics.websocket_messages_sent.inc()
+            except Exception:
+                # Closed connections are removed by their endpoint
+                logging.debug("Failed to send the congestion snapshot", exc_info=True)
+            finally:
+                metrics.websocket_pending_sends.dec()
 
 
 # Function to send data to subscribed users
 async def send_data_to_subscribers(user_id: int, data):
     if user_id in subscriptions:
-        for websocket in subscriptions[user_id]:
-            await websocket.send_json(json.dumps(data))
+        # A copy: connections may be removed while a send is awaited
+        for websocket in list(subscriptions[user_id]):
+            metrics.websocket_pending_sends.inc()
+            try:
+                await websocket.send_json(json.dumps(data))
+                metrics.websocket_messages_sent.inc()
+            except Exception:
+                # The readings are already committed, so a closed connection must not fail the request
+                logging.debug("Failed to send a reading to user %s", user_id, exc_info=True)
+                subscriptions[user_id].discard(websocket)
+            finally:
+                metrics.websocket_pending_sends.dec()
 
 
 # FastAPI CRUDL endpoints
 
-@app.post("/processed_agent_data/")
-async def create_processed_agent_data(data: List[ProcessedAgentData]):
+async def save_readings(data: List[ProcessedAgentData], flushed_at: Optional[str]):
+    """Insert the readings and, once they are committed, update the trip statistics and notify subscribers."""
+    if flushed_at is not None:
+        # Only used for tracing, so a malformed header does not fail the request
+        try:
+            flush_time = float(flushed_at)
+        except ValueError:
+            logging.warning("Ignoring invalid %s header: %r", HUB_FLUSH_HEADER, flushed_at)
+        else:
+            for item in data:
+                stamp(item.agent_data.trace, HUB_FLUSH, flush_time)
+    metrics.readings_received.inc(len(data))
+    metrics.batch_size.observe(len(data))
+    # Readings saved before are dropped here without a query; the unique index catches the ones the cache missed
+    unique = []
+    keys = set()
+    for item in data:
+        key = reading_key(item.agent_data)
+        if key in dedup_cache or (key is not None and key in keys):
+            continue
+        keys.add(key)
+        unique.append(item)
+    if len(unique) < len(data):
+        metrics.readings_duplicate.inc(len(data) - len(unique))
+    data = unique
+    if not data:
+        return
+    timestamp = datetime.now()
+    rows = []
+    for item in data:
+        agent_data = item.agent_data
+        accelerometer = agent_data.accelerometer
+        gps = agent_data.gps
+        rows.append({
+            "road_state": item.road_state,
+            "user_id": agent_data.user_id,
+            "x": accelerometer.x,
+            "y": accelerometer.y,
+            "z": accelerometer.z,
+            "latitude": gps.latitude,
+            "longitude": gps.longitude,
+            "timestamp": timestamp,
+            "vehicle_count": item.traffic_data.vehicle_count,
+            "event_timestamp": agent_data.timestamp,
+            "seq": agent_data.seq,
+            "segment_id": road_graph.snap(agent_data.gps.latitude, agent_data.gps.longitude) if road_graph else None,
+        })
     try:
-        db = SessionLocal()
-        for item in data:
-            road_state = item.road_state
-            agent_data = item.agent_data
-            user_id = agent_data.user_id
-            accelerometer = agent_data.accelerometer
-            gps = agent_data.gps
-            timestamp = datetime.now()
-            vehicle_count = item.traffic_data.vehicle_count
-
-            query = insert(processed_agent_data).values(
-                road_state=road_state,
-                user_id=user_id,
-                x=accelerometer.x,
-                y=accelerometer.y,
-                z=accelerometer.z,
-                latitude=gps.latitude,
-                longitude=gps.longitude,
-                timestamp=timestamp,
-                vehicle_count=vehicle_count
-            )
-            db.execute(query)
-
-            await send_data_to_subscribers(user_id, item.json())
-
-        db.commit()
+        # Returns once the rows are committed, possibly in one transaction with rows of other requests
+        inserted = await writer.write(rows)
     except Exception as e:
-        db.rollback()
+        logging.exception("Failed to save %d readings", len(data))
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        db.close()
+    # Only remembered once committed, so a failed request can be retried
+    for key in keys:
+        dedup_cache.add(key)
+    # Duplicates the cache missed were skipped by the unique index and are not counted or sent again
+    data = [item for item, new in zip(data, inserted) if new]
+    if len(data) < len(rows):
+        metrics.readings_duplicate.inc(len(rows) - len(data))
+
+    committed_at = time.time()
+    for item in data:
+        agent_data = item.agent_data
+        stamp(agent_data.trace, STORE_COMMIT, committed_at)
+        observe_trace(agent_data.trace)
+        if agent_data.user_id not in trip_statistics:
+            trip_statistics[agent_data.user_id] = TripStatistics()
+        trip_statistics[agent_data.user_id].add(
+            agent_data.gps.latitude, agent_data.gps.longitude, agent_data.timestamp, item.road_state
+        )
+        congestion.add(
+            agent_data.gps.latitude,
+            agent_data.gps.longitude,
+            item.traffic_data.vehicle_count,
+            agent_data.timestamp.timestamp(),
+            committed_at,
+        )
+        if agent_data.user_id in subscriptions:
+            stamp(agent_data.trace, WS_PUSH)
+            await send_data_to_subscribers(agent_data.user_id, item.json())
+            observe_ws_push(agent_data.trace)
+
+
+@app.post("/processed_agent_data/")
+async def create_processed_agent_data(request: Request):
+    """
+    Save a JSON array of ProcessedAgentData.
+    The body is validated with the precompiled batch adapter in one pass instead of FastAPI's per-field
+    validation of a List[ProcessedAgentData] parameter.
+    """
+    try:
+        data = parse_batch(await request.body())
+    except ValidationError as e:
+        # Same error format as FastAPI's own body validation
+        raise RequestValidationError([{**error, "loc": ("body", *error["loc"])} for error in e.errors()])
+    await save_readings(data, request.headers.get(HUB_FLUSH_HEADER))
     return {"message": "Data created successfully"}
 
 
+@app.post("/processed_agent_data/stream")
+async def stream_processed_agent_data(request: Request):
+    """
+    Save ProcessedAgentData sent as NDJSON, one object per line, optionally gzip or deflate compressed
+    (Content-Encoding). The body is decompressed and parsed while it arrives and saved every STREAM_INSERT_ROWS
+    readings, so memory use does not grow with the body size.
+    The readings are not saved in one transaction: when a line is invalid, the readings before it stay saved
+    and the error reports how many there were.
+    """
+    flushed_at = request.headers.get(HUB_FLUSH_HEADER)
+    lines = iter_lines(request.stream(), request.headers.get("content-encoding", ""), STREAM_MAX_LINE_BYTES)
+    data = []
+    saved = 0
+    line_number = 0
+    try:
+        async for line in lines:
+            line_number += 1
+            data.append(ProcessedAgentData.model_validate_json(line))
+            if len(data) >= STREAM_INSERT_ROWS:
+                await save_readings(data, flushed_at)
+                saved += len(data)
+                data = []
+    except ValidationError as e:
+        raise RequestValidationError([
+            {**error, "loc": ("body", line_number, *error["loc"]), "saved": saved} for error in e.errors()
+        ])
+    except UnsupportedEncoding as e:
+        raise HTTPException(status_code=415, detail=f"Unsupported Content-Encoding: {e}")
+    except LineTooLong as e:
+        raise HTTPException(status_code=413, detail=f"{e}, {saved} readings saved")
+    except zlib.error as e:
+        raise HTTPException(status_code=400, detail=f"Invalid compressed body: {e}, {saved} readings saved")
+    if data:
+        await save_readings(data, flushed_at)
+        saved += len(data)
+    return {"message": "Data created successfully", "count": saved}
+
+
 @app.get(
     "/processed_agent_data/{processed_agent_data_id}",
     response_model=ProcessedAgentDataInDB,
@@ -192,6 +645,294 @@ def list_processed_agent_data():
         db.close()
 
 
+@app.get("/users/{user_id}/trip_statistics", response_model=TripStatisticsResponse)
+def read_trip_statistics(user_id: int):
+    if user_id not in trip_statistics:
+        return TripStatistics().snapshot()
+    return trip_statistics[user_id].snapshot()
+
+
+def merge_track_rows(rows) -> List[TrackPoint]:
+    """
+    Merge rows grouped by (bucket, road_state) into one point per bucket.
+    Parameters:
+        rows: Rows ordered by bucket, with per group aggregates: the sums of latitude, longitude and
+            vehicle_count, min/max y, the first timestamp and the count.
+    Returns:
+        List[TrackPoint]: Points in time order; road_state is the state with the most readings in the bucket.
+    """
+    points = []
+    for bucket, group in groupby(rows, key=lambda row: row["bucket"]):
+        group = list(group)
+        count = sum(row["count"] for row in group)
+        points.append(TrackPoint(
+            timestamp=min(row["timestamp"] for row in group),
+            latitude=sum(row["latitude"] for row in group) / count,
+            longitude=sum(row["longitude"] for row in group) / count,
+            min_y=min(row["min_y"] for row in group),
+            max_y=max(row["max_y"] for row in group),
+            road_state=max(group, key=lambda row: row["count"])["road_state"],
+            vehicle_count=sum(row["vehicle_count"] for row in group) / count,
+            count=count,
+        ))
+    return points
+
+
+@app.get("/users/{user_id}/track", response_model=List[TrackPoint])
+def read_track(user_id: int, start: Optional[datetime] = None, end: Optional[datetime] = None,
+               points: int = 500, bucket_seconds: Optional[float] = None):
+    """
+    Track of a user downsampled to time buckets, so a long trip is drawn without fetching every reading.
+    The bucket width is bucket_seconds, or the time range split into ``points`` buckets. min_y/max_y keep
+    the bumps of a bucket and road_state is its most frequent state.
+    """
+    if bucket_seconds is not None and bucket_seconds <= 0:
+        raise HTTPException(status_code=422, detail="bucket_seconds must be positive")
+    if not 0 < points <= MAX_TRACK_POINTS:
+        raise HTTPException(status_code=422, detail=f"points must be between 1 and {MAX_TRACK_POINTS}")
+    event_timestamp = processed_agent_data.c.event_timestamp
+    conditions = [processed_agent_data.c.user_id == user_id, event_timestamp.is_not(None)]
+    if start is not None:
+        conditions.append(event_timestamp >= start)
+    if end is not None:
+        conditions.append(event_timestamp < end)
+    try:
+        db = SessionLocal()
+        first, last = db.execute(select(func.min(event_timestamp), func.max(event_timestamp)).where(*conditions)).one()
+        if first is None:
+            return []
+        if bucket_seconds is None:
+            # Whole seconds, the resolution of the epoch in SQLite
+            bucket_seconds = max(ceil(((end or last) - (start or first)).total_seconds() / points), 1)
+        elif ((end or last) - (start or first)).total_seconds() / bucket_seconds > MAX_TRACK_POINTS:
+            raise HTTPException(status_code=422, detail=f"More than {MAX_TRACK_POINTS} buckets, use a wider bucket")
+        bucket = func.floor(func.extract("epoch", event_timestamp) / bucket_seconds).label("bucket")
+        # Grouping by road_state too gives the dominant state per bucket without a dialect specific mode()
+        query = (
+            select(
+                bucket,
+                processed_agent_data.c.road_state,
+                func.min(event_timestamp).label("timestamp"),
+                func.sum(processed_agent_data.c.latitude).label("latitude"),
+                func.sum(processed_agent_data.c.longitude).label("longitude"),
+                func.min(processed_agent_data.c.y).label("min_y"),
+                func.max(processed_agent_data.c.y).label("max_y"),
+                func.coalesce(func.sum(processed_agent_data.c.vehicle_count), 0).label("vehicle_count"),
+                func.count().label("count"),
+            )
+            .where(*conditions)
+            .group_by(bucket, processed_agent_data.c.road_state)
+            .order_by(bucket)
+        )
+        return merge_track_rows(db.execute(query).mappings())
+    finally:
+        db.close()
+
+
+def export_rows(query, file_format: str):
+    """Rows of the query, EXPORT_CHUNK_ROWS at a time, fetched with a server-side cursor."""
+    try:
+        db = SessionLocal()
+        result = db.execute(query.execution_options(yield_per=EXPORT_CHUNK_ROWS))
+        for rows in result.mappings().partitions():
+            metrics.export_rows.labels(file_format).inc(len(rows))
+            yield rows
+    finally:
+        db.close()
+
+
+@app.get("/export/processed_agent_data")
+def export_processed_agent_data(file_format: str = Query("csv", alias="format"), user_id: Optional[int] = None,
+                                start: Optional[datetime] = None, end: Optional[datetime] = None,
+                                min_latitude: Optional[float] = None, min_longitude: Optional[float] = None,
+                                max_latitude: Optional[float] = None, max_longitude: Optional[float] = None):
+    """
+    Stream the readings of a user, time window (event timestamp) and/or bounding box for offline analysis, as
+    gzip compressed CSV (format=csv) or concatenated columnar archives (format=archive, see archive.py).
+    The rows are read with a server-side cursor and written a chunk at a time, so memory use does not grow
+    with the export size.
+    """
+    if file_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=422, detail=f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    bbox = (min_latitude, min_longitude, max_latitude, max_longitude)
+    if any(value is None for value in bbox) and any(value is not None for value in bbox):
+        raise HTTPException(status_code=422, detail="A bounding box needs all four of min/max latitude/longitude")
+    conditions = []
+    if user_id is not None:
+        conditions.append(processed_agent_data.c.user_id == user_id)
+    if start is not None:
+        conditions.append(processed_agent_data.c.event_timestamp >= start)
+    if end is not None:
+        conditions.append(processed_agent_data.c.event_timestamp < end)
+    if min_latitude is not None:
+        conditions.append(processed_agent_data.c.latitude.between(min_latitude, max_latitude))
+        conditions.append(processed_agent_data.c.longitude.between(min_longitude, max_longitude))
+    query = select(processed_agent_data).where(*conditions).order_by(processed_agent_data.c.id)
+    chunks = export_rows(query, file_format)
+    if file_format == "csv":
+        content = csv_gzip_chunks(chunks, [column.name for column in processed_agent_data.columns])
+    else:
+        content = archive_chunks(chunks)
+    media_type, extension = EXPORT_FORMATS[file_format]
+    return StreamingResponse(
+        content,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="processed_agent_data.{extension}"'},
+    )
+
+
+@app.get("/congestion", response_model=CongestionSnapshot)
+async def read_congestion(min_latitude: Optional[float] = None, min_longitude: Optional[float] = None,
+                    max_latitude: Optional[float] = None, max_longitude: Optional[float] = None):
+    """
+    Readings per geohash cell over the last CONGESTION_WINDOW_SECONDS and their average vehicle_count, for all
+    cells with recent readings or those with their center in the bounding box.
+    Runs on the event loop like save_readings, which adds the readings, since the engine is not thread safe.
+    """
+    bounds = (min_latitude, min_longitude, max_latitude, max_longitude)
+    if any(value is None for value in bounds):
+        if any(value is not None for value in bounds):
+            raise HTTPException(status_code=422, detail="A bounding box needs all four of min/max latitude/longitude")
+        bounds = None
+    return congestion_snapshot(bounds)
+
+
+@app.get("/road_segments/worst", response_model=List[RoadSegmentQuality])
+def read_worst_road_segments(min_latitude: float, min_longitude: float, max_latitude: float, max_longitude: float,
+                             limit: int = 20, min_confidence: float = 0.0):
+    """Road segments within the bounding box (e.g. a district) with the highest defect_score first."""
+    try:
+        db = SessionLocal()
+        query = (
+            select(road_segments)
+            .where(
+                road_segments.c.latitude.between(min_latitude, max_latitude),
+                road_segments.c.longitude.between(min_longitude, max_longitude),
+                road_segments.c.confidence >= min_confidence,
+            )
+            .order_by(road_segments.c.defect_score.desc())
+            .limit(limit)
+        )
+        return db.execute(query).fetchall()
+    finally:
+        db.close()
+
+
+@app.get("/road_segments/{segment_id}", response_model=RoadSegmentQuality)
+def read_road_segment(segment_id: str):
+    try:
+        db = SessionLocal()
+        data = db.execute(select(road_segments).where(road_segments.c.segment_id == segment_id)).fetchone()
+        if data is None:
+            raise HTTPException(status_code=404, detail="Road segment not found")
+        return data
+    finally:
+        db.close()
+
+
+@app.post("/parking_data/")
+def create_parking_data(data: List[ParkingZoneData]):
+    if not data:
+        return {"message": "Data created successfully"}
+    try:
+        db = SessionLocal()
+        query = upsert(parking_zones).values([zone.model_dump() for zone in data])
+        # A delayed window must not overwrite a newer one
+        query = query.on_conflict_do_update(
+            index_elements=[parking_zones.c.geohash],
+            set_={name: query.excluded[name] for name in ParkingZoneData.model_fields if name != "geohash"},
+            where=parking_zones.c.window_end <= query.excluded.window_end,
+        )
+        db.execute(query)
+        db.commit()
+    except Exception as e:
+        logging.exception("Failed to save %d parking zones", len(data))
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        db.close()
+    return {"message": "Data created successfully"}
+
+
+@app.get("/parking/nearest", response_model=List[NearestParkingZone])
+def read_nearest_parking(latitude: float, longitude: float, radius_km: float = 1.0, limit: int = 5):
+    """Zones with free places within radius_km of the point, nearest first."""
+    latitude_delta = radius_km / KM_PER_DEGREE
+    longitude_delta = radius_km / (KM_PER_DEGREE * max(cos(radians(latitude)), 0.01))
+    # Equirectangular distance, close enough to order zones within a few kilometers
+    squared_distance = (
+        (parking_zones.c.latitude - latitude) * (parking_zones.c.latitude - latitude)
+        + (parking_zones.c.longitude - longitude) * (parking_zones.c.longitude - longitude)
+        * cos(radians(latitude)) ** 2
+    )
+    try:
+        db = SessionLocal()
+        query = (
+            select(parking_zones)
+            .where(
+                parking_zones.c.latest_empty_count > 0,
+                parking_zones.c.latitude.between(latitude - latitude_delta, latitude + latitude_delta),
+                parking_zones.c.longitude.between(longitude - longitude_delta, longitude + longitude_delta),
+            )
+            .order_by(squared_distance)
+            .limit(limit)
+        )
+        rows = db.execute(query).mappings().fetchall()
+    finally:
+        db.close()
+    zones = [
+        NearestParkingZone(**row, distance_km=haversine_km(latitude, longitude, row["latitude"], row["longitude"]))
+        for row in rows
+    ]
+    return [zone for zone in zones if zone.distance_km <= radius_km]
+
+
+def tile_bounds(zoom: int, x: int, y: int):
+    """Return (min_latitude, min_longitude, max_latitude, max_longitude) of a slippy map tile."""
+    n = 2 ** zoom
+    min_longitude = x / n * 360.0 - 180.0
+    max_longitude = (x + 1) / n * 360.0 - 180.0
+    max_latitude = degrees(atan(sinh(pi * (1 - 2 * y / n))))
+    min_latitude = degrees(atan(sinh(pi * (1 - 2 * (y + 1) / n))))
+    return min_latitude, min_longitude, max_latitude, max_longitude
+
+
+@app.get("/tiles/{zoom}/{x}/{y}/defects", response_model=List[DefectCluster])
+def read_tile_defects(zoom: int, x: int, y: int):
+    if not (0 <= zoom <= 22 and 0 <= x < 2 ** zoom and 0 <= y < 2 ** zoom):
+        raise HTTPException(status_code=404, detail="Tile not found")
+    min_latitude, min_longitude, max_latitude, max_longitude = tile_bounds(zoom, x, y)
+    # Cells per degree
+    grid = min(2 ** zoom * TILE_GRID_CELLS / 360, TILE_GRID)
+    try:
+        db = SessionLocal()
+        query = (
+            select(
+                func.avg(processed_agent_data.c.latitude).label("latitude"),
+                func.avg(processed_agent_data.c.longitude).label("longitude"),
+                processed_agent_data.c.road_state,
+                func.count().label("count"),
+            )
+            .where(
+                # The first condition matches the partial index processed_agent_data_defects_location_idx
+                processed_agent_data.c.road_state != SMOOTH_ROAD,
+                processed_agent_data.c.road_state.in_(sorted(DEFECT_ROAD_STATES)),
+                processed_agent_data.c.latitude.between(min_latitude, max_latitude),
+                processed_agent_data.c.longitude.between(min_longitude, max_longitude),
+            )
+            .group_by(
+                func.floor(processed_agent_data.c.latitude * grid),
+                func.floor(processed_agent_data.c.longitude * grid),
+                processed_agent_data.c.road_state,
+            )
+            .order_by(func.count().desc())
+            .limit(MAX_TILE_DEFECTS)
+        )
+        return db.execute(query).fetchall()
+    finally:
+        db.close()
+
+
 @app.put(
     "/processed_agent_data/{processed_agent_data_id}",
     response_model=ProcessedAgentDataInDB,
@@ -209,6 +950,11 @@ def update_processed_agent_data(
         user_id = agent_data.user_id
         timestamp = datetime.now()
         vehicle_count = data.traffic_data.vehicle_count
+        segment_id = road_graph.snap(gps.latitude, gps.longitude) if road_graph else None
+        previous = db.execute(
+            select(processed_agent_data.c.segment_id, processed_agent_data.c.road_state)
+            .where(processed_agent_data.c.id == processed_agent_data_id)
+        ).fetchone()
         update_query = (
             update(processed_agent_data)
             .where(processed_agent_data.c.id == processed_agent_data_id)
@@ -221,11 +967,21 @@ def update_processed_agent_data(
                 latitude=gps.latitude,
                 longitude=gps.longitude,
                 timestamp=timestamp,
-                vehicle_count=vehicle_count
+                vehicle_count=vehicle_count,
+                event_timestamp=agent_data.timestamp,
+                segment_id=segment_id,
             )
         )
 
         db.execute(update_query)
+        if previous is not None:
+            # The reading moves to the statistics of its new segment and road state
+            remove_segment_reading(db, previous.segment_id, previous.road_state)
+            segments = segment_statistics(
+                [{"segment_id": segment_id, "road_state": road_state, "timestamp": timestamp}]
+            )
+            if segments:
+                db.execute(upsert_segments_query, segments)
         db.commit()
         updated_data = db.execute(
             select(processed_agent_data).where(processed_agent_data.c.id == processed_agent_data_id)).fetchone()
@@ -252,6 +1008,7 @@ def delete_processed_agent_data(processed_agent_data_id: int):
             raise HTTPException(status_code=404, detail="Data not found")
         delete_query = delete(processed_agent_data).where(processed_agent_data.c.id == processed_agent_data_id)
         db.execute(delete_query)
+        remove_segment_reading(db, data_to_delete.segment_id, data_to_delete.road_state)
         db.commit()
 
         return data_to_delete
@@ -0,0 +1,98 @@
+import time
+from typing import Dict
+
+from prometheus_client import Counter, Gauge, Histogram
+from road_vision.tracing import STORE_COMMIT, WS_PUSH, hop_durations, end_to_end
+
+# From 1 ms up to a minute: hub batching alone can hold a reading for several seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+pipeline_hop_latency = Histogram(
+    "pipeline_hop_latency_seconds",
+    "Time a reading took to reach a pipeline stamp from the previous one",
+    ["hop"],
+    buckets=LATENCY_BUCKETS,
+)
+pipeline_latency = Histogram(
+    "pipeline_latency_seconds",
+    "Time from the first trace stamp of a reading to its Store commit",
+    buckets=LATENCY_BUCKETS,
+)
+
+readings_received = Counter(
+    "store_readings_received_total",
+    "Readings received in POST /processed_agent_data/",
+)
+readings_duplicate = Counter(
+    "store_readings_duplicate_total",
+    "Received readings dropped because the Store had already saved them",
+)
+batch_size = Histogram(
+    "store_batch_size",
+    "Number of readings in one POST /processed_agent_data/ request",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000),
+)
+db_insert_latency = Histogram(
+    "store_db_insert_seconds",
+    "Time to insert and commit one group of readings",
+    buckets=LATENCY_BUCKETS,
+)
+group_commit_rows = Histogram(
+    "store_group_commit_rows",
+    "Readings committed in one transaction",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000),
+)
+group_commit_requests = Histogram(
+    "store_group_commit_requests",
+    "POST /processed_agent_data/ requests whose readings were committed in one transaction",
+    buckets=(1, 2, 3, 5, 10, 20, 50, 100),
+)
+retention_rows_archived = Counter(
+    "store_retention_rows_archived_total",
+    "Readings moved from processed_agent_data to archive files",
+)
+retention_archive_bytes = Counter(
+    "store_retention_archive_bytes_total",
+    "Bytes written to archive files",
+)
+retention_run_latency = Histogram(
+    "store_retention_run_seconds",
+    "Duration of one retention run",
+    buckets=(0.01, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900),
+)
+export_rows = Counter(
+    "store_export_rows_total",
+    "Readings written by GET /export/processed_agent_data",
+    ["format"],
+)
+congestion_cells = Gauge(
+    "store_congestion_cells",
+    "Geohash cells with readings in the congestion window",
+)
+websocket_subscribers = Gauge(
+    "store_websocket_subscribers",
+    "Open WebSocket connections",
+)
+websocket_pending_sends = Gauge(
+    "store_websocket_pending_sends",
+    "Messages handed to WebSocket connections whose send has not completed yet",
+)
+websocket_messages_sent = Counter(
+    "store_websocket_messages_sent_total",
+    "Messages sent to WebSocket subscribers",
+)
+
+
+def observe_trace(trace: Dict[str, float]) -> None:
+    """Record the hops of a committed reading."""
+    for hop, seconds in hop_durations(trace):
+        if hop != WS_PUSH:
+            pipeline_hop_latency.labels(hop).observe(max(seconds, 0.0))
+    latency = end_to_end(trace, STORE_COMMIT)
+    if latency is not None:
+        pipeline_latency.observe(max(latency, 0.0))
+
+
+def observe_ws_push(trace: Dict[str, float]) -> None:
+    """Record the time from the Store commit until the reading was pushed to the WebSocket subscribers."""
+    pipeline_hop_latency.labels(WS_PUSH).observe(max(time.time() - trace[STORE_COMMIT], 0.0))
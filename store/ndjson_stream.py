@@ -0,0 +1,55 @@
+import zlib
+from typing import AsyncIterator
+
+# zlib wbits for each supported Content-Encoding
+WBITS = {
+    "gzip": 16 + zlib.MAX_WBITS,
+    "deflate": zlib.MAX_WBITS,
+}
+# Decompressed bytes produced per step, so a small body cannot expand into a huge buffer at once
+DECOMPRESS_STEP = 64 * 1024
+
+
+class LineTooLong(ValueError):
+    pass
+
+
+class UnsupportedEncoding(ValueError):
+    pass
+
+
+async def _decompress(chunks: AsyncIterator[bytes], encoding: str) -> AsyncIterator[bytes]:
+    if encoding in ("", "identity"):
+        async for chunk in chunks:
+            yield chunk
+        return
+    if encoding not in WBITS:
+        raise UnsupportedEncoding(encoding)
+    decompressor = zlib.decompressobj(WBITS[encoding])
+    async for chunk in chunks:
+        while chunk:
+            yield decompressor.decompress(chunk, DECOMPRESS_STEP)
+            chunk = decompressor.unconsumed_tail
+    yield decompressor.flush()
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], encoding: str, max_line_bytes: int) -> AsyncIterator[bytes]:
+    """
+    Yield the non-empty lines of an NDJSON body as it arrives, decompressing it on the way.
+    Parameters:
+        chunks (AsyncIterator[bytes]): Body chunks, e.g. Request.stream().
+        encoding (str): Content-Encoding of the body: gzip, deflate or identity.
+        max_line_bytes (int): Longest accepted line; raises LineTooLong for a longer one, so memory stays bounded.
+    """
+    pending = b""
+    async for data in _decompress(chunks, encoding.strip().lower()):
+        pending += data
+        lines = pending.split(b"\n")
+        pending = lines.pop()
+        if len(pending) > max_line_bytes:
+            raise LineTooLong(f"Line longer than {max_line_bytes} bytes")
+        for line in lines:
+            if line.strip():
+                yield line
+    if pending.strip():
+        yield pending
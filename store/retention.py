@@ -0,0 +1,153 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Tuple
+
+from road_vision import geohash
+from road_vision.road_states import DEFECT_ROAD_STATES
+from sqlalchemy import Table, case, delete, select
+
+import archive
+import metrics
+
+# Readings are summarized per geohash cell of this precision (~150 m) and hour
+SUMMARY_PRECISION = 7
+
+
+def summarize(rows: List[Dict]) -> List[Dict]:
+    """
+    Hourly summaries of readings per geohash cell.
+    Parameters:
+        rows (List[Dict]): processed_agent_data rows.
+    Returns:
+        List[Dict]: processed_agent_data_hourly rows; sums instead of averages, so summaries of later runs can be
+            added to them.
+    """
+    summaries: Dict[Tuple[str, datetime], Dict] = {}
+    for row in rows:
+        timestamp = row["event_timestamp"] or row["timestamp"]
+        if row["latitude"] is None or row["longitude"] is None or row["y"] is None or timestamp is None:
+            continue
+        cell = geohash.encode(row["latitude"], row["longitude"], SUMMARY_PRECISION)
+        hour = timestamp.replace(minute=0, second=0, microsecond=0)
+        summary = summaries.get((cell, hour))
+        if summary is None:
+            latitude, longitude = geohash.center(cell)
+            summary = summaries[cell, hour] = {
+                "geohash": cell, "hour": hour, "latitude": latitude, "longitude": longitude,
+                "reading_count": 0, "defect_count": 0, "y_min": row["y"], "y_max": row["y"], "y_sum": 0.0,
+                "vehicle_count_sum": 0,
+            }
+        summary["reading_count"] += 1
+        summary["defect_count"] += row["road_state"] in DEFECT_ROAD_STATES
+        summary["y_min"] = min(summary["y_min"], row["y"])
+        summary["y_max"] = max(summary["y_max"], row["y"])
+        summary["y_sum"] += row["y"]
+        summary["vehicle_count_sum"] += row["vehicle_count"] or 0
+    return list(summaries.values())
+
+
+class RetentionJob:
+    """
+    Moves readings older than max_age out of processed_agent_data, batch_rows at a time (oldest first):
+    the rows are written to a columnar archive file (see archive.py), added to the hourly summaries and
+    deleted. The summaries and the delete are committed in one transaction after the file is on disk, so
+    a failed run is repeated from the same rows and never counts them twice.
+    """
+
+    def __init__(self, session_factory: Callable, readings: Table, summaries: Table, upsert: Callable,
+                 archive_dir: str, max_age: timedelta, batch_rows: int = 50000, interval: float = 3600):
+        """
+        Parameters:
+            session_factory (callable): Creates a database session.
+            readings (Table): processed_agent_data.
+            summaries (Table): processed_agent_data_hourly.
+            upsert (callable): Dialect specific insert with ON CONFLICT support.
+            archive_dir (str): Directory of the archive files.
+            max_age (timedelta): Age (by Store timestamp) after which readings are archived.
+            batch_rows (int): Readings archived per file and transaction.
+            interval (float): Seconds between runs.
+        """
+        self.session_factory = session_factory
+        self.readings = readings
+        self.summaries = summaries
+        self.archive_dir = archive_dir
+        self.max_age = max_age
+        self.batch_rows = batch_rows
+        self.interval = interval
+        self._stop = threading.Event()
+        query = upsert(summaries)
+        excluded = query.excluded
+        self._upsert_summaries = query.on_conflict_do_update(
+            index_elements=[summaries.c.geohash, summaries.c.hour],
+            set_={
+                "reading_count": summaries.c.reading_count + excluded.reading_count,
+                "defect_count": summaries.c.defect_count + excluded.defect_count,
+                "y_min": case((excluded.y_min < summaries.c.y_min, excluded.y_min), else_=summaries.c.y_min),
+                "y_max": case((excluded.y_max > summaries.c.y_max, excluded.y_max), else_=summaries.c.y_max),
+                "y_sum": summaries.c.y_sum + excluded.y_sum,
+                "vehicle_count_sum": summaries.c.vehicle_count_sum + excluded.vehicle_count_sum,
+            },
+        )
+
+    def start(self):
+        os.makedirs(self.archive_dir, exist_ok=True)
+        threading.Thread(target=self._run, name="retention", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                logging.exception("Retention run failed")
+            self._stop.wait(self.interval)
+
+    def run_once(self) -> int:
+        """Archive every reading older than max_age; returns the number of archived readings."""
+        started = time.perf_counter()
+        cutoff = datetime.now() - self.max_age
+        archived = 0
+        while not self._stop.is_set():
+            count = self._archive_batch(cutoff)
+            archived += count
+            if count < self.batch_rows:
+                break
+        metrics.retention_run_latency.observe(time.perf_counter() - started)
+        if archived:
+            logging.info("Archived %d readings older than %s", archived, cutoff)
+        return archived
+
+    def _archive_batch(self, cutoff: datetime) -> int:
+        try:
+            db = self.session_factory()
+            query = (
+                select(self.readings)
+                .where(self.readings.c.timestamp < cutoff)
+                .order_by(self.readings.c.id)
+                .limit(self.batch_rows)
+            )
+            rows = [dict(row) for row in db.execute(query).mappings()]
+            if not rows:
+                return 0
+            first_id, last_id = rows[0]["id"], rows[-1]["id"]
+            path = os.path.join(self.archive_dir, f"processed_agent_data_{first_id:012d}_{last_id:012d}.rva")
+            size = archive.write(path, rows)
+            summaries = summarize(rows)
+            if summaries:
+                db.execute(self._upsert_summaries, summaries)
+            # Rows are only added with the current time, so these are exactly the archived rows
+            db.execute(delete(self.readings).where(self.readings.c.id <= last_id, self.readings.c.timestamp < cutoff))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        metrics.retention_rows_archived.inc(len(rows))
+        metrics.retention_archive_bytes.inc(size)
+        return len(rows)
@@ -0,0 +1,129 @@
+"""
+Map-matching of GPS points to road segments.
+
+The road graph is a GeoJSON FeatureCollection of LineString (or MultiLineString) features, one feature per
+road segment, e.g. an OpenStreetMap extract split at intersections. The segment id is the feature's
+``properties.id``, its ``id``, or its index in the file; ``properties.name`` is kept when present.
+"""
+import json
+from collections import defaultdict
+from dataclasses import dataclass
+from math import cos, floor, radians
+from typing import Dict, List, Optional, Tuple
+
+# Meters per degree of latitude
+METERS_PER_DEGREE = 111320.0
+
+
+@dataclass
+class RoadSegment:
+    segment_id: str
+    name: Optional[str]
+    latitude: float
+    longitude: float
+
+
+def _squared_distance(px: float, py: float, ax: float, ay: float, bx: float, by: float) -> float:
+    """Squared distance from point p to segment ab, in the units of the coordinates."""
+    dx, dy = bx - ax, by - ay
+    length = dx * dx + dy * dy
+    t = 0.0 if length == 0 else max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / length))
+    x, y = ax + t * dx - px, ay + t * dy - py
+    return x * x + y * y
+
+
+class RoadGraph:
+    """
+    Snaps points to the nearest road segment within max_distance meters.
+
+    Every straight piece (edge) of a segment is registered in the cells of a grid of cell_degrees it may be
+    within max_distance of, so a lookup only measures the edges of the point's own cell.
+    """
+
+    def __init__(self, segments: Dict[str, List[List[Tuple[float, float]]]], names: Dict[str, Optional[str]] = None,
+                 max_distance: float = 20.0, cell_degrees: float = 0.001):
+        """
+        Parameters:
+            segments (dict): Lines of (latitude, longitude) points per segment id.
+            names (dict): Optional segment names.
+            max_distance (float): Meters from a segment within which a point is matched to it.
+            cell_degrees (float): Size of a grid cell.
+        """
+        self.max_distance = max_distance
+        self.cell_degrees = cell_degrees
+        self.segments: Dict[str, RoadSegment] = {}
+        # (segment id, start, end) of every edge; points as (latitude, longitude)
+        self._edges: List[Tuple[str, Tuple[float, float], Tuple[float, float]]] = []
+        self._grid: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        names = names or {}
+        for segment_id, lines in segments.items():
+            points = [point for line in lines for point in line]
+            if not points:
+                continue
+            # Halfway along the points, between the two middle ones for an even number of points
+            before, after = points[(len(points) - 1) // 2], points[len(points) // 2]
+            self.segments[segment_id] = RoadSegment(
+                segment_id, names.get(segment_id), (before[0] + after[0]) / 2, (before[1] + after[1]) / 2
+            )
+            for line in lines:
+                for start, end in zip(line, line[1:]):
+                    self._add_edge(segment_id, start, end)
+
+    @classmethod
+    def load(cls, path: str, max_distance: float = 20.0, cell_degrees: float = 0.001) -> "RoadGraph":
+        """Read a GeoJSON road graph file."""
+        with open(path, encoding="utf-8") as file:
+            features = json.load(file)["features"]
+        segments = {}
+        names = {}
+        for index, feature in enumerate(features):
+            geometry = feature.get("geometry") or {}
+            properties = feature.get("properties") or {}
+            if geometry.get("type") == "LineString":
+                lines = [geometry["coordinates"]]
+            elif geometry.get("type") == "MultiLineString":
+                lines = geometry["coordinates"]
+            else:
+                continue
+            segment_id = str(properties.get("id", feature.get("id", index)))
+            # GeoJSON positions are [longitude, latitude]
+            segments[segment_id] = [[(point[1], point[0]) for point in line] for line in lines]
+            names[segment_id] = properties.get("name")
+        return cls(segments, names, max_distance, cell_degrees)
+
+    def _cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        return floor(latitude / self.cell_degrees), floor(longitude / self.cell_degrees)
+
+    def _add_edge(self, segment_id: str, start: Tuple[float, float], end: Tuple[float, float]):
+        index = len(self._edges)
+        self._edges.append((segment_id, start, end))
+        # The edge's bounding box grown by max_distance covers every point that can match it
+        latitude_margin = self.max_distance / METERS_PER_DEGREE
+        longitude_margin = latitude_margin / max(cos(radians(start[0])), 0.01)
+        min_row, min_column = self._cell(min(start[0], end[0]) - latitude_margin,
+                                         min(start[1], end[1]) - longitude_margin)
+        max_row, max_column = self._cell(max(start[0], end[0]) + latitude_margin,
+                                         max(start[1], end[1]) + longitude_margin)
+        for row in range(min_row, max_row + 1):
+            for column in range(min_column, max_column + 1):
+                self._grid[row, column].append(index)
+
+    def snap(self, latitude: float, longitude: float) -> Optional[str]:
+        """Id of the nearest segment within max_distance of the point, None when there is none."""
+        candidates = self._grid.get(self._cell(latitude, longitude))
+        if not candidates:
+            return None
+        # Equirectangular projection around the point, in meters
+        scale = cos(radians(latitude))
+        best = None
+        best_distance = self.max_distance * self.max_distance
+        for index in candidates:
+            segment_id, start, end = self._edges[index]
+            distance = _squared_distance(
+                0.0, 0.0,
+                (start[1] - longitude) * scale * METERS_PER_DEGREE, (start[0] - latitude) * METERS_PER_DEGREE,
+                (end[1] - longitude) * scale * METERS_PER_DEGREE, (end[0] - latitude) * METERS_PER_DEGREE,
+            )
+            if distance <= best_distance:
+                best, best_distance = segment_id, distance
+        return best
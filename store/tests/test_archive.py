@@ -0,0 +1,81 @@
+import math
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+import archive
+
+def rows(count, start_id=1):
+    started = datetime(2024, 3, 1, 8, 0, 0, 123456)
+    return [
+        {
+            "id": start_id + i,
+            "user_id": 7 - i % 3,
+            "seq": 1709280000123456 + i * 1000,
+            "timestamp": started + timedelta(seconds=i, microseconds=i),
+            "event_timestamp": started - timedelta(milliseconds=250 * i),
+            "vehicle_count": i % 4,
+            "x": 0.1 * i,
+            "y": -16384.0 + i,
+            "z": 16380.5,
+            "latitude": 50.450001 + i * 1e-6,
+            "longitude": 30.523333 - i * 1e-6,
+            "road_state": ("smooth road", "big bumps", "humps")[i % 3],
+            "segment_id": str(i // 2),
+        }
+        for i in range(count)
+    ]
+
+class TestArchive(unittest.TestCase):
+    def test_round_trip(self):
+        data = rows(100)
+        self.assertEqual(archive.decode(archive.encode(data)), data)
+    def test_nulls(self):
+        data = rows(5)
+        data[0]["seq"] = None
+        data[2]["event_timestamp"] = None
+        data[3]["y"] = None
+        data[4]["segment_id"] = None
+        for column, _ in archive.COLUMNS[1:]:
+            data[1][column] = None
+        self.assertEqual(archive.decode(archive.encode(data)), data)
+    def test_extreme_values(self):
+        data = rows(4)
+        data[0]["seq"], data[1]["seq"] = 2 ** 62, -(2 ** 62)
+        data[0]["vehicle_count"], data[1]["vehicle_count"] = -1, 2 ** 40
+        data[0]["x"], data[1]["x"], data[2]["x"] = math.inf, -math.inf, -0.0
+        data[3]["x"] = math.nan
+        data[0]["event_timestamp"] = datetime(1969, 12, 31, 23, 59, 59, 999999)
+        data[1]["event_timestamp"] = datetime(9999, 12, 31, 23, 59, 59, 999999)
+        data[0]["road_state"] = "ями на дорозі"
+        decoded = archive.decode(archive.encode(data))
+        self.assertTrue(math.isnan(decoded[3].pop("x")))
+        del data[3]["x"]
+        self.assertEqual(decoded, data)
+        self.assertEqual(math.copysign(1, decoded[2]["x"]), -1)
+    def test_empty(self):
+        self.assertEqual(archive.decode(archive.encode([])), [])
+    def test_concatenated_archives(self):
+        first, second = rows(3), rows(4, start_id=4)
+        data = archive.encode(first) + archive.encode([]) + archive.encode(second)
+        self.assertEqual(list(archive.decode_chunks(data)), [first, [], second])
+        self.assertEqual(archive.decode(data), first + second)
+    def test_not_an_archive(self):
+        with self.assertRaises(ValueError):
+            archive.decode(b"id,user_id\n1,2\n")
+    def test_repeated_values_compress(self):
+        data = rows(1000)
+        for row in data:
+            row.update(x=0.0, y=-16384.0, z=16384.0, vehicle_count=0, road_state="smooth road")
+        self.assertLess(len(archive.encode(data)), len(data) * 8)
+    def test_write_and_read(self):
+        data = rows(10)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "readings.rva")
+            size = archive.write(path, data)
+            self.assertEqual(os.path.getsize(path), size)
+            self.assertEqual(os.listdir(directory), ["readings.rva"])
+            self.assertEqual(archive.read(path), data)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+from congestion import CongestionEngine, TimeWheel
+
+class TestTimeWheel(unittest.TestCase):
+    def test_totals_of_the_window(self):
+        wheel = TimeWheel(3, 10)
+        wheel.add(100, 2)
+        wheel.add(105, 4)
+        wheel.add(115, 6)
+        self.assertEqual((wheel.total_readings, wheel.total_vehicles), (3, 12))
+    def test_slots_expire_when_they_leave_the_window(self):
+        wheel = TimeWheel(3, 10)
+        wheel.add(100, 2)
+        wheel.add(110, 4)
+        wheel.add(120, 6)
+        wheel.advance(130)
+        self.assertEqual((wheel.total_readings, wheel.total_vehicles), (2, 10))
+        wheel.advance(145)
+        self.assertEqual((wheel.total_readings, wheel.total_vehicles), (1, 6))
+    def test_gap_longer_than_the_window_clears_every_slot(self):
+        wheel = TimeWheel(3, 10)
+        wheel.add(100, 2)
+        wheel.add(120, 4)
+        wheel.add(1000, 6)
+        self.assertEqual((wheel.total_readings, wheel.total_vehicles), (1, 6))
+        self.assertEqual(sum(wheel.readings), 1)
+    def test_earlier_time_is_added_to_its_own_slot(self):
+        wheel = TimeWheel(3, 10)
+        wheel.add(120, 2)
+        wheel.add(105, 4)
+        self.assertEqual((wheel.total_readings, wheel.total_vehicles), (2, 6))
+        wheel.advance(130)
+        self.assertEqual((wheel.total_readings, wheel.total_vehicles), (1, 2))
+    def test_time_before_the_window_is_ignored(self):
+        wheel = TimeWheel(3, 10)
+        wheel.add(120, 2)
+        wheel.add(99, 4)
+        self.assertEqual((wheel.total_readings, wheel.total_vehicles), (1, 2))
+
+class TestCongestionEngine(unittest.TestCase):
+    def setUp(self):
+        self.engine = CongestionEngine(precision=6, window_seconds=60, slot_seconds=10, congested_vehicle_count=5)
+    def test_snapshot_of_a_cell(self):
+        self.engine.add(50.4501, 30.5234, 4, 1000, 1000)
+        self.engine.add(50.4502, 30.5235, 8, 1005, 1005)
+        (cell,) = self.engine.snapshot(1010)
+        self.assertEqual(cell["readings"], 2)
+        self.assertEqual(cell["readings_per_minute"], 2)
+        self.assertEqual(cell["average_vehicle_count"], 6)
+        self.assertTrue(cell["congested"])
+    def test_cells_without_recent_readings_are_pruned(self):
+        self.engine.add(50.4501, 30.5234, 4, 1000, 1000)
+        self.engine.add(49.8397, 24.0297, 4, 1050, 1050)
+        self.assertEqual(len(self.engine.snapshot(1055)), 2)
+        (cell,) = self.engine.snapshot(1065)
+        self.assertAlmostEqual(cell["latitude"], 49.84, places=2)
+        self.assertEqual(len(self.engine.cells), 1)
+        self.assertEqual(self.engine.snapshot(1200), [])
+        self.assertEqual(self.engine.cells, {})
+    def test_readings_are_counted_at_their_own_time(self):
+        # Sent 50 s late: expires 10 s after it was received
+        self.engine.add(50.4501, 30.5234, 4, 1000, 1050)
+        self.assertEqual(len(self.engine.snapshot(1055)), 1)
+        self.assertEqual(self.engine.snapshot(1065), [])
+    def test_readings_older_than_the_window_are_ignored(self):
+        # Drained from an offline buffer an hour later
+        self.engine.add(50.4501, 30.5234, 4, 1000, 4600)
+        self.assertEqual(self.engine.cells, {})
+        self.assertEqual(self.engine.snapshot(4600), [])
+    def test_readings_from_the_future_count_as_now(self):
+        self.engine.add(50.4501, 30.5234, 4, 1300, 1000)
+        self.engine.add(50.4501, 30.5234, 8, 1000, 1000)
+        (cell,) = self.engine.snapshot(1000)
+        self.assertEqual(cell["readings"], 2)
+    def test_bounds_filter_cells_by_center(self):
+        self.engine.add(50.4501, 30.5234, 4, 1000, 1000)
+        self.engine.add(49.8397, 24.0297, 4, 1000, 1000)
+        cells = self.engine.snapshot(1000, (50, 30, 51, 31))
+        self.assertEqual(len(cells), 1)
+        self.assertAlmostEqual(cells[0]["latitude"], 50.45, places=2)
+        # Cells outside the bounds are kept
+        self.assertEqual(len(self.engine.cells), 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import asyncio
+import threading
+import unittest
+from group_commit import GroupCommitWriter
+
+class TestGroupCommitWriter(unittest.TestCase):
+    def setUp(self):
+        self.transactions = []
+        self.error = None
+        self.release = threading.Event()
+        self.release.set()
+    def write_rows(self, rows):
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        self.transactions.append(list(rows))
+        return [row["n"] for row in rows]
+    def run_async(self, coroutine):
+        return asyncio.run(asyncio.wait_for(coroutine, 5))
+    def test_concurrent_requests_share_a_transaction(self):
+        writer = GroupCommitWriter(self.write_rows, max_delay=0.05)
+        async def main():
+            await asyncio.gather(*(writer.write([{"n": i}]) for i in range(10)))
+        self.run_async(main())
+        self.assertEqual(len(self.transactions), 1)
+        self.assertEqual(sorted(row["n"] for row in self.transactions[0]), list(range(10)))
+    def test_every_request_gets_the_results_of_its_rows(self):
+        writer = GroupCommitWriter(self.write_rows, max_delay=0.05)
+        async def main():
+            return await asyncio.gather(writer.write([{"n": 1}, {"n": 2}]), writer.write([{"n": 3}]))
+        self.assertEqual(self.run_async(main()), [[1, 2], [3]])
+        self.assertEqual(len(self.transactions), 1)
+    def test_full_group_is_written_without_waiting(self):
+        writer = GroupCommitWriter(self.write_rows, max_delay=10, max_rows=4)
+        async def main():
+            await asyncio.gather(*(writer.write([{"n": i}, {"n": i}]) for i in range(2)))
+        # Would time out if the group waited max_delay
+        self.run_async(main())
+        self.assertEqual(len(self.transactions), 1)
+        self.assertEqual(len(self.transactions[0]), 4)
+    def test_zero_delay_writes_each_request(self):
+        writer = GroupCommitWriter(self.write_rows, max_delay=0)
+        async def main():
+            return [await writer.write([{"n": 1}]), await writer.write([{"n": 2}])]
+        self.assertEqual(self.run_async(main()), [[1], [2]])
+        self.assertEqual(self.transactions, [[{"n": 1}], [{"n": 2}]])
+    def test_error_is_raised_in_every_request_of_the_group(self):
+        self.error = ValueError("insert failed")
+        writer = GroupCommitWriter(self.write_rows, max_delay=0.05)
+        async def main():
+            return await asyncio.gather(*(writer.write([{"n": i}]) for i in range(3)), return_exceptions=True)
+        results = self.run_async(main())
+        self.assertEqual([type(result) for result in results], [ValueError] * 3)
+        # The next request starts a new group
+        self.error = None
+        self.run_async(writer.write([{"n": 3}]))
+        self.assertEqual(self.transactions, [[{"n": 3}]])
+    def test_cancelled_first_request_does_not_block_the_group(self):
+        writer = GroupCommitWriter(self.write_rows, max_delay=0.05)
+        async def main():
+            leader = asyncio.create_task(writer.write([{"n": 0}]))
+            await asyncio.sleep(0)
+            follower = asyncio.create_task(writer.write([{"n": 1}]))
+            await asyncio.sleep(0)
+            leader.cancel()
+            await follower
+            await writer.write([{"n": 2}])
+            with self.assertRaises(asyncio.CancelledError):
+                await leader
+        self.run_async(main())
+        # The rows of the cancelled request were added before it was cancelled, so they are written with the group
+        self.assertEqual(self.transactions, [[{"n": 0}, {"n": 1}], [{"n": 2}]])
+    def test_cancelled_request_does_not_cancel_the_commit(self):
+        self.release.clear()
+        writer = GroupCommitWriter(self.write_rows, max_delay=0.01)
+        async def main():
+            first = asyncio.create_task(writer.write([{"n": 0}]))
+            second = asyncio.create_task(writer.write([{"n": 1}]))
+            await asyncio.sleep(0.05)
+            # Cancelled while the transaction is being written
+            second.cancel()
+            self.release.set()
+            await first
+        self.run_async(main())
+        self.assertEqual(self.transactions, [[{"n": 0}, {"n": 1}]])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+DATABASE_DIR = tempfile.TemporaryDirectory()
+# main connects when it is imported; the first test module that imports it picks the database
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(DATABASE_DIR.name, 'store.db')}")
+os.environ.setdefault("LOG_FILE", "")
+
+import archive
+import main
+from road_vision import geohash
+from retention import RetentionJob, summarize
+from sqlalchemy import insert, select
+
+HOUR = datetime(2024, 3, 1, 8)
+
+def reading(seq, road_state="smooth road", age=timedelta(days=2), event_timestamp=HOUR, y=100.0):
+    return {
+        "road_state": road_state, "user_id": 1, "x": 0.0, "y": y, "z": 16384.0, "latitude": 50.4501,
+        "longitude": 30.5234, "timestamp": datetime.now() - age, "vehicle_count": 2,
+        "event_timestamp": event_timestamp, "seq": seq, "segment_id": None,
+    }
+
+class TestSummarize(unittest.TestCase):
+    def test_sums_per_cell_and_hour(self):
+        readings = [
+            reading(1, "big bumps", y=-9000.0), reading(2, "small bumps", y=3000.0),
+            reading(3, event_timestamp=HOUR + timedelta(minutes=59)),
+            reading(4, event_timestamp=HOUR + timedelta(hours=1)),
+        ]
+        summaries = {summary["hour"]: summary for summary in summarize(readings)}
+        self.assertEqual(set(summaries), {HOUR, HOUR + timedelta(hours=1)})
+        summary = summaries[HOUR]
+        self.assertEqual(summary["reading_count"], 3)
+        # Small bumps are not a defect
+        self.assertEqual(summary["defect_count"], 1)
+        self.assertEqual((summary["y_min"], summary["y_max"], summary["y_sum"]), (-9000.0, 3000.0, -5900.0))
+        self.assertEqual(summary["vehicle_count_sum"], 6)
+        self.assertEqual(summary["geohash"], geohash.encode(50.4501, 30.5234, 7))
+    def test_store_timestamp_when_the_event_timestamp_is_missing(self):
+        row = reading(1, event_timestamp=None)
+        (summary,) = summarize([row])
+        self.assertEqual(summary["hour"], row["timestamp"].replace(minute=0, second=0, microsecond=0))
+    def test_readings_without_position_are_skipped(self):
+        row = reading(1)
+        row["latitude"] = None
+        self.assertEqual(summarize([row]), [])
+
+class TestRetentionJob(unittest.TestCase):
+    def setUp(self):
+        main.metadata.create_all(main.engine)
+        self.archive_dir = tempfile.TemporaryDirectory()
+        self.job = RetentionJob(
+            main.SessionLocal, main.processed_agent_data, main.processed_agent_data_hourly, main.upsert,
+            self.archive_dir.name, timedelta(days=1), batch_rows=2,
+        )
+    def tearDown(self):
+        main.metadata.drop_all(main.engine)
+        self.archive_dir.cleanup()
+    def insert(self, rows):
+        with main.engine.begin() as connection:
+            connection.execute(insert(main.processed_agent_data), rows)
+    def select(self, table):
+        with main.engine.connect() as connection:
+            return [dict(row) for row in connection.execute(select(table)).mappings()]
+    def archived_rows(self):
+        return [
+            row for name in sorted(os.listdir(self.archive_dir.name))
+            for row in archive.read(os.path.join(self.archive_dir.name, name))
+        ]
+    def test_old_readings_are_archived_summarized_and_deleted(self):
+        old = [reading(1, "big bumps"), reading(2), reading(3, "humps"), reading(4), reading(5)]
+        self.insert(old + [reading(6, age=timedelta(hours=1))])
+        stored = self.select(main.processed_agent_data)
+        self.assertEqual(self.job.run_once(), 5)
+        # One file per batch of batch_rows readings, named by their ids
+        self.assertEqual(len(os.listdir(self.archive_dir.name)), 3)
+        self.assertEqual(self.archived_rows(), stored[:5])
+        self.assertEqual([row["seq"] for row in self.select(main.processed_agent_data)], [6])
+        (summary,) = self.select(main.processed_agent_data_hourly)
+        self.assertEqual((summary["hour"], summary["reading_count"], summary["defect_count"]), (HOUR, 5, 2))
+        self.assertEqual((summary["y_sum"], summary["vehicle_count_sum"]), (500.0, 10))
+    def test_later_runs_add_to_the_summaries(self):
+        self.insert([reading(1, "big bumps", y=-9000.0)])
+        self.job.run_once()
+        self.insert([reading(2, y=9000.0), reading(3)])
+        self.assertEqual(self.job.run_once(), 2)
+        self.assertEqual(self.job.run_once(), 0)
+        (summary,) = self.select(main.processed_agent_data_hourly)
+        self.assertEqual((summary["reading_count"], summary["defect_count"]), (3, 1))
+        self.assertEqual((summary["y_min"], summary["y_max"], summary["y_sum"]), (-9000.0, 9000.0, 100.0))
+        self.assertEqual(self.select(main.processed_agent_data), [])
+        self.assertEqual(len(self.archived_rows()), 3)
+    def test_failed_run_keeps_the_readings(self):
+        self.insert([reading(1), reading(2)])
+        with mock.patch("archive.write", side_effect=OSError("No space left on device")):
+            with self.assertRaises(OSError):
+                self.job.run_once()
+        self.assertEqual(len(self.select(main.processed_agent_data)), 2)
+        self.assertEqual(self.select(main.processed_agent_data_hourly), [])
+
+if __name__ == "__main__":
+    unittest.main()
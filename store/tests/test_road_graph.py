@@ -0,0 +1,51 @@
+import json
+import os
+import tempfile
+import unittest
+from road_graph import RoadGraph
+
+class TestRoadGraph(unittest.TestCase):
+    def setUp(self):
+        # Two parallel east-west streets ~110 m apart
+        self.graph = RoadGraph(
+            {"north": [[(50.4510, 30.5200), (50.4510, 30.5300)]], "south": [[(50.4500, 30.5200), (50.4500, 30.5300)]]},
+            {"north": "Khreshchatyk"},
+            max_distance=20,
+        )
+    def test_snaps_to_the_nearest_segment(self):
+        self.assertEqual(self.graph.snap(50.45095, 30.5250), "north")
+        self.assertEqual(self.graph.snap(50.45005, 30.5250), "south")
+    def test_point_beyond_max_distance_is_not_matched(self):
+        # ~55 m from both streets
+        self.assertIsNone(self.graph.snap(50.4505, 30.5250))
+        self.assertIsNone(self.graph.snap(50.4600, 30.6000))
+    def test_point_past_the_end_of_a_segment(self):
+        # ~14 m east of the end of the north street
+        self.assertEqual(self.graph.snap(50.4510, 30.5302), "north")
+        self.assertIsNone(self.graph.snap(50.4510, 30.5310))
+    def test_segment_midpoint_and_name(self):
+        segment = self.graph.segments["north"]
+        self.assertEqual(segment.name, "Khreshchatyk")
+        self.assertAlmostEqual(segment.latitude, 50.4510)
+        self.assertAlmostEqual(segment.longitude, 30.5250)
+        self.assertIsNone(self.graph.segments["south"].name)
+    def test_load_geojson(self):
+        features = [
+            {"type": "Feature", "properties": {"id": 7, "name": "Velyka Vasylkivska"},
+             "geometry": {"type": "LineString", "coordinates": [[30.5200, 50.4510], [30.5300, 50.4510]]}},
+            {"type": "Feature", "properties": {},
+             "geometry": {"type": "MultiLineString", "coordinates": [[[30.5200, 50.4500], [30.5300, 50.4500]]]}},
+            {"type": "Feature", "properties": {}, "geometry": {"type": "Point", "coordinates": [30.52, 50.45]}},
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "roads.geojson")
+            with open(path, "w", encoding="utf-8") as file:
+                json.dump({"type": "FeatureCollection", "features": features}, file)
+            graph = RoadGraph.load(path)
+        self.assertEqual(set(graph.segments), {"7", "1"})
+        self.assertEqual(graph.segments["7"].name, "Velyka Vasylkivska")
+        self.assertEqual(graph.snap(50.45095, 30.5250), "7")
+        self.assertEqual(graph.snap(50.45005, 30.5250), "1")
+
+if __name__ == "__main__":
+    unittest.main()
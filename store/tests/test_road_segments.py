@@ -0,0 +1,90 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+DATABASE_DIR = tempfile.TemporaryDirectory()
+# main connects when it is imported; the first test module that imports it picks the database
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(DATABASE_DIR.name, 'store.db')}")
+os.environ.setdefault("LOG_FILE", "")
+
+import main
+from road_graph import RoadGraph
+from road_vision.entities import ProcessedAgentData
+from sqlalchemy import select
+
+NORTH = (50.4510, 30.5250)
+SOUTH = (50.4500, 30.5250)
+
+def reading(seq, road_state, position=NORTH):
+    return {
+        "road_state": road_state, "user_id": 1, "x": 0.0, "y": 0.0, "z": 0.0, "latitude": position[0],
+        "longitude": position[1], "timestamp": datetime(2024, 1, 1), "vehicle_count": 0,
+        "event_timestamp": datetime(2024, 1, 1), "seq": seq, "segment_id": main.road_graph.snap(*position),
+    }
+
+class TestRoadSegmentStatistics(unittest.TestCase):
+    def setUp(self):
+        main.metadata.create_all(main.engine)
+        self.road_graph = main.road_graph
+        main.road_graph = RoadGraph({
+            "north": [[(50.4510, 30.5200), (50.4510, 30.5300)]], "south": [[(50.4500, 30.5200), (50.4500, 30.5300)]]
+        })
+    def tearDown(self):
+        main.road_graph = self.road_graph
+        main.metadata.drop_all(main.engine)
+    def segment(self, segment_id):
+        with main.engine.connect() as connection:
+            return connection.execute(
+                select(main.road_segments).where(main.road_segments.c.segment_id == segment_id)
+            ).mappings().fetchone()
+    def assertCounts(self, segment_id, sample_count, defect_count, severe_defect_count):
+        segment = self.segment(segment_id)
+        self.assertEqual(
+            (segment["sample_count"], segment["defect_count"], segment["severe_defect_count"]),
+            (sample_count, defect_count, severe_defect_count),
+        )
+        self.assertAlmostEqual(segment["defect_score"], (defect_count + 2) / (sample_count + 20))
+        self.assertAlmostEqual(segment["confidence"], sample_count / (sample_count + 20))
+    def test_statistics_are_added_to_the_stored_ones(self):
+        main.insert_readings([reading(1, "smooth road"), reading(2, "big bumps"), reading(3, "smooth road", SOUTH)])
+        main.insert_readings([reading(4, "small bumps"), reading(5, "humps"), reading(6, "dribble")])
+        # Only big bumps and humps are defects, and only big bumps severe ones
+        self.assertCounts("north", 5, 2, 1)
+        self.assertCounts("south", 1, 0, 0)
+    def test_duplicate_readings_are_counted_once(self):
+        main.insert_readings([reading(1, "big bumps"), reading(2, "smooth road")])
+        # A retried batch: the unique index skips the readings that are already stored
+        main.insert_readings([reading(1, "big bumps"), reading(2, "smooth road"), reading(3, "humps")])
+        self.assertCounts("north", 3, 2, 1)
+    def test_unmatched_readings_are_not_counted(self):
+        main.insert_readings([reading(1, "big bumps", (50.46, 30.60))])
+        self.assertIsNone(self.segment("north"))
+    def test_update_moves_the_reading_to_its_new_segment(self):
+        main.insert_readings([reading(1, "big bumps"), reading(2, "smooth road")])
+        with main.engine.connect() as connection:
+            reading_id = connection.execute(
+                select(main.processed_agent_data.c.id).where(main.processed_agent_data.c.seq == 1)
+            ).scalar_one()
+        data = ProcessedAgentData.model_validate({
+            "road_state": "smooth road",
+            "agent_data": {
+                "user_id": 1, "accelerometer": {"x": 0, "y": 0, "z": 0},
+                "gps": {"latitude": SOUTH[0], "longitude": SOUTH[1]}, "timestamp": "2024-01-01T00:00:00",
+            },
+            "traffic_data": {"vehicle_count": 0},
+        })
+        self.assertEqual(main.update_processed_agent_data(reading_id, data).segment_id, "south")
+        self.assertCounts("north", 1, 0, 0)
+        self.assertCounts("south", 1, 0, 0)
+    def test_delete_removes_the_reading_from_its_segment(self):
+        main.insert_readings([reading(1, "big bumps"), reading(2, "smooth road")])
+        with main.engine.connect() as connection:
+            reading_id = connection.execute(
+                select(main.processed_agent_data.c.id).where(main.processed_agent_data.c.seq == 1)
+            ).scalar_one()
+        main.delete_processed_agent_data(reading_id)
+        self.assertCounts("north", 1, 0, 0)
+
+if __name__ == "__main__":
+    unittest.main()
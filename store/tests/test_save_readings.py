@@ -0,0 +1,83 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+DATABASE_DIR = tempfile.TemporaryDirectory()
+# main connects when it is imported; the first test module that imports it picks the database
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(DATABASE_DIR.name, 'store.db')}")
+os.environ.setdefault("LOG_FILE", "")
+
+import main
+from road_vision.dedup import DedupCache
+from road_vision.entities import ProcessedAgentData
+from sqlalchemy import func, select
+
+class FakeWebSocket:
+    def __init__(self, closed=False):
+        self.closed = closed
+        self.messages = []
+    async def send_json(self, data):
+        if self.closed:
+            raise RuntimeError("Cannot call \"send\" once a close message has been sent.")
+        self.messages.append(data)
+
+def reading(seq, user_id=1):
+    return ProcessedAgentData.model_validate({
+        "road_state": "smooth road",
+        "agent_data": {
+            "user_id": user_id, "seq": seq, "accelerometer": {"x": 0, "y": 0, "z": 0},
+            "gps": {"latitude": 50.45, "longitude": 30.52}, "timestamp": datetime.now(),
+        },
+        "traffic_data": {"vehicle_count": 3},
+    })
+
+class TestSaveReadings(unittest.TestCase):
+    def setUp(self):
+        main.metadata.create_all(main.engine)
+        main.dedup_cache = DedupCache(main.DEDUP_CACHE_SIZE)
+        main.trip_statistics.clear()
+        main.congestion.cells.clear()
+    def tearDown(self):
+        main.metadata.drop_all(main.engine)
+        main.subscriptions.clear()
+    def save(self, *batches):
+        async def save_all():
+            await asyncio.gather(*(main.save_readings(batch, None) for batch in batches))
+        asyncio.run(save_all())
+    def stored_rows(self):
+        with main.engine.connect() as connection:
+            return connection.execute(select(func.count()).select_from(main.processed_agent_data)).scalar_one()
+    def congestion_readings(self):
+        return sum(cell["readings"] for cell in main.congestion_snapshot()["cells"])
+    def test_duplicates_missed_by_the_cache_are_not_counted(self):
+        self.save([reading(seq) for seq in range(10)])
+        # As after a restart of the Store, or after the keys were evicted
+        main.dedup_cache = DedupCache(main.DEDUP_CACHE_SIZE)
+        self.save([reading(seq) for seq in range(5)])
+        self.save([reading(seq) for seq in range(10, 30)])
+        self.assertEqual(self.stored_rows(), 30)
+        self.assertEqual(main.read_trip_statistics(1)["reading_count"], 30)
+        self.assertEqual(self.congestion_readings(), 30)
+    def test_duplicates_in_one_commit_group_are_counted_once(self):
+        self.save([reading(1), reading(2)], [reading(2), reading(3)], [reading(1, user_id=2)])
+        self.assertEqual(self.stored_rows(), 4)
+        self.assertEqual(main.read_trip_statistics(1)["reading_count"], 3)
+        self.assertEqual(main.read_trip_statistics(2)["reading_count"], 1)
+        self.assertEqual(self.congestion_readings(), 4)
+    def test_closed_subscriber_does_not_fail_the_request(self):
+        closed, open_ = FakeWebSocket(closed=True), FakeWebSocket()
+        main.subscriptions[1] = {closed, open_}
+        self.save([reading(seq) for seq in range(3)])
+        self.assertEqual(len(open_.messages), 3)
+        self.assertEqual(main.subscriptions[1], {open_})
+        self.assertEqual(main.read_trip_statistics(1)["reading_count"], 3)
+        self.assertEqual(self.congestion_readings(), 3)
+    def test_readings_without_seq_are_always_saved(self):
+        self.save([reading(None), reading(None)], [reading(None)])
+        self.assertEqual(self.stored_rows(), 3)
+        self.assertEqual(main.read_trip_statistics(1)["reading_count"], 3)
+
+if __name__ == "__main__":
+    unittest.main()